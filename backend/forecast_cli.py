@@ -0,0 +1,77 @@
+"""Forecast when the pending send queue will have drained.
+
+Reads the pending backlog and recent send durations from MongoDB (MONGO_URL /
+DB_NAME, as the server does) and runs the same simulation as GET /api/forecast.
+
+    python forecast_cli.py
+    python forecast_cli.py --campaign-size 100000 --campaign-at 2024-06-03T09:00:00Z --rate-per-minute 600
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+
+import server
+
+
+def print_report(forecast: dict):
+    assumptions = forecast["assumptions"]
+    print("=" * 80)
+    print(f"📈 SEND QUEUE FORECAST ({forecast['simulated_emails']} emails, "
+          f"simulated in {forecast['simulation_ms']:.0f}ms)")
+    print("=" * 80)
+    print(f"Pending emails:   {forecast['pending_emails']}")
+    print(f"Workers:          {assumptions['workers']}")
+    print(f"Rate limit:       {assumptions['rate_per_minute'] or 'none'} per minute")
+    print(f"Send latency:     p50 {assumptions['p50_latency_ms']:.0f}ms, p95 {assumptions['p95_latency_ms']:.0f}ms "
+          f"({assumptions['latency_samples'] or 'no'} samples)")
+    print(f"All sent by:      {forecast['all_sent_at'].isoformat() if forecast['all_sent_at'] else '-'}")
+
+    for title, breakdown in (("Priority", forecast["by_priority"]), ("Category", forecast["by_category"])):
+        print("\n" + f"{title:<16}{'Emails':>10}{'p50 wait s':>12}{'p95 wait s':>12}{'max wait s':>12}  Last sent at")
+        print("-" * 80)
+        for value, stats in breakdown.items():
+            print(f"{value:<16}{stats['count']:>10}{stats['p50_wait_seconds']:>12.0f}{stats['p95_wait_seconds']:>12.0f}"
+                  f"{stats['max_wait_seconds']:>12.0f}  {stats['last_sent_at'].isoformat()}")
+
+    depth = forecast["queue_depth"]
+    if depth:
+        print("\nQueue depth")
+        print("-" * 80)
+        peak = max(point["waiting"] for point in depth) or 1
+        for point in depth[::max(1, len(depth) // 20)]:
+            bar = "#" * round(point["waiting"] / peak * 50)
+            print(f"{point['at'].strftime('%Y-%m-%d %H:%M:%S')}  {point['waiting']:>10}  {bar}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the dispatcher over the pending backlog")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent sends (default: pipeline transmit concurrency)")
+    parser.add_argument("--rate-per-minute", type=int, default=None, help="Send rate limit (default: sender account limits)")
+    parser.add_argument("--campaign-size", type=int, default=0, help="Emails in a planned campaign to add")
+    parser.add_argument("--campaign-at", type=datetime.fromisoformat, default=None, help="When the campaign is due (ISO 8601)")
+    parser.add_argument("--campaign-priority", default="normal", help="Priority of the planned campaign")
+    parser.add_argument("--campaign-category", default="general", help="Category of the planned campaign")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible forecast")
+    parser.add_argument("--json", action="store_true", help="Print the raw forecast as JSON")
+    args = parser.parse_args()
+
+    forecast = asyncio.run(server.build_forecast(
+        workers=args.workers,
+        rate_per_minute=args.rate_per_minute,
+        campaign_size=args.campaign_size,
+        campaign_at=args.campaign_at,
+        campaign_priority=args.campaign_priority,
+        campaign_category=args.campaign_category,
+        seed=args.seed
+    ))
+    if args.json:
+        print(json.dumps(forecast, default=str, indent=2))
+    else:
+        print_report(forecast)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,358 @@
 import os
+import sys
+import time
 import uuid
 import asyncio
+import heapq
+import bisect
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import contextvars
+import functools
 import smtplib
 import csv
 import io
+import re
+import base64
+import mimetypes
+import codecs
+import hashlib
+import json
+import math
+import zlib
+from array import array
+from collections import OrderedDict, deque
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.mime.base import MIMEBase
+from email.message import Message
+from email.generator import Generator
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
+from pymongo import ReadPreference, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from email_validator import validate_email, EmailNotValidError
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Request timing configuration
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))
+
+# Admission control configuration (0 disables a limit)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "")  # e.g. X-Forwarded-For behind a trusted proxy
+ADMISSION_LANES = {
+    "ingest": {
+        "client_in_flight": int(os.getenv("ADMISSION_INGEST_CLIENT_IN_FLIGHT", "4")),
+        "client_rate": float(os.getenv("ADMISSION_INGEST_CLIENT_RATE", "20")),  # requests per second
+        "client_burst": int(os.getenv("ADMISSION_INGEST_CLIENT_BURST", "40")),
+        "lane_in_flight": int(os.getenv("ADMISSION_INGEST_IN_FLIGHT", "32")),  # across all clients
+    },
+    "interactive": {
+        "client_in_flight": int(os.getenv("ADMISSION_INTERACTIVE_CLIENT_IN_FLIGHT", "16")),
+        "client_rate": float(os.getenv("ADMISSION_INTERACTIVE_CLIENT_RATE", "50")),
+        "client_burst": int(os.getenv("ADMISSION_INTERACTIVE_CLIENT_BURST", "100")),
+        "lane_in_flight": int(os.getenv("ADMISSION_INTERACTIVE_IN_FLIGHT", "256")),
+    },
+}
+ADMISSION_INGEST_MAX_POOL_WAITERS = int(os.getenv("ADMISSION_INGEST_MAX_POOL_WAITERS", "8"))  # API pool queue that sheds ingest
+ADMISSION_MAX_TRACKED_CLIENTS = 10000
+
+# Request timing instrumentation
+_request_timings: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_timings", default=None)
+
+def add_request_timing(name: str, seconds: float):
+    """Add time spent in a component to the current request's breakdown, if any"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+        timings[f"{name}_count"] = timings.get(f"{name}_count", 0) + 1
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response that reports how long rendering the body took"""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            add_request_timing("serialize", time.perf_counter() - started)
+
+class TimedCursor:
+    """Wraps a Motor cursor so fetching results counts as MongoDB time"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._iterator = None
+
+    def __getattr__(self, name):
+        attribute = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size"):
+            def chained(*args, **kwargs):
+                attribute(*args, **kwargs)
+                return self
+            return chained
+        return attribute
+
+    async def to_list(self, length: Optional[int] = None):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.to_list(length=length)
+        finally:
+            add_request_timing("mongo", time.perf_counter() - started)
+
+    def __aiter__(self):
+        self._iterator = self._cursor.__aiter__()
+        return self
+
+    async def __anext__(self):
+        started = time.perf_counter()
+        try:
+            return await self._iterator.__anext__()
+        finally:
+            add_request_timing("mongo", time.perf_counter() - started)
+
+class TimedCollection:
+    """Wraps a Motor collection so every database call counts towards the request's MongoDB time"""
+
+    _TIMED_METHODS = {
+        "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+        "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete",
+        "count_documents", "estimated_document_count", "distinct", "bulk_write", "create_index"
+    }
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name in ("find", "aggregate"):
+            return lambda *args, **kwargs: TimedCursor(attribute(*args, **kwargs))
+        if name in self._TIMED_METHODS:
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await attribute(*args, **kwargs)
+                finally:
+                    add_request_timing("mongo", time.perf_counter() - started)
+            return timed
+        return attribute
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a background thread while a request runs"""
+
+    # The switch interval is process-wide: lowered by the first active profiler, restored by the last
+    _switch_lock = threading.Lock()
+    _active = 0
+    _original_switch_interval: Optional[float] = None
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.samples: Dict[tuple, int] = {}
+        self.sample_count = 0
+        self._target_thread = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        # The sampler needs the GIL to take a sample; hand it over more often while profiling
+        with SamplingProfiler._switch_lock:
+            if SamplingProfiler._active == 0:
+                SamplingProfiler._original_switch_interval = sys.getswitchinterval()
+            SamplingProfiler._active += 1
+            sys.setswitchinterval(min(sys.getswitchinterval(), self.interval / 2))
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        with SamplingProfiler._switch_lock:
+            SamplingProfiler._active -= 1
+            if SamplingProfiler._active == 0:
+                sys.setswitchinterval(SamplingProfiler._original_switch_interval)
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+            self.sample_count += 1
+
+    def report(self, title: str, limit: int = 25) -> str:
+        own: Dict[str, int] = {}
+        cumulative: Dict[str, int] = {}
+        for stack, count in self.samples.items():
+            if stack:
+                own[stack[-1]] = own.get(stack[-1], 0) + count
+            for frame in set(stack):
+                cumulative[frame] = cumulative.get(frame, 0) + count
+
+        total = max(self.sample_count, 1)
+        lines = [title, f"{self.sample_count} samples every {self.interval * 1000:g}ms "
+                        "(samples include other requests served by the event loop meanwhile)", ""]
+        for heading, counts in (("Top frames by own time", own), ("Top frames by cumulative time", cumulative)):
+            lines.append(heading)
+            for frame, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]:
+                lines.append(f"  {count / total * 100:6.1f}%  {count:6d}  {frame}")
+            lines.append("")
+        lines.append("Hottest stacks")
+        for stack, count in sorted(self.samples.items(), key=lambda item: item[1], reverse=True)[:10]:
+            lines.append(f"  {count / total * 100:6.1f}%  " + " -> ".join(stack[-8:]))
+        return "\n".join(lines) + "\n"
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Advanced Scheduled Email App",
     description="Schedule emails with custom settings, templates, analytics, and advanced features",
-    version="3.0.0"
+    version="3.0.0",
+    default_response_class=TimedJSONResponse
 )
 
+# Admission control
+class AdmissionController:
+    """Per-client in-flight and token bucket rate limits, kept separately for each request lane.
+
+    Control traffic (health checks, dispatcher triggers, stats and the event
+    stream) is never limited, so a burst of ingest requests can't starve it.
+    Ingest is also shed while operations queue for a MongoDB API connection.
+    """
+
+    CONTROL_PATHS = {
+        "/", "/api/health", "/api/check-send-emails", "/api/pipeline/stats", "/api/mongo/pools",
+        "/api/delivery-log", "/api/admission/stats", "/api/scheduled-emails/events"
+    }
+    INGEST_ROUTES = {
+        ("POST", "/api/schedule-email"),
+        ("POST", "/api/scheduled-emails/import"),
+        ("POST", "/api/scheduled-emails/bulk-action"),
+        ("POST", "/api/attachments"),
+    }
+
+    def __init__(self, lanes: Dict[str, dict] = ADMISSION_LANES):
+        self.lanes = lanes
+        self._clients: Dict[tuple, dict] = {}
+        self._lane_in_flight = {lane: 0 for lane in lanes}
+        self.admitted = {lane: 0 for lane in lanes}
+        self.rejected = {lane: 0 for lane in lanes}
+
+    def lane(self, request: Request) -> str:
+        if request.url.path in self.CONTROL_PATHS:
+            return "control"
+        if (request.method, request.url.path) in self.INGEST_ROUTES:
+            return "ingest"
+        return "interactive"
+
+    @staticmethod
+    def client_key(request: Request) -> str:
+        if ADMISSION_CLIENT_HEADER and request.headers.get(ADMISSION_CLIENT_HEADER):
+            return request.headers[ADMISSION_CLIENT_HEADER].split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    def _client_state(self, lane: str, client: str, now: float) -> dict:
+        key = (lane, client)
+        state = self._clients.get(key)
+        if state is None:
+            if len(self._clients) >= ADMISSION_MAX_TRACKED_CLIENTS:
+                # Idle clients with a refilled bucket carry no state worth keeping
+                for idle_key in [k for k, v in self._clients.items() if not v["in_flight"] and now - v["updated"] > 60]:
+                    del self._clients[idle_key]
+            state = {"tokens": float(self.lanes[lane]["client_burst"]), "updated": now, "in_flight": 0}
+            self._clients[key] = state
+        return state
+
+    def admit(self, lane: str, client: str) -> Optional[float]:
+        """Reserve a slot for the request; returns None if admitted, else seconds to wait before retrying"""
+        limits = self.lanes[lane]
+        now = time.monotonic()
+        state = self._client_state(lane, client, now)
+        if limits["client_rate"]:
+            state["tokens"] = min(limits["client_burst"], state["tokens"] + (now - state["updated"]) * limits["client_rate"])
+        state["updated"] = now
+
+        retry_after = None
+        if limits["lane_in_flight"] and self._lane_in_flight[lane] >= limits["lane_in_flight"]:
+            retry_after = 1.0
+        elif limits["client_in_flight"] and state["in_flight"] >= limits["client_in_flight"]:
+            retry_after = 1.0
+        elif (lane == "ingest" and ADMISSION_INGEST_MAX_POOL_WAITERS
+              and mongo_pool_monitors["api"].waiting >= ADMISSION_INGEST_MAX_POOL_WAITERS):
+            retry_after = 1.0
+        elif limits["client_rate"] and state["tokens"] < 1:
+            retry_after = (1 - state["tokens"]) / limits["client_rate"]
+        if retry_after is not None:
+            self.rejected[lane] += 1
+            return retry_after
+
+        if limits["client_rate"]:
+            state["tokens"] -= 1
+        state["in_flight"] += 1
+        self._lane_in_flight[lane] += 1
+        self.admitted[lane] += 1
+        return None
+
+    def release(self, lane: str, client: str):
+        self._lane_in_flight[lane] -= 1
+        state = self._clients.get((lane, client))
+        if state:
+            state["in_flight"] -= 1
+
+    def stats(self) -> dict:
+        return {
+            lane: {
+                "in_flight": self._lane_in_flight[lane],
+                "admitted": self.admitted[lane],
+                "rejected": self.rejected[lane],
+                "clients": sum(1 for key in self._clients if key[0] == lane),
+                "limits": limits
+            }
+            for lane, limits in self.lanes.items()
+        }
+
+admission = AdmissionController()
+
+# Registered before CORS so that 429 responses still carry CORS headers
+@app.middleware("http")
+async def admission_control_middleware(request: Request, call_next):
+    """Answer requests beyond the client's lane limits with a fast 429 instead of queueing them"""
+    lane = admission.lane(request)
+    if not ADMISSION_ENABLED or lane == "control":
+        return await call_next(request)
+
+    client = admission.client_key(request)
+    retry_after = admission.admit(lane, client)
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": f"Too many {lane} requests, retry later"},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        admission.release(lane, client)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -35,15 +362,283 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_timing_middleware(request: Request, call_next):
+    """Add a Server-Timing breakdown to every response, log slow requests and profile on demand"""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    profiler = None
+    if PROFILING_ENABLED and (request.query_params.get("profile") in ("1", "true")
+                              or request.headers.get("x-profile") in ("1", "true")):
+        profiler = SamplingProfiler()
+        profiler.start()
+
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_timings.reset(token)
+        if profiler:
+            profiler.stop()
+
+    total_ms = (time.perf_counter() - started) * 1000
+    mongo_ms = timings.get("mongo", 0.0) * 1000
+    serialize_ms = timings.get("serialize", 0.0) * 1000
+    app_ms = max(total_ms - mongo_ms - serialize_ms, 0.0)
+    server_timing = (
+        f'db;dur={mongo_ms:.1f};desc="MongoDB ({int(timings.get("mongo_count", 0))} ops)", '
+        f'serialize;dur={serialize_ms:.1f}, app;dur={app_ms:.1f}, total;dur={total_ms:.1f}'
+    )
+
+    if total_ms >= SLOW_REQUEST_MS:
+        print(f"Slow request: {request.method} {request.url.path} {response.status_code} "
+              f"total={total_ms:.1f}ms db={mongo_ms:.1f}ms serialize={serialize_ms:.1f}ms app={app_ms:.1f}ms")
+
+    if profiler:
+        report = profiler.report(
+            f"Profile of {request.method} {request.url.path} -> {response.status_code} "
+            f"({total_ms:.1f}ms, db {mongo_ms:.1f}ms, serialize {serialize_ms:.1f}ms)"
+        )
+        response = PlainTextResponse(report, headers={"X-Profiled-Status": str(response.status_code)})
+
+    response.headers["Server-Timing"] = server_timing
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "scheduled_email_db")
 
-client = AsyncIOMotorClient(MONGO_URL)
+# Per-path client configuration: MONGO_<PATH>_<SETTING> overrides these defaults
+MONGO_PATH_DEFAULTS = {
+    # Interactive API requests
+    "api": {"MAX_POOL_SIZE": "50", "MIN_POOL_SIZE": "0", "WAIT_QUEUE_TIMEOUT_MS": "5000",
+            "SERVER_SELECTION_TIMEOUT_MS": "5000", "SOCKET_TIMEOUT_MS": "10000",
+            "READ_PREFERENCE": "primary", "WRITE_CONCERN": "1"},
+    # Dispatcher loads, claims and status updates; durable writes, short waits
+    "dispatcher": {"MAX_POOL_SIZE": "20", "MIN_POOL_SIZE": "2", "WAIT_QUEUE_TIMEOUT_MS": "2000",
+                   "SERVER_SELECTION_TIMEOUT_MS": "5000", "SOCKET_TIMEOUT_MS": "10000",
+                   "READ_PREFERENCE": "primary", "WRITE_CONCERN": "majority"},
+    # Analytics and export scans; may read from secondaries and run long
+    "reporting": {"MAX_POOL_SIZE": "10", "MIN_POOL_SIZE": "0", "WAIT_QUEUE_TIMEOUT_MS": "30000",
+                  "SERVER_SELECTION_TIMEOUT_MS": "5000", "SOCKET_TIMEOUT_MS": "120000",
+                  "READ_PREFERENCE": "secondaryPreferred", "WRITE_CONCERN": "1"},
+}
+MONGO_POOL_WAIT_SAMPLES = 1000  # recent checkouts kept per path for percentiles
+
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    """Measures how long operations wait to check a connection out of one client's pool.
+
+    pymongo checks connections out synchronously on the thread running the
+    operation, so the start time is kept thread-local between the two events.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.waiting = 0
+        self.open_connections = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits: deque = deque(maxlen=MONGO_POOL_WAIT_SAMPLES)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        wait = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.recent_waits.append(wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self.recent_waits)
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "waiting": self.waiting,
+                "open_connections": self.open_connections,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "p95_wait_ms": round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3)
+            }
+
+mongo_pool_monitors: Dict[str, MongoPoolMonitor] = {}
+mongo_client_options: Dict[str, dict] = {}
+
+def mongo_client(path: str) -> AsyncIOMotorClient:
+    """Create the Motor client for one access path with its own pool, read preference and write concern"""
+    setting = lambda name: os.getenv(f"MONGO_{path.upper()}_{name}", MONGO_PATH_DEFAULTS[path][name])
+    write_concern = setting("WRITE_CONCERN")
+    options = {
+        "maxPoolSize": int(setting("MAX_POOL_SIZE")),
+        "minPoolSize": int(setting("MIN_POOL_SIZE")),
+        "waitQueueTimeoutMS": int(setting("WAIT_QUEUE_TIMEOUT_MS")),
+        "serverSelectionTimeoutMS": int(setting("SERVER_SELECTION_TIMEOUT_MS")),
+        "socketTimeoutMS": int(setting("SOCKET_TIMEOUT_MS")),
+        "readPreference": setting("READ_PREFERENCE"),
+        "w": int(write_concern) if write_concern.isdigit() else write_concern,
+    }
+    mongo_client_options[path] = options
+    mongo_pool_monitors[path] = MongoPoolMonitor(path)
+    return AsyncIOMotorClient(
+        MONGO_URL, appname=f"scheduled-email-{path}", event_listeners=[mongo_pool_monitors[path]], **options
+    )
+
+client = mongo_client("api")
 db = client[DB_NAME]
-scheduled_emails_collection = db.scheduled_emails
-email_settings_collection = db.email_settings
-email_templates_collection = db.email_templates
+dispatcher_db = mongo_client("dispatcher")[DB_NAME]
+reporting_db = mongo_client("reporting")[DB_NAME]
+
+scheduled_emails_collection = TimedCollection(db.scheduled_emails)
+dispatcher_emails_collection = TimedCollection(dispatcher_db.scheduled_emails)
+reporting_emails_collection = TimedCollection(reporting_db.scheduled_emails)
+# For response-cached reports: a lagging secondary's snapshot would be cached under the new version
+reporting_primary_emails_collection = TimedCollection(
+    reporting_db.get_collection("scheduled_emails", read_preference=ReadPreference.PRIMARY)
+)
+reporting_rollups_collection = TimedCollection(reporting_db.email_rollups)
+reporting_rejections_collection = TimedCollection(reporting_db.import_rejections)
+# Collections the send pipeline touches for every email
+dispatcher_bodies_collection = TimedCollection(dispatcher_db.message_bodies)
+dispatcher_rollups_collection = TimedCollection(dispatcher_db.email_rollups)
+dispatcher_sender_accounts_collection = TimedCollection(dispatcher_db.sender_accounts)
+dispatcher_suppressions_collection = TimedCollection(dispatcher_db.suppressions)
+email_settings_collection = TimedCollection(db.email_settings)
+email_templates_collection = TimedCollection(db.email_templates)
+message_bodies_collection = TimedCollection(db.message_bodies)
+email_rollups_collection = TimedCollection(db.email_rollups)
+sender_accounts_collection = TimedCollection(db.sender_accounts)
+import_jobs_collection = TimedCollection(db.import_jobs)
+suppressions_collection = TimedCollection(db.suppressions)
+import_rejections_collection = TimedCollection(db.import_rejections)
+leveling_policies_collection = TimedCollection(db.leveling_policies)
+
+# Message body storage configuration
+BODY_COMPRESSION_THRESHOLD = int(os.getenv("BODY_COMPRESSION_THRESHOLD", "1024"))  # bytes
+BODY_CACHE_SIZE = int(os.getenv("BODY_CACHE_SIZE", "512"))  # number of bodies kept in memory
+BODY_SWEEP_INTERVAL_SECONDS = int(os.getenv("BODY_SWEEP_INTERVAL_SECONDS", "3600"))  # 0 disables the sweep
+BODY_SWEEP_GRACE_SECONDS = int(os.getenv("BODY_SWEEP_GRACE_SECONDS", "3600"))  # unused this long before removal
+
+# Attachment configuration
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)))  # per file, Gmail's limit
+ATTACHMENT_CACHE_BYTES = int(os.getenv("ATTACHMENT_CACHE_BYTES", str(64 * 1024 * 1024)))  # encoded parts kept in memory
+SMTP_DATA_CHUNK_BYTES = int(os.getenv("SMTP_DATA_CHUNK_BYTES", str(64 * 1024)))  # written to the socket at a time
+
+# Response cache configuration
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))  # cached responses kept in memory
+RESPONSE_CACHE_MAX_AGE_SECONDS = int(os.getenv("RESPONSE_CACHE_MAX_AGE_SECONDS", "300"))  # bounds staleness from other processes
+
+# Analytics rollup configuration
+ROLLUP_GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+ROLLUP_MAX_BUCKETS = int(os.getenv("ROLLUP_MAX_BUCKETS", "2232"))  # 93 days of hourly buckets
+
+# Live event stream configuration
+EVENT_COALESCE_MS = int(os.getenv("EVENT_COALESCE_MS", "250"))
+EVENT_POLL_INTERVAL_SECONDS = float(os.getenv("EVENT_POLL_INTERVAL_SECONDS", "2"))
+EVENT_MAX_PENDING = int(os.getenv("EVENT_MAX_PENDING", "5000"))  # per client, beyond this a resync is sent
+EVENT_POLL_BATCH = int(os.getenv("EVENT_POLL_BATCH", "1000"))  # changed emails per poll, beyond this a resync is sent
+EVENT_POLL_OVERLAP_SECONDS = float(os.getenv("EVENT_POLL_OVERLAP_SECONDS", "5"))  # re-read window for late commits
+EVENT_STATE_CACHE_SIZE = int(os.getenv("EVENT_STATE_CACHE_SIZE", "100000"))  # email states remembered while polling
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Sender account pool configuration
+SENDER_BALANCING = os.getenv("SENDER_BALANCING", "weighted")  # weighted or least_loaded
+SENDER_FAILURE_THRESHOLD = int(os.getenv("SENDER_FAILURE_THRESHOLD", "3"))  # consecutive failures before cooldown
+SENDER_COOLDOWN_SECONDS = int(os.getenv("SENDER_COOLDOWN_SECONDS", "300"))
+SENDER_ACCOUNTS_REFRESH_SECONDS = int(os.getenv("SENDER_ACCOUNTS_REFRESH_SECONDS", "30"))
+SENDER_STATS_WINDOW_SECONDS = 300
+TENANT_SETTINGS_CACHE_SECONDS = int(os.getenv("TENANT_SETTINGS_CACHE_SECONDS", "30"))  # saves elsewhere show up within this
+
+# Delivery log configuration
+DELIVERY_LOG_SUCCESS_SAMPLE_RATE = float(os.getenv("DELIVERY_LOG_SUCCESS_SAMPLE_RATE", "1.0"))  # 0..1
+DELIVERY_LOG_BUFFER_SIZE = int(os.getenv("DELIVERY_LOG_BUFFER_SIZE", "1000"))
+
+# Recipient import configuration
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))  # rows per insert_many
+IMPORT_MAX_RECORD_BYTES = 1024 * 1024  # guards against an unterminated quoted CSV field
+
+# Suppression list configuration
+SUPPRESSION_REFRESH_SECONDS = int(os.getenv("SUPPRESSION_REFRESH_SECONDS", "30"))  # incremental refresh
+SUPPRESSION_FULL_RELOAD_SECONDS = int(os.getenv("SUPPRESSION_FULL_RELOAD_SECONDS", "900"))  # picks up deletions
+SUPPRESSION_HARD_BOUNCE_CODES = {550, 551, 553}  # permanent recipient rejections
+
+# Send pipeline configuration
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))  # emails buffered in front of each stage
+PIPELINE_CONCURRENCY = {
+    "render": int(os.getenv("PIPELINE_RENDER_CONCURRENCY", "2")),
+    "build": int(os.getenv("PIPELINE_BUILD_CONCURRENCY", "2")),
+    "transmit": int(os.getenv("PIPELINE_TRANSMIT_CONCURRENCY", "8")),
+    "record": int(os.getenv("PIPELINE_RECORD_CONCURRENCY", "2")),
+}
+PIPELINE_THROUGHPUT_WINDOW_SECONDS = 60
+
+# Background dispatcher configuration
+DISPATCHER_ENABLED = os.getenv("DISPATCHER_ENABLED", "true").lower() == "true"
+DISPATCHER_PREFETCH_SECONDS = int(os.getenv("DISPATCHER_PREFETCH_SECONDS", "300"))  # how far ahead emails are preloaded
+DISPATCHER_PREFETCH_LIMIT = int(os.getenv("DISPATCHER_PREFETCH_LIMIT", "50000"))  # max emails loaded per query
+DISPATCHER_RESCAN_SECONDS = int(os.getenv("DISPATCHER_RESCAN_SECONDS", "60"))  # catches writes from other processes
+DISPATCHER_MAX_LOADED = int(os.getenv("DISPATCHER_MAX_LOADED", "100000"))  # loaded or queued ids before prefetching pauses
+DISPATCHER_BACKLOG_POLL_SECONDS = 1  # how often a paused prefetch checks whether the backlog has drained
+
+# Crash recovery configuration
+SENDING_RECOVERY_POLICY = os.getenv("SENDING_RECOVERY_POLICY", "failed")  # failed, retry or sent
+SENDING_RECOVERY_GRACE_SECONDS = int(os.getenv("SENDING_RECOVERY_GRACE_SECONDS", "300"))  # older claims are orphaned
+
+# Load leveling configuration
+LEVELING_POLICIES_REFRESH_SECONDS = int(os.getenv("LEVELING_POLICIES_REFRESH_SECONDS", "30"))
+LOAD_CURVE_MAX_MINUTES = 1440
+
+# Forecast configuration
+FORECAST_LATENCY_SAMPLES = int(os.getenv("FORECAST_LATENCY_SAMPLES", "5000"))  # recent send durations replayed
+FORECAST_DEFAULT_LATENCY_MS = float(os.getenv("FORECAST_DEFAULT_LATENCY_MS", "1500"))  # when nothing was sent yet
+FORECAST_DEPTH_POINTS = 200  # samples in the projected queue depth curve
+
+# Tenant fairness configuration
+DISPATCHER_TENANT_QUANTUM = int(os.getenv("DISPATCHER_TENANT_QUANTUM", "10"))  # emails per tenant per round
+TENANT_MAX_IN_FLIGHT = int(os.getenv("TENANT_MAX_IN_FLIGHT", str(2 * PIPELINE_CONCURRENCY["transmit"])))  # 0 = unlimited
+TENANT_RATE_PER_MINUTE = int(os.getenv("TENANT_RATE_PER_MINUTE", "0"))  # 0 = unlimited
+TENANT_LIMITS = json.loads(os.getenv("TENANT_LIMITS", "{}"))  # {"team": {"max_in_flight": 4, "rate_per_minute": 600}}
 
 # Default Gmail SMTP configuration
 DEFAULT_SMTP_HOST = "smtp.gmail.com"
@@ -78,20 +673,27 @@ class ScheduleEmailRequest(BaseModel):
     recipient_name: str = Field(default="", description="Recipient name")
     subject: str = Field(..., description="Email subject")
     message: str = Field(..., description="Email message/body")
+    html_message: Optional[str] = Field(default=None, description="HTML alternative to the plain text body")
+    attachment_ids: List[str] = Field(default_factory=list, description="IDs of uploaded attachments")
     template_id: Optional[str] = Field(default=None, description="Email template ID")
     priority: str = Field(default="normal", description="Email priority: low, normal, high")
     category: str = Field(default="general", description="Email category")
     is_recurring: bool = Field(default=False, description="Is this a recurring email")
     recurring_pattern: Optional[str] = Field(default=None, description="Recurring pattern: daily, weekly, monthly")
     recurring_end_date: Optional[datetime] = Field(default=None, description="When to stop recurring")
+    user_id: str = Field(default="default", description="Tenant the email belongs to")
 
 class ScheduledEmailResponse(BaseModel):
     id: str
+    user_id: str = "default"
     scheduled_datetime: datetime
+    dispatch_at: Optional[datetime] = None
     recipient_email: str
     recipient_name: str
     subject: str
-    message: str
+    message: str = ""  # empty if the stored body is missing
+    html_message: Optional[str] = None
+    attachment_ids: List[str] = []
     status: str
     priority: str
     category: str
@@ -106,6 +708,7 @@ class EmailCheckResult(BaseModel):
     sent_count: int
     failed_count: int
     details: List[Dict[str, Any]]
+    queued_count: int = 0  # handed to the running dispatcher instead of sent by this request
 
 class EmailSettingsRequest(BaseModel):
     sender_email: str
@@ -131,99 +734,2196 @@ class EmailAnalytics(BaseModel):
     emails_by_category: Dict[str, int]
     recent_activity: List[Dict[str, Any]]
 
-class BulkActionRequest(BaseModel):
-    email_ids: List[str]
-    action: str  # 'delete', 'change_priority', 'change_category'
-    new_value: Optional[str] = None  # For priority/category changes
+class SuppressionRequest(BaseModel):
+    email: str
+    reason: str = Field(default="manual", description="manual, unsubscribe, hard_bounce or complaint")
+
+class SenderAccountRequest(BaseModel):
+    name: str
+    sender_email: str
+    sender_name: str = ""
+    app_password: str
+    smtp_host: str = DEFAULT_SMTP_HOST
+    smtp_port: int = DEFAULT_SMTP_PORT
+    weight: int = Field(default=1, ge=1, description="Share of traffic relative to other accounts")
+    max_per_minute: Optional[int] = Field(default=None, ge=1, description="Per-account send rate limit")
+    enabled: bool = True
+
+class LevelingPolicyRequest(BaseModel):
+    scope: str = Field(..., pattern="^(category|priority)$", description="Match emails by category or priority")
+    value: str = Field(..., description="Category or priority the policy applies to")
+    window_seconds: int = Field(default=600, ge=60, le=86400, description="How far past their due time emails may be spread")
+    max_per_minute: Optional[int] = Field(default=None, ge=1, description="Sends per minute allowed for matching emails")
+    enabled: bool = True
+
+class BulkActionRequest(BaseModel):
+    email_ids: List[str]
+    action: str  # 'delete', 'change_priority', 'change_category'
+    new_value: Optional[str] = None  # For priority/category changes
+
+class RollupBucket(BaseModel):
+    bucket_start: datetime
+    status: Dict[str, int] = {}
+    priority: Dict[str, Dict[str, int]] = {}  # priority -> status -> count
+    category: Dict[str, Dict[str, int]] = {}  # category -> status -> count
+
+class AnalyticsTimeSeries(BaseModel):
+    granularity: str
+    start: datetime
+    end: datetime
+    buckets: List[RollupBucket]
+
+# Content-addressed message body storage
+class MessageBodyStore:
+    """Stores each distinct message body once, keyed by its SHA-256 hash"""
+
+    def __init__(self, collection, cache_size: int = BODY_CACHE_SIZE,
+                 compression_threshold: int = BODY_COMPRESSION_THRESHOLD):
+        self.collection = collection
+        self.cache_size = cache_size
+        self.compression_threshold = compression_threshold
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        # body id -> monotonic time this process last refreshed its last_used_at
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def body_id_for(message: str) -> str:
+        return hashlib.sha256(message.encode("utf-8")).hexdigest()
+
+    def _remember(self, body_id: str, message: str, touched: bool = False):
+        self._cache[body_id] = message
+        self._cache.move_to_end(body_id)
+        if touched:
+            self._touched[body_id] = time.monotonic()
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._touched.pop(evicted, None)
+
+    def _recently_touched(self, body_id: str) -> bool:
+        """Whether last_used_at is fresh enough that the sweep cannot remove the body before it is referenced"""
+        touched = self._touched.get(body_id)
+        return touched is not None and time.monotonic() - touched < BODY_SWEEP_GRACE_SECONDS / 2
+
+    def _decode(self, doc: dict) -> str:
+        data = bytes(doc["data"])
+        if doc.get("encoding") == "zlib":
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    async def put(self, message: str) -> str:
+        """Store a body (if not already stored) and return its id"""
+        body_id = self.body_id_for(message)
+        if body_id in self._cache and self._recently_touched(body_id):
+            # Cached bodies are known to be persisted and safe from the sweep
+            self._cache.move_to_end(body_id)
+            return body_id
+
+        raw = message.encode("utf-8")
+        if len(raw) >= self.compression_threshold:
+            data, encoding = zlib.compress(raw, 6), "zlib"
+        else:
+            data, encoding = raw, "utf-8"
+
+        try:
+            await self.collection.update_one(
+                {"_id": body_id},
+                {"$setOnInsert": {
+                    "encoding": encoding,
+                    "data": data,
+                    "size": len(raw),
+                    "created_at": datetime.now(timezone.utc)
+                }, "$set": {"last_used_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert stored the same body first
+            pass
+
+        self._remember(body_id, message, touched=True)
+        return body_id
+
+    async def put_many(self, messages: List[str]) -> List[str]:
+        """Store several bodies with a single bulk write and return their ids in order"""
+        body_ids = [self.body_id_for(message) for message in messages]
+        uncached = {}
+        for body_id, message in zip(body_ids, messages):
+            if body_id in self._cache and self._recently_touched(body_id):
+                self._cache.move_to_end(body_id)
+            else:
+                uncached[body_id] = message
+
+        if uncached:
+            operations = []
+            for body_id, message in uncached.items():
+                raw = message.encode("utf-8")
+                if len(raw) >= self.compression_threshold:
+                    data, encoding = zlib.compress(raw, 6), "zlib"
+                else:
+                    data, encoding = raw, "utf-8"
+                operations.append(UpdateOne(
+                    {"_id": body_id},
+                    {"$setOnInsert": {
+                        "encoding": encoding,
+                        "data": data,
+                        "size": len(raw),
+                        "created_at": datetime.now(timezone.utc)
+                    }, "$set": {"last_used_at": datetime.now(timezone.utc)}},
+                    upsert=True
+                ))
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Only duplicate keys from concurrent upserts are expected here
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            for body_id, message in uncached.items():
+                self._remember(body_id, message, touched=True)
+        return body_ids
+
+    async def get_many(self, body_ids: List[str]) -> Dict[str, str]:
+        """Resolve body ids to messages, hitting the database only for cache misses"""
+        found = {}
+        missing = []
+        for body_id in set(body_ids):
+            if body_id in self._cache:
+                self._cache.move_to_end(body_id)
+                found[body_id] = self._cache[body_id]
+            else:
+                missing.append(body_id)
+
+        if missing:
+            async for doc in self.collection.find({"_id": {"$in": missing}}):
+                message = self._decode(doc)
+                self._remember(doc["_id"], message)
+                found[doc["_id"]] = message
+        return found
+
+    async def get(self, body_id: str) -> str:
+        bodies = await self.get_many([body_id])
+        if body_id not in bodies:
+            raise KeyError(f"Message body {body_id} not found")
+        return bodies[body_id]
+
+    # Body reference field -> field it is loaded into
+    HYDRATED_FIELDS = {"body_id": "message", "html_body_id": "html_message"}
+
+    async def hydrate(self, email_docs: List[dict]) -> List[dict]:
+        """Fill in 'message' and 'html_message' on scheduled email documents that only hold body references.
+
+        A field whose body is missing from the store is left unset.
+        """
+        body_ids = [
+            doc[ref] for doc in email_docs for ref, field in self.HYDRATED_FIELDS.items()
+            if field not in doc and doc.get(ref)
+        ]
+        if body_ids:
+            bodies = await self.get_many(body_ids)
+            for doc in email_docs:
+                for ref, field in self.HYDRATED_FIELDS.items():
+                    if field not in doc and doc.get(ref) in bodies:
+                        doc[field] = bodies[doc[ref]]
+                        if doc.get("template_variables"):
+                            # Imported rows share the template body and keep only their own values
+                            doc[field] = render_template_text(doc[field], doc["template_variables"])
+        return email_docs
+
+    async def _remove_unreferenced(self, body_ids: List[str], emails_collection, cutoff: datetime) -> int:
+        referenced = set()
+        for ref in self.HYDRATED_FIELDS:
+            referenced.update(await emails_collection.distinct(ref, {ref: {"$in": body_ids}}))
+        unreferenced = [body_id for body_id in body_ids if body_id not in referenced]
+        if not unreferenced:
+            return 0
+        # Re-check last_used_at so a body stored again since the scan started is kept
+        result = await self.collection.delete_many({
+            "_id": {"$in": unreferenced},
+            "$or": [{"last_used_at": {"$lt": cutoff}}, {"last_used_at": {"$exists": False}}]
+        })
+        for body_id in unreferenced:
+            self._cache.pop(body_id, None)
+            self._touched.pop(body_id, None)
+        return result.deleted_count
+
+    async def sweep(self, emails_collection, grace_seconds: int = BODY_SWEEP_GRACE_SECONDS,
+                    batch_size: int = 1000) -> int:
+        """Remove bodies no scheduled email references any more and that were not stored within the grace period.
+
+        Bodies are stored before the emails referencing them are inserted, so the grace period
+        keeps a body that is about to be referenced from being removed underneath it.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+        removed = 0
+        batch = []
+        cursor = self.collection.find(
+            {"$or": [
+                {"last_used_at": {"$lt": cutoff}},
+                {"last_used_at": {"$exists": False}, "created_at": {"$lt": cutoff}}
+            ]},
+            {"_id": 1}
+        )
+        async for doc in cursor:
+            batch.append(doc["_id"])
+            if len(batch) >= batch_size:
+                removed += await self._remove_unreferenced(batch, emails_collection, cutoff)
+                batch = []
+        if batch:
+            removed += await self._remove_unreferenced(batch, emails_collection, cutoff)
+        return removed
+
+body_store = MessageBodyStore(message_bodies_collection)
+dispatcher_body_store = MessageBodyStore(dispatcher_bodies_collection)
+
+async def run_body_sweeper():
+    """Periodically remove bodies orphaned by cancelled, deleted or rejected emails"""
+    while True:
+        await asyncio.sleep(BODY_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = await body_store.sweep(scheduled_emails_collection)
+            if removed:
+                print(f"Removed {removed} unreferenced message bodies")
+        except Exception as e:
+            print(f"Message body sweep failed: {str(e)}")
+
+body_sweeper_task: Optional[asyncio.Task] = None
+
+# Attachment storage
+class AttachmentTooLarge(Exception):
+    """Raised when an uploaded attachment exceeds ATTACHMENT_MAX_BYTES"""
+
+def attachment_object_id(attachment_id: str) -> ObjectId:
+    try:
+        return ObjectId(attachment_id)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid attachment id: {attachment_id}")
+
+class AttachmentStore:
+    """Attachment files in GridFS, with their base64-encoded MIME payloads cached in memory.
+
+    A campaign attaching the same file to thousands of emails reads and encodes it
+    once; every message built afterwards shares the cached encoded text.
+    """
+
+    def __init__(self, database, cache_bytes: int = ATTACHMENT_CACHE_BYTES):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name="attachments")
+        self.files = TimedCollection(database["attachments.files"])
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._cached_bytes = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _describe(doc: dict) -> dict:
+        return {
+            "id": str(doc["_id"]),
+            "filename": doc["filename"],
+            "content_type": (doc.get("metadata") or {}).get("content_type", "application/octet-stream"),
+            "length": doc["length"],
+            "uploaded_at": doc["uploadDate"]
+        }
+
+    async def upload(self, filename: str, content_type: str, chunks) -> dict:
+        """Write an async stream of byte chunks to GridFS without holding the whole file"""
+        grid_in = self.bucket.open_upload_stream(filename, metadata={"content_type": content_type})
+        length = 0
+        try:
+            async for chunk in chunks:
+                length += len(chunk)
+                if length > ATTACHMENT_MAX_BYTES:
+                    raise AttachmentTooLarge(f"Attachment exceeds {ATTACHMENT_MAX_BYTES} bytes")
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return {
+            "id": str(grid_in._id),
+            "filename": filename,
+            "content_type": content_type,
+            "length": length,
+            "uploaded_at": grid_in.upload_date
+        }
+
+    async def list(self) -> List[dict]:
+        docs = await self.files.find().sort("uploadDate", -1).to_list(1000)
+        return [self._describe(doc) for doc in docs]
+
+    async def missing(self, attachment_ids: List[str]) -> List[str]:
+        """Return the ids that do not refer to a stored attachment"""
+        if not attachment_ids:
+            return []
+        object_ids = []
+        for attachment_id in attachment_ids:
+            try:
+                object_ids.append(attachment_object_id(attachment_id))
+            except ValueError:
+                pass
+        found = {str(doc["_id"]) for doc in await self.files.find({"_id": {"$in": object_ids}}, {"_id": 1}).to_list(None)}
+        return [attachment_id for attachment_id in attachment_ids if attachment_id not in found]
+
+    async def delete(self, attachment_id: str) -> bool:
+        self.forget(attachment_id)
+        try:
+            await self.bucket.delete(attachment_object_id(attachment_id))
+        except NoFile:
+            return False
+        return True
+
+    def forget(self, attachment_id: str):
+        """Drop a cached payload, e.g. after another store instance deleted the file"""
+        part = self._cache.pop(attachment_id, None)
+        if part:
+            self._cached_bytes -= len(part["encoded"])
+
+    def _remember(self, attachment_id: str, part: dict):
+        size = len(part["encoded"])
+        if size > self.cache_bytes:
+            return
+        self._cache[attachment_id] = part
+        self._cached_bytes += size
+        while self._cached_bytes > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted["encoded"])
+
+    async def _load(self, attachment_id: str) -> dict:
+        grid_out = await self.bucket.open_download_stream(attachment_object_id(attachment_id))
+        # Read in multiples of 57 bytes so each piece encodes to whole 76-character lines
+        pieces = []
+        while True:
+            data = await grid_out.read(57 * 1024)
+            if not data:
+                break
+            pieces.append(base64.encodebytes(data).decode("ascii"))
+        return {
+            "filename": grid_out.filename,
+            "content_type": (grid_out.metadata or {}).get("content_type", "application/octet-stream"),
+            "encoded": "".join(pieces)
+        }
+
+    async def get_part(self, attachment_id: str) -> dict:
+        """Return filename, content type and base64 payload, loading each file at most once at a time"""
+        if attachment_id in self._cache:
+            self._cache.move_to_end(attachment_id)
+            return self._cache[attachment_id]
+        if attachment_id in self._loading:
+            return await asyncio.shield(self._loading[attachment_id])
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[attachment_id] = loading
+        try:
+            part = await self._load(attachment_id)
+            self._remember(attachment_id, part)
+            loading.set_result(part)
+            return part
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as e:
+            loading.set_exception(e)
+            # Waiters re-raise it; mark it retrieved so an unwaited failure isn't reported
+            loading.exception()
+            raise
+        finally:
+            del self._loading[attachment_id]
+
+    async def get_parts(self, attachment_ids: List[str]) -> List[dict]:
+        return [await self.get_part(attachment_id) for attachment_id in attachment_ids]
+
+attachment_store = AttachmentStore(db)
+dispatcher_attachment_store = AttachmentStore(dispatcher_db)
+
+# Versioned response cache
+class ResponseCache:
+    """Caches GET responses by path and query, invalidated through per-collection version counters.
+
+    Write paths bump the version of the collection they touch; an entry is only
+    served while every version it was computed from is unchanged. ETags are a hash
+    of the body, so a client revalidating unchanged data gets a 304.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, max_age: float = RESPONSE_CACHE_MAX_AGE_SECONDS):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, *collections: str):
+        for collection in collections:
+            self.versions[collection] = self.versions.get(collection, 0) + 1
+
+    @staticmethod
+    def _etag_matches(request: Request, etag: str) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+        return "*" in candidates or etag in candidates
+
+    async def respond(self, request: Request, collections: tuple, compute) -> Response:
+        """Serve the cached body for this request or compute, cache and serve a fresh one"""
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        versions = tuple(self.versions.get(collection, 0) for collection in collections)
+        entry = self._entries.get(key)
+        if entry and entry["versions"] == versions and time.monotonic() - entry["cached_at"] < self.max_age:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            cache_status = "hit"
+        else:
+            # Versions are read before computing, so a write that lands meanwhile invalidates this entry
+            body = TimedJSONResponse(jsonable_encoder(await compute())).body
+            entry = {
+                "versions": versions,
+                "cached_at": time.monotonic(),
+                "body": body,
+                "etag": f'"{hashlib.sha1(body).hexdigest()}"'
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+            cache_status = "miss"
+
+        # no-cache makes browsers revalidate with If-None-Match instead of reusing the body blindly
+        headers = {"ETag": entry["etag"], "Cache-Control": "no-cache", "X-Cache": cache_status}
+        if self._etag_matches(request, entry["etag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(entry["body"], media_type="application/json", headers=headers)
+
+    def cached(self, *collections: str):
+        """Decorator for GET endpoints that take a `request: Request` parameter"""
+        def decorator(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                return await self.respond(kwargs["request"], collections, lambda: endpoint(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "versions": dict(self.versions)}
+
+response_cache = ResponseCache()
+
+# Time-bucketed analytics rollups
+def _rollup_key(value: Any) -> str:
+    """Make a priority/category value safe to use as a MongoDB field name"""
+    return str(value).replace(".", "_").replace("$", "_") or "unknown"
+
+def _as_utc(moment: datetime) -> datetime:
+    # Motor returns naive datetimes that are already in UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def rollup_bucket_start(moment: datetime, granularity: str) -> datetime:
+    bucket = _as_utc(moment).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        bucket = bucket.replace(hour=0)
+    return bucket
+
+async def record_status_changes(email_docs: List[dict], status: str, at: Optional[datetime] = None,
+                                rollups_collection=email_rollups_collection):
+    """Increment the hourly and daily rollups for emails entering a status"""
+    if not email_docs:
+        return
+    # Every status change goes through here, so it also invalidates cached analytics
+    response_cache.bump("scheduled_emails")
+
+    at = at or datetime.now(timezone.utc)
+    increments: Dict[str, int] = {}
+    for email in email_docs:
+        priority = _rollup_key(email.get("priority", "normal"))
+        category = _rollup_key(email.get("category", "general"))
+        for field in (f"status.{status}", f"priority.{priority}.{status}", f"category.{category}.{status}"):
+            increments[field] = increments.get(field, 0) + 1
+
+    try:
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket_start = rollup_bucket_start(at, granularity)
+            await rollups_collection.update_one(
+                {"_id": f"{granularity}:{bucket_start.isoformat()}"},
+                {
+                    "$inc": increments,
+                    "$setOnInsert": {"granularity": granularity, "bucket_start": bucket_start}
+                },
+                upsert=True
+            )
+    except Exception as e:
+        # Rollups are derived data; never fail the state change because of them
+        print(f"Failed to update analytics rollups: {str(e)}")
+
+# Live scheduled email change events
+class EmailEventSubscription:
+    """Per-client buffer that coalesces events for the same email between flushes"""
+
+    def __init__(self):
+        self._pending: "OrderedDict[str, dict]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: dict):
+        if event["type"] == "resync" or len(self._pending) >= EVENT_MAX_PENDING:
+            # The client has fallen too far behind; it should refetch instead
+            self._pending.clear()
+            self._pending["*"] = {"type": "resync"}
+        elif "*" not in self._pending:
+            email_id = event["id"]
+            previous = self._pending.pop(email_id, None)
+            if previous and previous["type"] == "created":
+                if event["type"] == "deleted":
+                    # Created and deleted within one window: the client never needs to know
+                    return
+                event = {key: value for key, value in event.items() if key != "previous"}
+                event["type"] = "created"
+            elif previous:
+                # Clients adjust counts from the state before the first coalesced change
+                event = {key: value for key, value in event.items() if key != "previous"}
+                if "previous" in previous:
+                    event["previous"] = previous["previous"]
+            self._pending[email_id] = event
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float) -> List[dict]:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        await asyncio.sleep(EVENT_COALESCE_MS / 1000)
+        events = list(self._pending.values())
+        self._pending.clear()
+        self._wakeup.clear()
+        return events
+
+class EmailEventBroker:
+    """Feeds scheduled email changes to subscribers from a change stream, or by polling on standalone mongod"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.mode: Optional[str] = None
+        self._subscribers: set = set()
+        self._feed_task: Optional[asyncio.Task] = None
+        # Polling only: recently seen email states, and deletes this process already published
+        self._states: "OrderedDict[str, tuple]" = OrderedDict()
+        self._local_deletes = 0
+
+    def subscribe(self) -> EmailEventSubscription:
+        subscription = EmailEventSubscription()
+        self._subscribers.add(subscription)
+        if self._feed_task is None or self._feed_task.done():
+            self._feed_task = asyncio.create_task(self._run_feed())
+        return subscription
+
+    def unsubscribe(self, subscription: EmailEventSubscription):
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._feed_task:
+            # Nobody is listening; stop watching the database
+            self._feed_task.cancel()
+            self._feed_task = None
+            self.mode = None
+
+    def publish(self, event: dict):
+        for subscription in self._subscribers:
+            subscription.push(event)
+
+    @staticmethod
+    def _state(email: dict) -> tuple:
+        return (email.get("status"), email.get("priority"), email.get("category"), email.get("sent_at"))
+
+    @staticmethod
+    def _previous(email: Optional[dict]) -> Optional[dict]:
+        """The counted fields of an email before a change, for clients keeping running totals"""
+        if not email:
+            return None
+        return {"status": email.get("status"), "priority": email.get("priority"), "category": email.get("category")}
+
+    def publish_deleted(self, email_docs: List[dict]):
+        """Publish deletes made by this process; polling cannot see deleted documents"""
+        if self.mode != "polling":
+            return
+        for email in email_docs:
+            self._states.pop(email["id"], None)
+            self._local_deletes += 1
+            self.publish({"type": "deleted", "id": email["id"], "previous": self._previous(email)})
+
+    async def enable_pre_images(self):
+        """Ask MongoDB (6.0+) to keep pre-images so delete events carry the email id"""
+        try:
+            await self.collection.database.command(
+                "collMod", self.collection.name, changeStreamPreAndPostImages={"enabled": True}
+            )
+        except Exception as e:
+            print(f"Change stream pre-images not enabled: {str(e)}")
+
+    async def _publish_documents(self, event_type: str, email_docs: List[dict],
+                                 previous: Optional[Dict[str, dict]] = None):
+        await body_store.hydrate(email_docs)
+        for email in email_docs:
+            event = {
+                "type": event_type,
+                "id": email["id"],
+                "email": ScheduledEmailResponse(**email).model_dump(mode="json")
+            }
+            if previous and previous.get(email["id"]):
+                event["previous"] = previous[email["id"]]
+            self.publish(event)
+
+    async def _run_feed(self):
+        watch_options = {"full_document": "updateLookup", "full_document_before_change": "whenAvailable"}
+        while True:
+            try:
+                await self._watch_change_stream(watch_options)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == 40573:
+                    # Change streams need a replica set
+                    await self._poll_changes()
+                    return
+                if "full_document_before_change" in watch_options:
+                    # Servers before 6.0 do not know about pre-images
+                    watch_options.pop("full_document_before_change")
+                    continue
+                print(f"Email change stream failed: {str(e)}")
+            except Exception as e:
+                print(f"Email change stream interrupted: {str(e)}")
+            self.publish({"type": "resync"})
+            await asyncio.sleep(EVENT_POLL_INTERVAL_SECONDS)
+
+    async def _watch_change_stream(self, watch_options: dict):
+        async with self.collection.watch(**watch_options) as stream:
+            self.mode = "change_stream"
+            async for change in stream:
+                operation = change["operationType"]
+                before = change.get("fullDocumentBeforeChange")
+                if operation in ("insert", "update", "replace"):
+                    email = change.get("fullDocument")
+                    if email is not None:
+                        await self._publish_documents(
+                            "created" if operation == "insert" else "updated", [email],
+                            {email["id"]: self._previous(before)}
+                        )
+                elif operation == "delete":
+                    if before and before.get("id"):
+                        self.publish({"type": "deleted", "id": before["id"], "previous": self._previous(before)})
+                    else:
+                        self.publish({"type": "resync"})
+                else:
+                    self.publish({"type": "resync"})
+
+    def _remember_state(self, email_id: str, state: tuple):
+        self._states[email_id] = state
+        self._states.move_to_end(email_id)
+        while len(self._states) > EVENT_STATE_CACHE_SIZE:
+            self._states.popitem(last=False)
+
+    async def _poll_changes(self):
+        """Poll the updated_at index for emails changed since the last poll.
+
+        The window overlaps the previous one so writes that commit late are still seen;
+        emails whose state did not change since they were last published are skipped.
+        Deletes by other processes are only noticed through the collection count, as a resync.
+        """
+        self.mode = "polling"
+        self._states.clear()
+        self._local_deletes = 0
+        since = datetime.now(timezone.utc)
+        count = await self.collection.estimated_document_count()
+        while True:
+            await asyncio.sleep(EVENT_POLL_INTERVAL_SECONDS)
+            polled_at = datetime.now(timezone.utc)
+            try:
+                changed = await self.collection.find(
+                    {"updated_at": {"$gte": since - timedelta(seconds=EVENT_POLL_OVERLAP_SECONDS)}}
+                ).sort("updated_at", 1).limit(EVENT_POLL_BATCH).to_list(length=None)
+                current_count = await self.collection.estimated_document_count()
+            except Exception as e:
+                print(f"Email change polling failed: {str(e)}")
+                continue
+
+            since = polled_at
+            if len(changed) >= EVENT_POLL_BATCH:
+                # More changed than is worth streaming; clients refetch instead
+                self._states.clear()
+                self.publish({"type": "resync"})
+                count, self._local_deletes = current_count, 0
+                continue
+
+            created, updated, previous = [], [], {}
+            for email in changed:
+                state = self._state(email)
+                known = self._states.get(email["id"])
+                if known == state:
+                    continue
+                if email.get("updated_at") == email.get("created_at"):
+                    created.append(email)
+                else:
+                    updated.append(email)
+                    if known:
+                        previous[email["id"]] = {"status": known[0], "priority": known[1], "category": known[2]}
+                self._remember_state(email["id"], state)
+
+            for event_type, docs in (("created", created), ("updated", updated)):
+                if docs:
+                    await self._publish_documents(event_type, docs, previous)
+
+            if current_count < count + len(created) - self._local_deletes:
+                # Another process deleted emails we cannot name
+                self.publish({"type": "resync"})
+            count, self._local_deletes = current_count, 0
+
+event_broker = EmailEventBroker(scheduled_emails_collection)
+
+# Sender account pool
+class NoSenderAvailable(Exception):
+    """Every configured sender account is disabled, cooling down or rate limited"""
+
+class SenderPool:
+    """Spreads outgoing mail across sender accounts and takes failing accounts out of rotation"""
+
+    def __init__(self, collection, strategy: str = SENDER_BALANCING):
+        self.collection = collection
+        self.strategy = strategy
+        self._accounts: List[dict] = []
+        self._loaded_at: Optional[datetime] = None
+        self._state: Dict[str, dict] = {}
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _load_accounts(self):
+        now = datetime.now(timezone.utc)
+        if self._loaded_at and (now - self._loaded_at).total_seconds() < SENDER_ACCOUNTS_REFRESH_SECONDS:
+            return
+        self._accounts = await self.collection.find({"enabled": True}).to_list(length=None)
+        self._loaded_at = now
+        for account in self._accounts:
+            self._state.setdefault(account["id"], {
+                "current_weight": 0,
+                "in_flight": 0,
+                "sent": 0,
+                "failed": 0,
+                "consecutive_failures": 0,
+                "cooldown_until": None,
+                "last_error": None,
+                "recent_sends": deque()
+            })
+
+    def _recent_sends(self, state: dict, window_seconds: int, now: datetime) -> int:
+        recent = state["recent_sends"]
+        while recent and (now - recent[0]).total_seconds() > SENDER_STATS_WINDOW_SECONDS:
+            recent.popleft()
+        return sum(1 for sent_at in recent if (now - sent_at).total_seconds() <= window_seconds)
+
+    def _is_available(self, account: dict, now: datetime) -> bool:
+        state = self._state[account["id"]]
+        if state["cooldown_until"] and state["cooldown_until"] > now:
+            return False
+        max_per_minute = account.get("max_per_minute")
+        if max_per_minute and self._recent_sends(state, 60, now) + state["in_flight"] >= max_per_minute:
+            return False
+        return True
+
+    async def acquire(self) -> Optional[dict]:
+        """Pick an account for the next send, or None when no accounts are configured"""
+        await self._load_accounts()
+        if not self._accounts:
+            return None
+
+        now = datetime.now(timezone.utc)
+        candidates = [account for account in self._accounts if self._is_available(account, now)]
+        if not candidates:
+            raise NoSenderAvailable("All sender accounts are cooling down or rate limited")
+
+        if self.strategy == "least_loaded":
+            chosen = min(candidates, key=lambda account: (
+                self._state[account["id"]]["in_flight"] / account.get("weight", 1),
+                self._recent_sends(self._state[account["id"]], 60, now) / account.get("weight", 1)
+            ))
+        else:
+            # Smooth weighted round robin
+            total_weight = 0
+            chosen = None
+            for account in candidates:
+                state = self._state[account["id"]]
+                state["current_weight"] += account.get("weight", 1)
+                total_weight += account.get("weight", 1)
+                if chosen is None or state["current_weight"] > self._state[chosen["id"]]["current_weight"]:
+                    chosen = account
+            self._state[chosen["id"]]["current_weight"] -= total_weight
+
+        self._state[chosen["id"]]["in_flight"] += 1
+        return chosen
+
+    def release(self, account: Optional[dict], success: Optional[bool], error: Optional[str] = None,
+                sender_failure: bool = True):
+        """Return an account after a send attempt; success=None means nothing was sent.
+
+        Only sender failures (connection, login, MAIL FROM) count towards the cooldown.
+        """
+        if account is None:
+            return
+        state = self._state[account["id"]]
+        now = datetime.now(timezone.utc)
+        state["in_flight"] -= 1
+        if success is None:
+            return
+        if success:
+            state["sent"] += 1
+            state["consecutive_failures"] = 0
+            state["recent_sends"].append(now)
+        else:
+            state["failed"] += 1
+            state["last_error"] = error
+            if not sender_failure:
+                # The account got as far as the recipient, so it is working
+                state["consecutive_failures"] = 0
+                return
+            state["consecutive_failures"] += 1
+            if state["consecutive_failures"] >= SENDER_FAILURE_THRESHOLD:
+                state["cooldown_until"] = now + timedelta(seconds=SENDER_COOLDOWN_SECONDS)
+                state["consecutive_failures"] = 0
+                print(f"Sender account {account['sender_email']} taken out of rotation until {state['cooldown_until'].isoformat()}")
+
+    def stats(self) -> Dict[str, dict]:
+        now = datetime.now(timezone.utc)
+        stats = {}
+        for account_id, state in self._state.items():
+            cooling_down = bool(state["cooldown_until"] and state["cooldown_until"] > now)
+            recent = self._recent_sends(state, SENDER_STATS_WINDOW_SECONDS, now)
+            stats[account_id] = {
+                "healthy": not cooling_down,
+                "cooldown_until": state["cooldown_until"].isoformat() if cooling_down else None,
+                "in_flight": state["in_flight"],
+                "sent": state["sent"],
+                "failed": state["failed"],
+                "sent_last_minute": self._recent_sends(state, 60, now),
+                "throughput_per_minute": round(recent / (SENDER_STATS_WINDOW_SECONDS / 60), 2),
+                "last_error": state["last_error"]
+            }
+        return stats
+
+def settings_from_account(account: dict) -> dict:
+    return {
+        'smtp_host': account.get('smtp_host', DEFAULT_SMTP_HOST),
+        'smtp_port': account.get('smtp_port', DEFAULT_SMTP_PORT),
+        'username': account['sender_email'],
+        'password': account['app_password'],
+        'sender_email': account['sender_email'],
+        'sender_name': account.get('sender_name') or account['sender_email']
+    }
+
+sender_pool = SenderPool(dispatcher_sender_accounts_collection)
+
+# Structured delivery logging
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            **getattr(record, "delivery", {})
+        }, default=str)
+
+class DeliveryLog:
+    """Structured per-send log; records are written by a background thread, never on the event loop"""
+
+    def __init__(self, success_sample_rate: float = DELIVERY_LOG_SUCCESS_SAMPLE_RATE,
+                 buffer_size: int = DELIVERY_LOG_BUFFER_SIZE):
+        self.success_sample_rate = success_sample_rate
+        self.recent: deque = deque(maxlen=buffer_size)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonLogFormatter())
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+
+        self.logger = logging.getLogger("email_delivery")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(logging.handlers.QueueHandler(self._queue))
+
+    def start(self):
+        self._listener.start()
+
+    def stop(self):
+        # Flushes everything still queued
+        self._listener.stop()
+
+    def record(self, outcome: str, recipient: str, duration_ms: float, email_id: Optional[str] = None,
+               smtp_code: Optional[int] = None, attempt: int = 1, sender: Optional[str] = None,
+               error: Optional[str] = None):
+        event = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "outcome": outcome,
+            "email_id": email_id,
+            "recipient_domain": recipient.rsplit("@", 1)[-1].lower(),
+            "sender": sender,
+            "smtp_code": smtp_code,
+            "duration_ms": round(duration_ms, 1),
+            "attempt": attempt,
+            "error": error
+        }
+        # The ring buffer keeps every event; only successes written to the log are sampled
+        self.recent.append(event)
+        if outcome == "sent" and random.random() >= self.success_sample_rate:
+            return
+        self.logger.log(logging.INFO if outcome == "sent" else logging.WARNING,
+                        f"email_{outcome}", extra={"delivery": event})
+
+def smtp_error_code(error: Exception) -> Optional[int]:
+    """Extract the SMTP reply code from an smtplib exception, if it carries one"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code
+    if isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        return next(iter(error.recipients.values()))[0]
+    return None
+
+delivery_log = DeliveryLog()
+
+# Suppression list
+class SuppressionIndex:
+    """In-process set of suppressed addresses, refreshed incrementally from MongoDB"""
+
+    def __init__(self, collection, refresh_collection=None):
+        self.collection = collection
+        # Refreshes are driven by the send pipeline, so they can go through its own client
+        self.refresh_collection = refresh_collection or collection
+        self._addresses: set = set()
+        self._last_seen: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def normalize(address: str) -> str:
+        return address.strip().lower()
+
+    def is_suppressed(self, address: str) -> bool:
+        return self.normalize(address) in self._addresses
+
+    def __len__(self):
+        return len(self._addresses)
+
+    async def ensure_fresh(self):
+        now = time.monotonic()
+        if now - self._refreshed_at < SUPPRESSION_REFRESH_SECONDS:
+            return
+        async with self._lock:
+            if now - self._refreshed_at < SUPPRESSION_REFRESH_SECONDS:
+                return
+            full_reload = now - self._reloaded_at >= SUPPRESSION_FULL_RELOAD_SECONDS
+            query = {} if full_reload or self._last_seen is None else {"created_at": {"$gt": self._last_seen}}
+            addresses = set() if full_reload else self._addresses
+            async for entry in self.refresh_collection.find(query, {"_id": 0, "email": 1, "created_at": 1}):
+                addresses.add(entry["email"])
+                if self._last_seen is None or entry["created_at"] > self._last_seen:
+                    self._last_seen = entry["created_at"]
+            self._addresses = addresses
+            self._refreshed_at = now
+            if full_reload:
+                self._reloaded_at = now
+
+    async def add(self, address: str, reason: str, source: str = "api", smtp_code: Optional[int] = None,
+                  collection=None) -> bool:
+        """Suppress an address; returns False if it was already suppressed"""
+        address = self.normalize(address)
+        result = await (collection or self.collection).update_one(
+            {"email": address},
+            {"$setOnInsert": {
+                "email": address,
+                "reason": reason,
+                "source": source,
+                "smtp_code": smtp_code,
+                "created_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+        self._addresses.add(address)
+        return result.upserted_id is not None
+
+    async def remove(self, address: str) -> bool:
+        address = self.normalize(address)
+        result = await self.collection.delete_one({"email": address})
+        self._addresses.discard(address)
+        return result.deleted_count > 0
+
+def is_hard_bounce(error: Exception) -> bool:
+    return (isinstance(error, smtplib.SMTPRecipientsRefused)
+            and smtp_error_code(error) in SUPPRESSION_HARD_BOUNCE_CODES)
+
+def is_sender_failure(error: Exception) -> bool:
+    """Whether a send error says something about the sender account rather than the recipient or message.
+
+    Refused recipients and rejected message data mean the server already accepted the
+    connection, login and MAIL FROM, so they must not take the account out of rotation.
+    """
+    return not isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError))
+
+suppression_index = SuppressionIndex(suppressions_collection, dispatcher_suppressions_collection)
+
+# Streamed SMTP DATA
+_BARE_LINE_ENDING = re.compile(rb"(?:\r\n|\n|\r(?!\n))")
+_DOT_AT_LINE_START = re.compile(rb"(?m)^\.")
+
+class SMTPDataWriter:
+    """File-like sink that writes a message to an open SMTP DATA command in chunks.
+
+    Line endings are normalised to CRLF and leading dots are doubled as the message
+    is written, and no single socket send is larger than chunk_size.
+    """
+
+    def __init__(self, server: smtplib.SMTP, chunk_size: int = SMTP_DATA_CHUNK_BYTES):
+        self.server = server
+        self.chunk_size = chunk_size
+        self._pending = bytearray()
+        self._ends_with_crlf = False
+
+    def write(self, data):
+        data = data.encode("utf-8") if isinstance(data, str) else data
+        for start in range(0, len(data), self.chunk_size):
+            self._pending += data[start:start + self.chunk_size]
+            if len(self._pending) >= self.chunk_size:
+                self._send(final=False)
+
+    def _send(self, final: bool):
+        # Only complete lines are sent, so a line split across writes is stuffed correctly
+        cut = len(self._pending) if final else self._pending.rfind(b"\n") + 1
+        if not cut:
+            return
+        chunk = bytes(self._pending[:cut])
+        del self._pending[:cut]
+        chunk = _DOT_AT_LINE_START.sub(b"..", _BARE_LINE_ENDING.sub(b"\r\n", chunk))
+        for start in range(0, len(chunk), self.chunk_size):
+            self.server.send(chunk[start:start + self.chunk_size])
+        self._ends_with_crlf = chunk.endswith(b"\r\n")
+
+    def close(self):
+        self._send(final=True)
+        self.server.send(b".\r\n" if self._ends_with_crlf else b"\r\n.\r\n")
+
+def write_message(out, message: Message, chunk_size: int = SMTP_DATA_CHUNK_BYTES):
+    """Write a message as Generator(mangle_from_=False, maxheaderlen=0) would, one piece at a time.
+
+    Generator flattens every subpart into a string before writing it; here headers and
+    boundaries are written directly and each payload in chunk_size slices, so a large
+    attachment's encoded text is never copied.
+    """
+    payload = message.get_payload()
+    multipart = message.get_content_maintype() == "multipart" and isinstance(payload, list)
+    if not multipart and not isinstance(payload, (str, type(None))):
+        # Embedded messages and the like; not something build_message produces
+        Generator(out, mangle_from_=False, maxheaderlen=0).flatten(message)
+        return
+    if multipart and not message.get_boundary():
+        message.set_boundary(f"==============={uuid.uuid4().hex}==")
+    policy = message.policy.clone(max_line_length=0)
+    for name, value in message.raw_items():
+        out.write(policy.fold(name, value))
+    out.write("\n")
+
+    if not multipart:
+        for start in range(0, len(payload or ""), chunk_size):
+            out.write(payload[start:start + chunk_size])
+        return
+
+    boundary = message.get_boundary()
+    if message.preamble is not None:
+        out.write(message.preamble + "\n")
+    out.write(f"--{boundary}\n")
+    for index, part in enumerate(payload):
+        if index:
+            out.write(f"\n--{boundary}\n")
+        write_message(out, part, chunk_size)
+    out.write(f"\n--{boundary}--\n")
+    if message.epilogue is not None:
+        out.write(message.epilogue)
+
+def attachment_mime_part(attachment: dict) -> MIMEBase:
+    """Wrap a cached, already base64-encoded attachment payload in a MIME part"""
+    maintype, _, subtype = attachment["content_type"].partition("/")
+    part = MIMEBase(maintype or "application", subtype or "octet-stream")
+    part.set_payload(attachment["encoded"])
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=attachment["filename"])
+    return part
+
+# Email service class
+class EmailService:
+    def __init__(self):
+        self.default_settings = {
+            'smtp_host': DEFAULT_SMTP_HOST,
+            'smtp_port': DEFAULT_SMTP_PORT,
+            'username': DEFAULT_USERNAME,
+            'password': DEFAULT_APP_PASSWORD,
+            'sender_email': DEFAULT_SENDER_EMAIL,
+            'sender_name': 'Scheduled Email App'
+        }
+        # user_id -> (loaded at, settings or None when the tenant has saved none)
+        self._tenant_settings: Dict[str, tuple] = {}
+
+    def _settings_from_document(self, settings: dict) -> dict:
+        return {
+            'smtp_host': settings.get('smtp_host', self.default_settings['smtp_host']),
+            'smtp_port': settings.get('smtp_port', self.default_settings['smtp_port']),
+            'username': settings['sender_email'],
+            'password': settings['app_password'],
+            'sender_email': settings['sender_email'],
+            'sender_name': settings.get('sender_name', settings['sender_email'])
+        }
+
+    async def get_email_settings(self, user_id: str = "default") -> dict:
+        """Get email settings for user"""
+        settings = await email_settings_collection.find_one({"user_id": user_id})
+        if settings:
+            return self._settings_from_document(settings)
+        return self.default_settings
+
+    async def get_tenant_settings(self, user_id: str) -> Optional[dict]:
+        """The tenant's own settings, cached for the dispatcher; None when it has saved none"""
+        now = time.monotonic()
+        cached = self._tenant_settings.get(user_id)
+        if cached and now - cached[0] < TENANT_SETTINGS_CACHE_SECONDS:
+            return cached[1]
+        document = await email_settings_collection.find_one({"user_id": user_id})
+        settings = self._settings_from_document(document) if document else None
+        self._tenant_settings[user_id] = (now, settings)
+        return settings
+
+    def invalidate_tenant_settings(self, user_id: str):
+        self._tenant_settings.pop(user_id, None)
+
+    def build_message(self, settings: dict, recipient: str, recipient_name: str, subject: str, body: str,
+                      html_body: Optional[str] = None, attachments: Optional[List[dict]] = None,
+                      message_id: Optional[str] = None) -> Message:
+        """Render the MIME message for one recipient"""
+        msg = MIMEMultipart()
+        sender_display = f"{settings['sender_name']} <{settings['sender_email']}>" if settings['sender_name'] else settings['sender_email']
+        recipient_display = f"{recipient_name} <{recipient}>" if recipient_name else recipient
+        
+        msg['From'] = sender_display
+        msg['To'] = recipient_display
+        msg['Subject'] = subject
+        if message_id:
+            msg['Message-ID'] = message_id
+        if html_body:
+            alternative = MIMEMultipart('alternative')
+            alternative.attach(MIMEText(body, 'plain'))
+            alternative.attach(MIMEText(html_body, 'html'))
+            msg.attach(alternative)
+        else:
+            msg.attach(MIMEText(body, 'plain'))
+        for attachment in attachments or []:
+            msg.attach(attachment_mime_part(attachment))
+        return msg
+
+    @staticmethod
+    def send_data(server: smtplib.SMTP, sender: str, recipient: str, message: Message):
+        """Run MAIL/RCPT/DATA and stream the message body instead of sending it as one string"""
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(sender)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, response, sender)
+        code, response = server.rcpt(recipient)
+        if code not in (250, 251):
+            raise smtplib.SMTPRecipientsRefused({recipient: (code, response)})
+        code, response = server.docmd("data")
+        if code != 354:
+            raise smtplib.SMTPDataError(code, response)
+        writer = SMTPDataWriter(server)
+        write_message(writer, message)
+        writer.close()
+        code, response = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+
+    def transmit(self, settings: dict, recipient: str, message: Message):
+        """Hand a rendered message to the SMTP server (blocking)"""
+        with smtplib.SMTP(settings['smtp_host'], settings['smtp_port']) as server:
+            server.starttls()
+            server.login(settings['username'], settings['password'])
+            self.send_data(server, settings['sender_email'], recipient, message)
+
+    async def deliver(self, settings: dict, recipient: str, message: Message, email_id: Optional[str] = None,
+                      attempt: int = 1) -> Optional[Exception]:
+        """Transmit on a worker thread so the event loop keeps serving other work.
+
+        Returns None once the server accepted the message, otherwise the error that stopped it.
+        """
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.transmit, settings, recipient, message)
+            delivery_log.record("sent", recipient, (time.perf_counter() - started) * 1000, email_id=email_id,
+                                smtp_code=250, attempt=attempt, sender=settings['sender_email'])
+            return None
+        except Exception as e:
+            delivery_log.record("failed", recipient, (time.perf_counter() - started) * 1000, email_id=email_id,
+                                smtp_code=smtp_error_code(e), attempt=attempt, sender=settings['sender_email'],
+                                error=str(e))
+            if is_hard_bounce(e):
+                # Never spend another SMTP round trip on this address
+                await suppression_index.add(recipient, "hard_bounce", source="smtp", smtp_code=smtp_error_code(e),
+                                            collection=dispatcher_suppressions_collection)
+            return e
+
+    async def send_email(self, recipient: str, recipient_name: str, subject: str, body: str, user_id: str = "default",
+                         account: Optional[dict] = None, email_id: Optional[str] = None, attempt: int = 1) -> bool:
+        """Send email using the given sender account, or the user's custom settings or default"""
+        settings = {}
+        try:
+            settings = settings_from_account(account) if account else await self.get_email_settings(user_id)
+            message = self.build_message(settings, recipient, recipient_name, subject, body)
+        except Exception as e:
+            delivery_log.record("failed", recipient, 0.0, email_id=email_id, attempt=attempt,
+                                sender=settings.get('sender_email'), error=str(e))
+            return False
+        return await self.deliver(settings, recipient, message, email_id=email_id, attempt=attempt) is None
+
+    async def create_recurring_emails(self, base_email: dict) -> List[dict]:
+        """Create recurring email instances based on pattern"""
+        if not base_email.get('is_recurring') or not base_email.get('recurring_pattern'):
+            return []
+
+        pattern = base_email['recurring_pattern']
+        end_date = base_email.get('recurring_end_date')
+        current_date = base_email['scheduled_datetime']
+        
+        # Instances share the base email's body reference; Mongo's _id must not be copied
+        base_fields = {k: v for k, v in base_email.items() if k != "_id"}
+        recurring_emails = []
+        created_at = datetime.now(timezone.utc)
+
+        # Create up to 52 instances (1 year worth)
+        for i in range(1, 53):
+            if pattern == 'daily':
+                next_date = current_date + timedelta(days=i)
+            elif pattern == 'weekly':
+                next_date = current_date + timedelta(weeks=i)
+            elif pattern == 'monthly':
+                next_date = current_date + timedelta(weeks=i*4)  # Approximate monthly
+            else:
+                break
+                
+            if end_date and next_date > end_date:
+                break
+                
+            recurring_emails.append({
+                **base_fields,
+                "id": str(uuid.uuid4()),
+                "scheduled_datetime": next_date,
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+
+        if recurring_emails:
+            await leveling_planner.assign(recurring_emails)
+            await scheduled_emails_collection.insert_many(recurring_emails)
+        return recurring_emails
+
+# Initialize email service
+email_service = EmailService()
+
+# Staged send pipeline
+PIPELINE_STAGES = ("fetch", "render", "build", "transmit", "record")
+
+class SendPipeline:
+    """Sends due emails through fetch -> render -> build MIME -> transmit -> record stages.
+
+    Stages are joined by bounded queues and each runs its own pool of workers, so
+    database reads, rendering and SMTP overlap. A slow SMTP server fills the
+    queues in front of it and fetching pauses instead of buffering the backlog.
+    """
+
+    def __init__(self, queue_size: int = PIPELINE_QUEUE_SIZE, concurrency: Optional[Dict[str, int]] = None):
+        self.queue_size = queue_size
+        self.concurrency = {"fetch": 1, **(concurrency or PIPELINE_CONCURRENCY)}
+        self._totals = {
+            stage: {"processed": 0, "errors": 0, "busy_seconds": 0.0, "completed_at": deque()}
+            for stage in PIPELINE_STAGES
+        }
+        self._active_queues: List[Dict[str, asyncio.Queue]] = []
+        # Emails currently inside any run, so overlapping runs never send the same email twice
+        self._in_flight: set = set()
+
+    def _completed(self, stage: str, started: float, error: bool = False):
+        totals = self._totals[stage]
+        now = time.monotonic()
+        totals["processed"] += 1
+        totals["errors"] += int(error)
+        totals["busy_seconds"] += now - started
+        completed_at = totals["completed_at"]
+        completed_at.append(now)
+        while completed_at and now - completed_at[0] > PIPELINE_THROUGHPUT_WINDOW_SECONDS:
+            completed_at.popleft()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        stages = {}
+        for stage in PIPELINE_STAGES:
+            totals = self._totals[stage]
+            recent = sum(1 for completed in totals["completed_at"] if now - completed <= PIPELINE_THROUGHPUT_WINDOW_SECONDS)
+            stages[stage] = {
+                "concurrency": self.concurrency[stage],
+                "queue_depth": sum(queues[stage].qsize() for queues in self._active_queues if stage in queues),
+                "queue_capacity": None if stage == "fetch" else self.queue_size,
+                "processed": totals["processed"],
+                "errors": totals["errors"],
+                "busy_seconds": round(totals["busy_seconds"], 3),
+                "throughput_per_second": round(recent / PIPELINE_THROUGHPUT_WINDOW_SECONDS, 2)
+            }
+        return {"active_runs": len(self._active_queues), "stages": stages}
+
+    async def run(self, source, on_done=None, keep_details: bool = True) -> dict:
+        """Push every email produced by the async iterator through the stages.
+
+        on_done, if given, is called with each email document once it leaves the pipeline.
+        Runs over an endless source pass keep_details=False so per-email details don't pile up.
+        """
+        queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in PIPELINE_STAGES[1:]}
+        run = {
+            "checked_count": 0, "sent_count": 0, "failed_count": 0, "details": [] if keep_details else None,
+            "in_flight": set(), "on_done": on_done
+        }
+        self._active_queues.append(queues)
+        tasks = [
+            asyncio.ensure_future(self._fetch(source, queues["render"], run)),
+            asyncio.ensure_future(self._stage("render", self._render, queues["render"], queues["build"], run)),
+            asyncio.ensure_future(self._stage("build", self._build, queues["build"], queues["transmit"], run)),
+            asyncio.ensure_future(self._stage("transmit", self._transmit, queues["transmit"], queues["record"], run)),
+            asyncio.ensure_future(self._stage("record", self._record, queues["record"], None, run)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self._active_queues.remove(queues)
+            self._in_flight -= run["in_flight"]
+        return {
+            "checked_count": run["checked_count"], "sent_count": run["sent_count"],
+            "failed_count": run["failed_count"], "details": run["details"] or []
+        }
+
+    async def _fetch(self, source, outbox: asyncio.Queue, run: dict):
+        iterator = source.__aiter__()
+        while True:
+            started = time.monotonic()
+            try:
+                email_doc = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            self._completed("fetch", started)
+            if email_doc["id"] in self._in_flight:
+                if run["on_done"]:
+                    run["on_done"](email_doc)
+                continue
+            self._in_flight.add(email_doc["id"])
+            run["in_flight"].add(email_doc["id"])
+            run["checked_count"] += 1
+            # Blocks while the next stage is full
+            await outbox.put({"email": email_doc})
+        for _ in range(self.concurrency["render"]):
+            await outbox.put(None)
+
+    async def _stage(self, stage: str, handler, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], run: dict):
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                started = time.monotonic()
+                error = False
+                # Jobs that already have an outcome skip straight through to the record stage
+                if "outcome" not in job or outbox is None:
+                    try:
+                        await handler(job, run)
+                    except Exception as e:
+                        job["outcome"] = "failed"
+                        job["error"] = str(e)
+                        error = True
+                self._completed(stage, started, error)
+                if outbox is not None:
+                    await outbox.put(job)
+                else:
+                    self._in_flight.discard(job["email"]["id"])
+                    run["in_flight"].discard(job["email"]["id"])
+                    if run["on_done"]:
+                        run["on_done"](job["email"])
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency[stage])))
+        if outbox is not None:
+            next_stage = PIPELINE_STAGES[PIPELINE_STAGES.index(stage) + 1]
+            for _ in range(self.concurrency[next_stage]):
+                await outbox.put(None)
+
+    async def _render(self, job: dict, run: dict):
+        email_doc = job["email"]
+        await suppression_index.ensure_fresh()
+        if suppression_index.is_suppressed(email_doc["recipient_email"]):
+            job["outcome"] = "suppressed"
+            return
+        await dispatcher_body_store.hydrate([email_doc])
+        if "message" not in email_doc:
+            raise ValueError("Email has no message body")
+        if email_doc.get("html_body_id") and "html_message" not in email_doc:
+            raise ValueError("Email has no HTML body")
+        job["attachments"] = await dispatcher_attachment_store.get_parts(email_doc.get("attachment_ids") or [])
+
+    async def _build(self, job: dict, run: dict):
+        email_doc = job["email"]
+        # A tenant's own settings win; the shared sender accounts serve tenants without any
+        tenant_settings = await email_service.get_tenant_settings(email_doc.get("user_id", "default"))
+        account = None
+        if tenant_settings is None:
+            try:
+                account = await sender_pool.acquire()
+            except NoSenderAvailable as e:
+                # Leave the email pending; it goes out once an account is back in rotation
+                job["outcome"] = "deferred"
+                job["error"] = str(e)
+                return
+
+        try:
+            if account:
+                settings = settings_from_account(account)
+            else:
+                settings = tenant_settings or email_service.default_settings
+            # Stable across retries, so a resend after a crash can be recognised as the same message
+            job["message_id"] = email_doc.get("message_id") or f"<{email_doc['id']}@{settings['sender_email'].rpartition('@')[2]}>"
+            job["message"] = email_service.build_message(
+                settings,
+                email_doc["recipient_email"],
+                email_doc.get("recipient_name", ""),
+                email_doc["subject"],
+                email_doc["message"],
+                html_body=email_doc.get("html_message"),
+                attachments=job.pop("attachments", None),
+                message_id=job["message_id"]
+            )
+            job["settings"] = settings
+            job["account"] = account
+        except Exception:
+            sender_pool.release(account, None)
+            raise
+
+    async def _transmit(self, job: dict, run: dict):
+        email_doc = job["email"]
+        account = job.get("account")
+        # Claim the email right before SMTP; a cancel or another process may have got there first
+        try:
+            claimed = await dispatcher_emails_collection.find_one_and_update(
+                {"id": email_doc["id"], "status": "pending"},
+                {"$set": {
+                    "status": "sending",
+                    "sending_started_at": datetime.now(timezone.utc),
+                    "message_id": job["message_id"],
+                    "updated_at": datetime.now(timezone.utc)
+                }},
+                projection={"_id": 1}
+            )
+        except Exception:
+            sender_pool.release(account, None)
+            raise
+        if claimed is None:
+            sender_pool.release(account, None)
+            job.pop("message")
+            job["outcome"] = "skipped"
+            return
+
+        error = None
+        started = time.perf_counter()
+        try:
+            error = await email_service.deliver(
+                job["settings"],
+                email_doc["recipient_email"],
+                job.pop("message"),
+                email_id=email_doc["id"],
+                attempt=email_doc.get("attempts", 0) + 1
+            )
+        except BaseException:
+            # Cancelled mid-send: whether it went out is unknown, so it counts neither way
+            sender_pool.release(account, None)
+            raise
+        finally:
+            job["send_duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if error is None:
+            sender_pool.release(account, True)
+            job["outcome"] = "sent"
+        else:
+            sender_pool.release(account, False, f"{type(error).__name__}: {error}", is_sender_failure(error))
+            job["error"] = str(error)
+            job["outcome"] = "failed"
+
+    async def _record(self, job: dict, run: dict):
+        email_doc = job["email"]
+        outcome = job.get("outcome", "failed")
+        detail = {
+            "id": email_doc["id"],
+            "status": outcome,
+            "recipient": email_doc["recipient_email"],
+            "scheduled_datetime": email_doc["scheduled_datetime"].isoformat()
+        }
+        if job.get("error"):
+            detail["error"] = job["error"]
+
+        try:
+            if outcome == "sent":
+                account = job.get("account")
+                await dispatcher_emails_collection.update_one(
+                    {"id": email_doc["id"], "status": "sending"},
+                    {
+                        "$set": {
+                            "status": "sent",
+                            "sent_at": datetime.now(timezone.utc),
+                            "sender_account_id": account["id"] if account else None,
+                            "send_duration_ms": job["send_duration_ms"],
+                            "updated_at": datetime.now(timezone.utc)
+                        },
+                        "$inc": {"attempts": 1}
+                    }
+                )
+                run["sent_count"] += 1
+                await record_status_changes([email_doc], "sent", rollups_collection=dispatcher_rollups_collection)
+            elif outcome == "failed":
+                # Failures before the claim leave the email pending, later ones leave it sending
+                failed_fields = {"status": "failed", "updated_at": datetime.now(timezone.utc)}
+                if "send_duration_ms" in job:
+                    failed_fields["send_duration_ms"] = job["send_duration_ms"]
+                await dispatcher_emails_collection.update_one(
+                    {"id": email_doc["id"], "status": {"$in": ["pending", "sending"]}},
+                    {"$set": failed_fields, "$inc": {"attempts": 1}}
+                )
+                run["failed_count"] += 1
+                await record_status_changes([email_doc], "failed", rollups_collection=dispatcher_rollups_collection)
+            elif outcome == "suppressed":
+                await dispatcher_emails_collection.update_one(
+                    {"id": email_doc["id"], "status": "pending"},
+                    {"$set": {"status": "suppressed", "updated_at": datetime.now(timezone.utc)}}
+                )
+                await record_status_changes([email_doc], "suppressed", rollups_collection=dispatcher_rollups_collection)
+        except Exception as e:
+            if outcome == "sent":
+                run["failed_count"] += 1
+            detail["status"] = "failed"
+            detail["error"] = str(e)
+        if run["details"] is not None:
+            run["details"].append(detail)
+
+send_pipeline = SendPipeline()
+
+async def recover_interrupted_sends(policy: str = SENDING_RECOVERY_POLICY, exclude=()) -> int:
+    """Settle emails left in 'sending' by a dead process, an interrupted pipeline run or a failed status update.
+
+    Whether SMTP accepted such an email is unknown. 'failed' (the default) never
+    sends twice, 'retry' resends under the same Message-ID, 'sent' assumes delivery.
+    Ids in exclude are still being sent by this process and are left alone.
+    """
+    if policy not in ("failed", "retry", "sent"):
+        raise ValueError(f"Unknown sending recovery policy: {policy}")
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SENDING_RECOVERY_GRACE_SECONDS)
+    orphaned = await dispatcher_emails_collection.find(
+        {"status": "sending", "sending_started_at": {"$lte": cutoff}},
+        {"_id": 0, "id": 1, "priority": 1, "category": 1, "user_id": 1}
+    ).to_list(length=None)
+    orphaned = [email for email in orphaned if email["id"] not in exclude]
+    if not orphaned:
+        return 0
+
+    status = "pending" if policy == "retry" else policy
+    update = {"status": status, "recovered_at": datetime.now(timezone.utc), "recovery_policy": policy}
+    update["updated_at"] = update["recovered_at"]
+    if policy == "sent":
+        update["sent_at"] = update["recovered_at"]
+    result = await dispatcher_emails_collection.update_many(
+        {"id": {"$in": [email["id"] for email in orphaned]}, "status": "sending"},
+        {"$set": update}
+    )
+    if status != "pending":
+        await record_status_changes(orphaned[:result.modified_count], status,
+                                    rollups_collection=dispatcher_rollups_collection)
+    print(f"Recovered {result.modified_count} interrupted sends as {status}")
+    return result.modified_count
+
+# Tenant-fair dispatch
+class TenantDispatchQueues:
+    """Per-tenant queues of due email ids, drained with deficit round robin.
+
+    Every round each tenant with queued email earns a quantum of sends, limited by
+    its in-flight and per-minute caps, so a tenant's large campaign can delay
+    another tenant's email by at most one round instead of the whole backlog.
+    """
+
+    def __init__(self, quantum: int = DISPATCHER_TENANT_QUANTUM):
+        self.quantum = quantum
+        self._tenants: Dict[str, dict] = {}
+        self._active: deque = deque()  # tenants with queued email, in round robin order
+        self._unfinished: set = set()  # ids pushed and not yet through the pipeline
+        self._changed: Optional[asyncio.Event] = None
+
+    def start(self):
+        self._changed = asyncio.Event()
+
+    @staticmethod
+    def limits(user_id: str) -> tuple:
+        overrides = TENANT_LIMITS.get(user_id, {})
+        return (
+            overrides.get("max_in_flight", TENANT_MAX_IN_FLIGHT),
+            overrides.get("rate_per_minute", TENANT_RATE_PER_MINUTE)
+        )
+
+    def _tenant(self, user_id: str) -> dict:
+        if user_id not in self._tenants:
+            self._tenants[user_id] = {
+                "queue": deque(),
+                "deficit": 0,
+                "in_flight": set(),
+                "dispatched_at": deque(),
+                "dispatched": 0
+            }
+        return self._tenants[user_id]
+
+    def __contains__(self, email_id: str) -> bool:
+        """Whether the email is queued or in flight, so a rescan must not queue it again"""
+        return email_id in self._unfinished
+
+    def push(self, user_id: str, email_ids: List[str]):
+        self._unfinished.update(email_ids)
+        tenant = self._tenant(user_id)
+        if not tenant["queue"] and user_id not in self._active:
+            self._active.append(user_id)
+        tenant["queue"].extend(email_ids)
+        if self._changed:
+            self._changed.set()
+
+    def done(self, email_doc: dict):
+        """Pipeline callback: the email no longer counts against its tenant's in-flight cap"""
+        self._unfinished.discard(email_doc["id"])
+        tenant = self._tenants.get(email_doc.get("user_id", "default"))
+        if tenant:
+            tenant["in_flight"].discard(email_doc["id"])
+            self._changed.set()
+
+    def reset_in_flight(self):
+        # Jobs of an interrupted pipeline run are gone; a rescan may pick their emails up again
+        for tenant in self._tenants.values():
+            self._unfinished.difference_update(tenant["in_flight"])
+            tenant["in_flight"].clear()
+
+    def queued(self) -> int:
+        return sum(len(tenant["queue"]) for tenant in self._tenants.values())
+
+    def _allowance(self, user_id: str, tenant: dict, now: float) -> tuple:
+        """How many emails the caps let the tenant start now, and when to retry if rate limited"""
+        max_in_flight, rate_per_minute = self.limits(user_id)
+        allowance = len(tenant["queue"])
+        if max_in_flight:
+            allowance = min(allowance, max_in_flight - len(tenant["in_flight"]))
+        if rate_per_minute:
+            dispatched_at = tenant["dispatched_at"]
+            while dispatched_at and now - dispatched_at[0] >= 60:
+                dispatched_at.popleft()
+            if len(dispatched_at) >= rate_per_minute:
+                return 0, dispatched_at[0] + 60 - now
+            allowance = min(allowance, rate_per_minute - len(dispatched_at))
+        return max(allowance, 0), None
+
+    async def drain(self, load):
+        """Endless source of email documents in fair order; load(ids) fetches the still-pending ones"""
+        while True:
+            self._changed.clear()
+            progressed = False
+            retry_in = None
+            for user_id in list(self._active):
+                tenant = self._tenants[user_id]
+                allowance, rate_wait = self._allowance(user_id, tenant, time.monotonic())
+                if rate_wait is not None:
+                    retry_in = rate_wait if retry_in is None else min(retry_in, rate_wait)
+                if not allowance:
+                    continue
+
+                tenant["deficit"] += self.quantum
+                count = min(int(tenant["deficit"]), allowance)
+                email_ids = [tenant["queue"].popleft() for _ in range(count)]
+                try:
+                    email_docs = await load(email_ids)
+                except BaseException:
+                    self._unfinished.difference_update(email_ids)
+                    raise
+                self._unfinished.difference_update(set(email_ids) - {email_doc["id"] for email_doc in email_docs})
+                for email_doc in email_docs:
+                    # Emails sent or cancelled meanwhile are not loaded and cost nothing
+                    tenant["deficit"] -= 1
+                    tenant["in_flight"].add(email_doc["id"])
+                    tenant["dispatched_at"].append(time.monotonic())
+                    tenant["dispatched"] += 1
+                    progressed = True
+                    yield email_doc
+                # Carry over at most one quantum so a capped tenant can't bank a burst
+                tenant["deficit"] = min(max(tenant["deficit"], 0), self.quantum)
+                if not tenant["queue"]:
+                    tenant["deficit"] = 0
+
+            self._active = deque(user_id for user_id in self._active if self._tenants[user_id]["queue"])
+            if not progressed:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), retry_in)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stats(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        stats = {}
+        for user_id, tenant in self._tenants.items():
+            max_in_flight, rate_per_minute = self.limits(user_id)
+            stats[user_id] = {
+                "queued": len(tenant["queue"]),
+                "in_flight": len(tenant["in_flight"]),
+                "dispatched": tenant["dispatched"],
+                "dispatched_last_minute": sum(1 for at in tenant["dispatched_at"] if now - at < 60),
+                "max_in_flight": max_in_flight or None,
+                "rate_per_minute": rate_per_minute or None
+            }
+        return stats
+
+# Load leveling
+def _minute_key(minute: datetime) -> str:
+    return minute.strftime("%Y-%m-%dT%H:%M")
+
+async def pending_per_minute(collection, match: dict, field: str, start: datetime, end: datetime) -> Dict[str, int]:
+    """Count pending emails per UTC minute of a date field, keyed like _minute_key"""
+    cursor = collection.aggregate([
+        {"$match": {**match, "status": "pending", field: {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%dT%H:%M", "date": f"${field}"}}, "count": {"$sum": 1}}}
+    ])
+    return {bucket["_id"]: bucket["count"] for bucket in await cursor.to_list(length=None)}
+
+class LevelingPlanner:
+    """Assigns each email a dispatch_at, spreading emails that share a due time over a jitter window.
+
+    Policies match by category (checked first) or priority. With max_per_minute
+    set, an email goes to the least loaded minute of its window that is still
+    under the limit, counting emails already pending under the same policy;
+    once the window is full it spills into the following minutes.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._policies: List[dict] = []
+        self._loaded_at: Optional[datetime] = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _load_policies(self):
+        now = datetime.now(timezone.utc)
+        if self._loaded_at and (now - self._loaded_at).total_seconds() < LEVELING_POLICIES_REFRESH_SECONDS:
+            return
+        self._policies = await self.collection.find({"enabled": True}).to_list(length=None)
+        self._loaded_at = now
+
+    def policy_for(self, email: dict) -> Optional[dict]:
+        for scope, default in (("category", "general"), ("priority", "normal")):
+            for policy in self._policies:
+                if policy["scope"] == scope and email.get(scope, default) == policy["value"]:
+                    return policy
+        return None
+
+    async def assign(self, email_docs: List[dict]):
+        """Set dispatch_at on new email documents before they are inserted"""
+        await self._load_policies()
+        groups: Dict[tuple, List[dict]] = {}
+        policies: Dict[str, dict] = {}
+        for email in email_docs:
+            email["dispatch_at"] = email["scheduled_datetime"]
+            policy = self.policy_for(email)
+            if policy:
+                policies[policy["id"]] = policy
+                groups.setdefault((policy["id"], _as_utc(email["scheduled_datetime"])), []).append(email)
+        for (policy_id, due), emails in groups.items():
+            await self._spread(policies[policy_id], due, emails)
+
+    async def _spread(self, policy: dict, due: datetime, emails: List[dict]):
+        window_seconds = policy["window_seconds"]
+        limit = policy.get("max_per_minute")
+        if not limit:
+            for email in emails:
+                email["dispatch_at"] = due + timedelta(seconds=random.uniform(0, window_seconds))
+            return
+
+        first_minute = due.replace(second=0, microsecond=0)
+        window_minutes = max(1, math.ceil(window_seconds / 60))
+        match = {policy["scope"]: policy["value"]}
+        counts: Dict[str, int] = {}
+        loaded_minutes = 0
+
+        async def load_counts(minutes: int):
+            nonlocal loaded_minutes
+            start = first_minute + timedelta(minutes=loaded_minutes)
+            counts.update(await pending_per_minute(
+                scheduled_emails_collection, match, "dispatch_at", start, start + timedelta(minutes=minutes)
+            ))
+            loaded_minutes += minutes
+
+        await load_counts(window_minutes + math.ceil(len(emails) / limit))
+        for email in emails:
+            keys = [_minute_key(first_minute + timedelta(minutes=offset)) for offset in range(window_minutes)]
+            open_offsets = [offset for offset, key in enumerate(keys) if counts.get(key, 0) < limit]
+            if open_offsets:
+                lowest = min(counts.get(keys[offset], 0) for offset in open_offsets)
+                offset = random.choice([offset for offset in open_offsets if counts.get(keys[offset], 0) == lowest])
+            else:
+                offset = window_minutes
+                while True:
+                    if offset >= loaded_minutes:
+                        await load_counts(60)
+                    if counts.get(_minute_key(first_minute + timedelta(minutes=offset)), 0) < limit:
+                        break
+                    offset += 1
+
+            minute = first_minute + timedelta(minutes=offset)
+            key = _minute_key(minute)
+            counts[key] = counts.get(key, 0) + 1
+            earliest_second = max((due - minute).total_seconds(), 0)
+            email["dispatch_at"] = minute + timedelta(seconds=random.uniform(earliest_second, 60))
+
+leveling_planner = LevelingPlanner(leveling_policies_collection)
+
+# Background dispatcher with a prefetched due-time heap
+class DueEmailScheduler:
+    """Keeps the next few minutes of pending emails in a heap and fires each one at its due time.
+
+    The database is queried once per prefetch window (plus a periodic rescan
+    for writes made by other processes) instead of on every tick. Scheduling
+    and cancelling through this process update the heap directly.
+    """
+
+    def __init__(self, pipeline: SendPipeline, prefetch_seconds: int = DISPATCHER_PREFETCH_SECONDS):
+        self.pipeline = pipeline
+        self.prefetch = timedelta(seconds=prefetch_seconds)
+        self._heap: List[tuple] = []
+        self._due_at: Dict[str, datetime] = {}  # live entries; heap items not in here are stale
+        self._horizon: Optional[datetime] = None
+        self._page_after: Optional[tuple] = None  # (dispatch_at, id) of the last email loaded while a page was full
+        self._rescan_at = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self.tenants = TenantDispatchQueues()
+        self._tasks: List[asyncio.Task] = []
+        self.fired = 0
+        self.prefetch_queries = 0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self.tenants.start()
+        self._tasks = [
+            asyncio.create_task(self._run_timer()),
+            asyncio.create_task(self._run_pipeline())
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def stats(self) -> dict:
+        next_due = min(self._due_at.values()) if self._due_at else None
+        return {
+            "running": self.running,
+            "loaded": len(self._due_at),
+            "horizon": self._horizon.isoformat() if self._horizon else None,
+            "next_due": next_due.isoformat() if next_due else None,
+            "waiting_to_send": self.tenants.queued(),
+            "fired": self.fired,
+            "prefetch_queries": self.prefetch_queries,
+            "tenants": self.tenants.stats()
+        }
+
+    def _add(self, email_id: str, due: datetime, user_id: str):
+        due = _as_utc(due)
+        self._due_at[email_id] = due
+        heapq.heappush(self._heap, (due, email_id, user_id))
+
+    def notify_scheduled(self, email_docs: List[dict]):
+        """Track newly scheduled emails that fall inside the loaded window"""
+        if not self._tasks or self._horizon is None:
+            return
+        earliest = self._heap[0][0] if self._heap else None
+        for email in email_docs:
+            due = _as_utc(email.get("dispatch_at") or email["scheduled_datetime"])
+            if due <= self._horizon:
+                self._add(email["id"], due, email.get("user_id", "default"))
+                if earliest is None or due < earliest:
+                    self._wakeup.set()
+
+    def notify_cancelled(self, email_ids: List[str]):
+        for email_id in email_ids:
+            self._due_at.pop(email_id, None)
+
+    def rescan_now(self):
+        """Pick up due emails written by other processes without waiting for the periodic rescan"""
+        self._rescan_at = 0.0
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _backlogged(self) -> bool:
+        return len(self._due_at) + self.tenants.queued() >= DISPATCHER_MAX_LOADED
+
+    async def _prefetch(self, now: datetime, full: bool):
+        target = now + self.prefetch
+        query = {"status": "pending", "dispatch_at": {"$lte": target}}
+        if not full and self._page_after is not None:
+            # Resume after the last email of the previous page; many emails can share one due time
+            dispatch_at, email_id = self._page_after
+            query["$or"] = [{"dispatch_at": {"$gt": dispatch_at}}, {"dispatch_at": dispatch_at, "id": {"$gt": email_id}}]
+        elif not full and self._horizon is not None:
+            query["dispatch_at"]["$gt"] = self._horizon
+
+        cursor = dispatcher_emails_collection.find(
+            query, {"_id": 0, "id": 1, "dispatch_at": 1, "user_id": 1}
+        ).sort([("dispatch_at", 1), ("id", 1)]).limit(DISPATCHER_PREFETCH_LIMIT)
+        loaded = await cursor.to_list(length=None)
+        self.prefetch_queries += 1
+
+        for email in loaded:
+            # Fired emails stay pending until sent; they are already queued for the pipeline
+            if email["id"] not in self._due_at and email["id"] not in self.tenants:
+                self._add(email["id"], email["dispatch_at"], email.get("user_id", "default"))
+        # If the limit was hit, only trust the window up to the last email loaded
+        if len(loaded) >= DISPATCHER_PREFETCH_LIMIT:
+            self._page_after = (loaded[-1]["dispatch_at"], loaded[-1]["id"])
+            self._horizon = _as_utc(loaded[-1]["dispatch_at"])
+        else:
+            self._page_after = None
+            self._horizon = target
+
+    async def _run_timer(self):
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+                full_rescan = time.monotonic() >= self._rescan_at
+                if full_rescan:
+                    # Claims orphaned since startup: crashed pipeline runs, failed status updates, other processes
+                    try:
+                        await recover_interrupted_sends(exclude=self.tenants)
+                    except Exception as e:
+                        print(f"Failed to recover interrupted sends: {str(e)}")
+                # A paused prefetch resumes once the pipeline has worked the backlog down
+                paused = False
+                if full_rescan or self._horizon is None or now + self.prefetch / 2 >= self._horizon:
+                    paused = not full_rescan and self._horizon is not None and self._backlogged()
+                    if not paused:
+                        await self._prefetch(now, full_rescan)
+                    if full_rescan:
+                        self._rescan_at = time.monotonic() + DISPATCHER_RESCAN_SECONDS
+
+                due_ids: Dict[str, List[str]] = {}
+                while self._heap and self._heap[0][0] <= now:
+                    due, email_id, user_id = heapq.heappop(self._heap)
+                    if self._due_at.get(email_id) == due:
+                        del self._due_at[email_id]
+                        due_ids.setdefault(user_id, []).append(email_id)
+                for user_id, email_ids in due_ids.items():
+                    self.fired += len(email_ids)
+                    self.tenants.push(user_id, email_ids)
+
+                # Sleep until the next email is due or the window needs topping up; while paging
+                # through an overdue backlog the next page is loaded straight away
+                refill_at = self._horizon - self.prefetch / 2
+                if paused:
+                    refill_at = max(refill_at, now + timedelta(seconds=DISPATCHER_BACKLOG_POLL_SECONDS))
+                wake_at = min(
+                    refill_at,
+                    datetime.now(timezone.utc) + timedelta(seconds=max(self._rescan_at - time.monotonic(), 0))
+                )
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                timeout = max((wake_at - datetime.now(timezone.utc)).total_seconds(), 0)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Dispatcher timer error: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _load_due(self, email_ids: List[str]) -> List[dict]:
+        return await dispatcher_emails_collection.find(
+            {"id": {"$in": email_ids}, "status": "pending"}
+        ).sort([("priority", -1), ("scheduled_datetime", 1)]).to_list(length=None)
+
+    async def _run_pipeline(self):
+        while True:
+            try:
+                self.tenants.reset_in_flight()
+                await self.pipeline.run(self.tenants.drain(self._load_due), on_done=self.tenants.done, keep_details=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Dispatcher pipeline error: {str(e)}")
+                await asyncio.sleep(1)
+
+due_scheduler = DueEmailScheduler(send_pipeline)
+
+# Send queue forecasting
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+def simulate_send_queue(groups: List[tuple], latencies: List[float], workers: int,
+                        rate_per_minute: Optional[int] = None, seed: Optional[int] = None) -> dict:
+    """Discrete-event simulation of the dispatcher draining a backlog.
 
-# Email service class
-class EmailService:
-    def __init__(self):
-        self.default_settings = {
-            'smtp_host': DEFAULT_SMTP_HOST,
-            'smtp_port': DEFAULT_SMTP_PORT,
-            'username': DEFAULT_USERNAME,
-            'password': DEFAULT_APP_PASSWORD,
-            'sender_email': DEFAULT_SENDER_EMAIL,
-            'sender_name': 'Scheduled Email App'
+    groups are (release_seconds, priority, category, count) tuples, with release
+    times relative to the start of the simulation. Emails are served in release
+    order. Each one starts once it is due, a worker is free and the per-minute
+    rate allows, then takes a duration drawn from latencies (seconds). Because
+    service is FIFO, start times never decrease, so the pending queue needs no
+    event list: a heap of worker free times and the last rate_per_minute start
+    times are enough.
+    """
+    rng = random.Random(seed)
+    free_at = [0.0] * workers
+    recent_starts: deque = deque(maxlen=rate_per_minute or 1)
+    releases = array("d")
+    starts = array("d")
+    waits: Dict[tuple, array] = {}
+    last_finish: Dict[tuple, float] = {}
+    finished_at = 0.0
+
+    for release, priority, category, count in groups:
+        keys = (("priority", priority), ("category", category))
+        for key in keys:
+            waits.setdefault(key, array("d"))
+            last_finish.setdefault(key, 0.0)
+        priority_waits, category_waits = waits[keys[0]], waits[keys[1]]
+        group_finish = 0.0
+        for duration in rng.choices(latencies, k=count):
+            start = free_at[0] if free_at[0] > release else release
+            if rate_per_minute:
+                if len(recent_starts) == rate_per_minute and recent_starts[0] + 60 > start:
+                    start = recent_starts[0] + 60
+                recent_starts.append(start)
+            finish = start + duration
+            heapq.heapreplace(free_at, finish)
+            releases.append(release)
+            starts.append(start)
+            priority_waits.append(finish - release)
+            category_waits.append(finish - release)
+            if finish > group_finish:
+                group_finish = finish
+        finished_at = max(finished_at, group_finish)
+        for key in keys:
+            last_finish[key] = max(last_finish[key], group_finish)
+
+    depth = []
+    if starts:
+        end = starts[-1]
+        for point in range(FORECAST_DEPTH_POINTS + 1):
+            at = end * point / FORECAST_DEPTH_POINTS
+            depth.append((at, bisect.bisect_right(releases, at) - bisect.bisect_right(starts, at)))
+
+    summary: Dict[str, Dict[str, dict]] = {"priority": {}, "category": {}}
+    for (dimension, value), key_waits in waits.items():
+        ordered = sorted(key_waits)
+        summary[dimension][value] = {
+            "count": len(ordered),
+            "last_finish_seconds": last_finish[(dimension, value)],
+            "p50_wait_seconds": round(_percentile(ordered, 50), 1),
+            "p95_wait_seconds": round(_percentile(ordered, 95), 1),
+            "max_wait_seconds": round(ordered[-1], 1)
         }
+    return {"emails": len(starts), "finish_seconds": finished_at, "depth": depth, "summary": summary}
 
-    async def get_email_settings(self, user_id: str = "default") -> dict:
-        """Get email settings for user"""
-        settings = await email_settings_collection.find_one({"user_id": user_id})
-        if settings:
-            return {
-                'smtp_host': settings.get('smtp_host', self.default_settings['smtp_host']),
-                'smtp_port': settings.get('smtp_port', self.default_settings['smtp_port']),
-                'username': settings['sender_email'],
-                'password': settings['app_password'],
-                'sender_email': settings['sender_email'],
-                'sender_name': settings.get('sender_name', settings['sender_email'])
-            }
-        return self.default_settings
+async def build_forecast(workers: Optional[int] = None, rate_per_minute: Optional[int] = None,
+                         campaign_size: int = 0, campaign_at: Optional[datetime] = None,
+                         campaign_priority: str = "normal", campaign_category: str = "general",
+                         seed: Optional[int] = None) -> dict:
+    """Project when the pending backlog, plus an optional planned campaign, will have been sent"""
+    now = datetime.now(timezone.utc)
+    due_millis = {"$toLong": {"$ifNull": ["$dispatch_at", "$scheduled_datetime"]}}
+    rows = await reporting_emails_collection.aggregate([
+        {"$match": {"status": "pending"}},
+        {"$group": {
+            "_id": {
+                # Leveled due times are spread to the millisecond; one group per second keeps the group count bounded
+                "at": {"$toDate": {"$subtract": [due_millis, {"$mod": [due_millis, 1000]}]}},
+                "priority": "$priority",
+                "category": "$category"
+            },
+            "count": {"$sum": 1}
+        }}
+    ], allowDiskUse=True).to_list(length=None)
 
-    async def send_email(self, recipient: str, recipient_name: str, subject: str, body: str, user_id: str = "default") -> bool:
-        """Send email using user's custom settings or default"""
-        try:
-            settings = await self.get_email_settings(user_id)
-            
-            # Create message
-            msg = MIMEMultipart()
-            sender_display = f"{settings['sender_name']} <{settings['sender_email']}>" if settings['sender_name'] else settings['sender_email']
-            recipient_display = f"{recipient_name} <{recipient}>" if recipient_name else recipient
-            
-            msg['From'] = sender_display
-            msg['To'] = recipient_display
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
+    groups = [
+        ((_as_utc(row["_id"]["at"]) - now).total_seconds(), row["_id"].get("priority") or "normal",
+         row["_id"].get("category") or "general", row["count"])
+        for row in rows
+    ]
+    pending = sum(group[3] for group in groups)
+    if campaign_size:
+        groups.append(((_as_utc(campaign_at or now) - now).total_seconds(), campaign_priority, campaign_category, campaign_size))
+    # Same order as the dispatcher: due time, then priority as it sorts them; overdue email is released at once
+    groups.sort(key=lambda group: group[1], reverse=True)
+    groups.sort(key=lambda group: group[0])
+    groups = [(max(release, 0.0), priority, category, count) for release, priority, category, count in groups]
 
-            # Send email
-            with smtplib.SMTP(settings['smtp_host'], settings['smtp_port']) as server:
-                server.starttls()
-                server.login(settings['username'], settings['password'])
-                server.sendmail(settings['sender_email'], [recipient], msg.as_string())
-            
-            print(f"Email sent successfully from {settings['sender_email']} to {recipient}")
-            return True
-            
-        except Exception as e:
-            print(f"Failed to send email to {recipient}: {str(e)}")
-            return False
+    durations = await reporting_emails_collection.find(
+        {"status": "sent", "send_duration_ms": {"$exists": True}},
+        {"_id": 0, "send_duration_ms": 1}
+    ).sort("sent_at", -1).limit(FORECAST_LATENCY_SAMPLES).to_list(length=None)
+    latencies = [doc["send_duration_ms"] / 1000 for doc in durations] or [FORECAST_DEFAULT_LATENCY_MS / 1000]
 
-    async def create_recurring_emails(self, base_email: dict):
-        """Create recurring email instances based on pattern"""
-        if not base_email.get('is_recurring') or not base_email.get('recurring_pattern'):
-            return
+    if rate_per_minute is None:
+        # Without accounts the default sender is unthrottled; any account without a limit leaves the pool unthrottled
+        accounts = await sender_accounts_collection.find({"enabled": True}, {"max_per_minute": 1}).to_list(length=None)
+        if accounts and all(account.get("max_per_minute") for account in accounts):
+            rate_per_minute = sum(account["max_per_minute"] for account in accounts)
+    workers = workers or PIPELINE_CONCURRENCY["transmit"]
 
-        pattern = base_email['recurring_pattern']
-        end_date = base_email.get('recurring_end_date')
-        current_date = base_email['scheduled_datetime']
-        
-        # Create up to 52 instances (1 year worth)
-        for i in range(1, 53):
-            if pattern == 'daily':
-                next_date = current_date + timedelta(days=i)
-            elif pattern == 'weekly':
-                next_date = current_date + timedelta(weeks=i)
-            elif pattern == 'monthly':
-                next_date = current_date + timedelta(weeks=i*4)  # Approximate monthly
-            else:
-                break
-                
-            if end_date and next_date > end_date:
-                break
-                
-            recurring_email = {
-                **base_email,
-                "id": str(uuid.uuid4()),
-                "scheduled_datetime": next_date,
-                "created_at": datetime.now(timezone.utc),
-            }
-            
-            await scheduled_emails_collection.insert_one(recurring_email)
+    started = time.perf_counter()
+    result = await asyncio.to_thread(simulate_send_queue, groups, latencies, workers, rate_per_minute, seed)
+    simulation_ms = (time.perf_counter() - started) * 1000
 
-# Initialize email service
-email_service = EmailService()
+    at = lambda seconds: now + timedelta(seconds=seconds)
+    ordered_latencies = sorted(latencies)
+    breakdown = {
+        dimension: {
+            value: {
+                "count": stats["count"],
+                "last_sent_at": at(stats["last_finish_seconds"]),
+                "p50_wait_seconds": stats["p50_wait_seconds"],
+                "p95_wait_seconds": stats["p95_wait_seconds"],
+                "max_wait_seconds": stats["max_wait_seconds"]
+            }
+            for value, stats in sorted(values.items())
+        }
+        for dimension, values in result["summary"].items()
+    }
+    return {
+        "generated_at": now,
+        "pending_emails": pending,
+        "simulated_emails": result["emails"],
+        "assumptions": {
+            "workers": workers,
+            "rate_per_minute": rate_per_minute,
+            "latency_samples": len(latencies) if durations else 0,
+            "p50_latency_ms": round(_percentile(ordered_latencies, 50) * 1000, 1),
+            "p95_latency_ms": round(_percentile(ordered_latencies, 95) * 1000, 1)
+        },
+        "all_sent_at": at(result["finish_seconds"]) if result["emails"] else None,
+        "by_priority": breakdown["priority"],
+        "by_category": breakdown["category"],
+        "queue_depth": [{"at": at(seconds), "waiting": waiting} for seconds, waiting in result["depth"]],
+        "simulation_ms": round(simulation_ms, 1)
+    }
 
 # Enhanced default email templates with categories
 DEFAULT_TEMPLATES = [
@@ -383,14 +3083,69 @@ async def initialize_default_templates():
                     "is_favorite": False
                 }
                 await email_templates_collection.insert_one(template_doc)
+                response_cache.bump("email_templates")
                 print(f"Added default template: {template_data['name']}")
     except Exception as e:
         print(f"Error initializing default templates: {str(e)}")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize default templates on startup"""
+    """Initialize default templates and indexes on startup"""
+    delivery_log.start()
     await initialize_default_templates()
+    await email_rollups_collection.create_index([("granularity", 1), ("bucket_start", 1)])
+    await event_broker.enable_pre_images()
+    await scheduled_emails_collection.create_index(
+        [("import_id", 1), ("import_key", 1)],
+        unique=True,
+        partialFilterExpression={"import_id": {"$exists": True}}
+    )
+    await import_jobs_collection.create_index("id", unique=True)
+    await suppressions_collection.create_index("email", unique=True)
+    await suppressions_collection.create_index("created_at")
+    await import_rejections_collection.create_index([("import_id", 1), ("row", 1)])
+    await scheduled_emails_collection.create_index([("status", 1), ("scheduled_datetime", 1)])
+    # Emails scheduled before load leveling are dispatched at their scheduled time
+    await scheduled_emails_collection.update_many(
+        {"dispatch_at": {"$exists": False}},
+        [{"$set": {"dispatch_at": "$scheduled_datetime"}}]
+    )
+    await scheduled_emails_collection.create_index([("status", 1), ("dispatch_at", 1), ("id", 1)])
+    # Forecast latency samples are the most recent sends
+    await scheduled_emails_collection.create_index([("status", 1), ("sent_at", -1)])
+    await leveling_policies_collection.create_index([("scope", 1), ("value", 1)], unique=True)
+    # Emails scheduled before tenants existed belong to the default tenant
+    await scheduled_emails_collection.update_many({"user_id": {"$exists": False}}, {"$set": {"user_id": "default"}})
+    await scheduled_emails_collection.create_index([("user_id", 1), ("status", 1), ("scheduled_datetime", 1)])
+    # The polling event feed reads changes through updated_at
+    await scheduled_emails_collection.update_many(
+        {"updated_at": {"$exists": False}},
+        [{"$set": {"updated_at": {"$ifNull": ["$sent_at", "$created_at"]}}}]
+    )
+    await scheduled_emails_collection.create_index("updated_at")
+    # Lets the body sweep check references per batch of body ids
+    await scheduled_emails_collection.create_index("body_id")
+    await scheduled_emails_collection.create_index("html_body_id", sparse=True)
+    await message_bodies_collection.create_index("last_used_at")
+    if DISPATCHER_ENABLED:
+        # Its first full rescan recovers interrupted sends, and every later one again
+        due_scheduler.start()
+    else:
+        try:
+            await recover_interrupted_sends()
+        except Exception as e:
+            print(f"Failed to recover interrupted sends: {str(e)}")
+    if BODY_SWEEP_INTERVAL_SECONDS > 0:
+        global body_sweeper_task
+        body_sweeper_task = asyncio.create_task(run_body_sweeper())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the dispatcher and flush queued log records"""
+    if body_sweeper_task:
+        body_sweeper_task.cancel()
+    await due_scheduler.stop()
+    delivery_log.stop()
 
 @app.get("/")
 async def root():
@@ -402,16 +3157,19 @@ async def health_check():
 
 # New Analytics Endpoint
 @app.get("/api/analytics", response_model=EmailAnalytics)
-async def get_email_analytics():
+@response_cache.cached("scheduled_emails")
+async def get_email_analytics(request: Request):
     """Get comprehensive email analytics"""
     try:
         # Get all emails
-        all_emails = await scheduled_emails_collection.find({}).to_list(length=None)
+        all_emails = await reporting_primary_emails_collection.find({}).to_list(length=None)
         
         total_emails = len(all_emails)
         pending_emails = len([e for e in all_emails if e['status'] == 'pending'])
         sent_emails = len([e for e in all_emails if e['status'] == 'sent'])
         failed_emails = len([e for e in all_emails if e['status'] == 'failed'])
+        suppressed_emails = len([e for e in all_emails if e['status'] == 'suppressed'])
+        sending_emails = len([e for e in all_emails if e['status'] == 'sending'])
         
         success_rate = (sent_emails / total_emails * 100) if total_emails > 0 else 0
         
@@ -419,7 +3177,9 @@ async def get_email_analytics():
         emails_by_status = {
             'pending': pending_emails,
             'sent': sent_emails,
-            'failed': failed_emails
+            'failed': failed_emails,
+            'suppressed': suppressed_emails,
+            'sending': sending_emails
         }
         
         # Group by priority
@@ -463,13 +3223,57 @@ async def get_email_analytics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get analytics: {str(e)}")
 
+@app.get("/api/analytics/timeseries", response_model=AnalyticsTimeSeries)
+async def get_analytics_timeseries(
+    granularity: str = Query("hour", description="Bucket size: hour or day"),
+    start: Optional[datetime] = Query(None, description="Range start (defaults to 30 days before end)"),
+    end: Optional[datetime] = Query(None, description="Range end (defaults to now)")
+):
+    """Get pre-aggregated email activity per hour or day"""
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity, use 'hour' or 'day'")
+
+    step = ROLLUP_GRANULARITIES[granularity]
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=30)
+    first_bucket = rollup_bucket_start(start, granularity)
+    if end <= first_bucket:
+        raise HTTPException(status_code=400, detail="Range end must be after range start")
+    if (end - first_bucket) / step > ROLLUP_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too large, at most {ROLLUP_MAX_BUCKETS} buckets")
+
+    try:
+        cursor = reporting_rollups_collection.find({
+            "granularity": granularity,
+            "bucket_start": {"$gte": first_bucket, "$lt": end}
+        })
+        stored = {_as_utc(doc["bucket_start"]): doc async for doc in cursor}
+
+        # Emit empty buckets too so charts get an evenly spaced series
+        buckets = []
+        bucket_start = first_bucket
+        while bucket_start < end:
+            doc = stored.get(bucket_start, {})
+            buckets.append(RollupBucket(
+                bucket_start=bucket_start,
+                status=doc.get("status", {}),
+                priority=doc.get("priority", {}),
+                category=doc.get("category", {})
+            ))
+            bucket_start += step
+
+        return AnalyticsTimeSeries(granularity=granularity, start=first_bucket, end=end, buckets=buckets)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get analytics time series: {str(e)}")
+
 # Email Settings Endpoints
 @app.post("/api/email-settings")
-async def save_email_settings(settings: EmailSettingsRequest):
+async def save_email_settings(settings: EmailSettingsRequest, user_id: str = Query("default", description="Tenant")):
     """Save or update email settings"""
     try:
         settings_doc = {
-            "user_id": "default",
+            "user_id": user_id,
             "sender_email": settings.sender_email,
             "sender_name": settings.sender_name,
             "app_password": settings.app_password,
@@ -480,10 +3284,12 @@ async def save_email_settings(settings: EmailSettingsRequest):
         }
         
         await email_settings_collection.replace_one(
-            {"user_id": "default"}, 
+            {"user_id": user_id}, 
             settings_doc, 
             upsert=True
         )
+        email_service.invalidate_tenant_settings(user_id)
+        response_cache.bump("email_settings")
         
         return {"message": "Email settings saved successfully"}
         
@@ -491,10 +3297,11 @@ async def save_email_settings(settings: EmailSettingsRequest):
         raise HTTPException(status_code=500, detail=f"Failed to save email settings: {str(e)}")
 
 @app.get("/api/email-settings")
-async def get_email_settings():
+@response_cache.cached("email_settings")
+async def get_email_settings(request: Request, user_id: str = Query("default", description="Tenant")):
     """Get current email settings"""
     try:
-        settings = await email_settings_collection.find_one({"user_id": "default"})
+        settings = await email_settings_collection.find_one({"user_id": user_id})
         if settings:
             # Don't expose the password in the response
             return {
@@ -515,6 +3322,241 @@ async def get_email_settings():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get email settings: {str(e)}")
 
+# Suppression List Endpoints
+@app.get("/api/suppressions")
+async def get_suppressions(
+    search: Optional[str] = Query(None, description="Search in suppressed addresses"),
+    reason: Optional[str] = Query(None, description="Filter by reason"),
+    limit: int = Query(100, description="Limit number of results")
+):
+    """List suppressed addresses, newest first"""
+    try:
+        query = {}
+        if search:
+            query["email"] = {"$regex": search, "$options": "i"}
+        if reason:
+            query["reason"] = reason
+        cursor = suppressions_collection.find(query, {"_id": 0}).sort("created_at", -1).limit(limit)
+        return await cursor.to_list(length=None)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get suppressions: {str(e)}")
+
+@app.post("/api/suppressions")
+async def add_suppression(request: SuppressionRequest):
+    """Stop all future sends to an address"""
+    try:
+        added = await suppression_index.add(request.email, request.reason)
+        return {"message": "Address suppressed" if added else "Address was already suppressed"}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add suppression: {str(e)}")
+
+@app.delete("/api/suppressions/{email}")
+async def remove_suppression(email: str):
+    """Allow sending to a previously suppressed address again"""
+    try:
+        if not await suppression_index.remove(email):
+            raise HTTPException(status_code=404, detail="Address is not suppressed")
+        return {"message": "Suppression removed"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to remove suppression: {str(e)}")
+
+# Sender Account Endpoints
+@app.post("/api/sender-accounts")
+async def create_sender_account(account: SenderAccountRequest):
+    """Add a sender account to the outgoing mail pool"""
+    try:
+        account_doc = {
+            "id": str(uuid.uuid4()),
+            **account.model_dump(),
+            "created_at": datetime.now(timezone.utc)
+        }
+        await sender_accounts_collection.insert_one(account_doc)
+        sender_pool.invalidate()
+        return {"id": account_doc["id"], "message": "Sender account added successfully"}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add sender account: {str(e)}")
+
+@app.get("/api/sender-accounts")
+async def get_sender_accounts():
+    """List sender accounts with their health and throughput"""
+    try:
+        accounts = await sender_accounts_collection.find({}, {"_id": 0, "app_password": 0}).to_list(length=None)
+        stats = sender_pool.stats()
+        return [
+            {**account, "stats": stats.get(account["id"])}
+            for account in accounts
+        ]
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get sender accounts: {str(e)}")
+
+@app.patch("/api/sender-accounts/{account_id}/toggle")
+async def toggle_sender_account(account_id: str):
+    """Enable or disable a sender account"""
+    try:
+        account = await sender_accounts_collection.find_one({"id": account_id})
+        if not account:
+            raise HTTPException(status_code=404, detail="Sender account not found")
+
+        enabled = not account.get("enabled", True)
+        await sender_accounts_collection.update_one({"id": account_id}, {"$set": {"enabled": enabled}})
+        sender_pool.invalidate()
+        return {"message": f"Sender account {'enabled' if enabled else 'disabled'}"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to toggle sender account: {str(e)}")
+
+@app.delete("/api/sender-accounts/{account_id}")
+async def delete_sender_account(account_id: str):
+    """Remove a sender account from the pool"""
+    try:
+        result = await sender_accounts_collection.delete_one({"id": account_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Sender account not found")
+        sender_pool.invalidate()
+        return {"message": "Sender account deleted successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete sender account: {str(e)}")
+
+# Load Leveling Endpoints
+@app.post("/api/leveling-policies")
+async def create_leveling_policy(policy: LevelingPolicyRequest):
+    """Spread emails of a category or priority that are due at the same instant"""
+    try:
+        policy_doc = {
+            "id": str(uuid.uuid4()),
+            **policy.model_dump(),
+            "created_at": datetime.now(timezone.utc)
+        }
+        await leveling_policies_collection.insert_one(policy_doc)
+        leveling_planner.invalidate()
+        return {"id": policy_doc["id"], "message": "Leveling policy added successfully"}
+
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"A leveling policy for this {policy.scope} already exists")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add leveling policy: {str(e)}")
+
+@app.get("/api/leveling-policies")
+async def get_leveling_policies():
+    """List load leveling policies"""
+    try:
+        return await leveling_policies_collection.find({}, {"_id": 0}).to_list(length=None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get leveling policies: {str(e)}")
+
+@app.delete("/api/leveling-policies/{policy_id}")
+async def delete_leveling_policy(policy_id: str):
+    """Remove a leveling policy; emails already scheduled keep their dispatch time"""
+    try:
+        result = await leveling_policies_collection.delete_one({"id": policy_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Leveling policy not found")
+        leveling_planner.invalidate()
+        return {"message": "Leveling policy deleted successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete leveling policy: {str(e)}")
+
+@app.get("/api/dispatch/load-curve")
+async def get_dispatch_load_curve(
+    start: Optional[datetime] = Query(None, description="First minute (default: now)"),
+    end: Optional[datetime] = Query(None, description="End of the curve (default: 3 hours after start)"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    priority: Optional[str] = Query(None, description="Filter by priority")
+):
+    """Pending emails per minute by scheduled time and by projected dispatch time"""
+    try:
+        start = _as_utc(start or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+        end = _as_utc(end) if end else start + timedelta(hours=3)
+        minutes = math.ceil((end - start).total_seconds() / 60)
+        if minutes <= 0:
+            raise HTTPException(status_code=400, detail="end must be after start")
+        if minutes > LOAD_CURVE_MAX_MINUTES:
+            raise HTTPException(status_code=400, detail=f"At most {LOAD_CURVE_MAX_MINUTES} minutes per request")
+
+        match = {}
+        if category:
+            match["category"] = category
+        if priority:
+            match["priority"] = priority
+        scheduled = await pending_per_minute(reporting_emails_collection, match, "scheduled_datetime", start, end)
+        dispatch = await pending_per_minute(reporting_emails_collection, match, "dispatch_at", start, end)
+
+        buckets = []
+        for offset in range(minutes):
+            minute = start + timedelta(minutes=offset)
+            key = _minute_key(minute)
+            buckets.append({"minute": minute, "scheduled": scheduled.get(key, 0), "dispatch": dispatch.get(key, 0)})
+        return {
+            "start": start,
+            "end": end,
+            "peak_scheduled_per_minute": max(bucket["scheduled"] for bucket in buckets),
+            "peak_dispatch_per_minute": max(bucket["dispatch"] for bucket in buckets),
+            "buckets": buckets
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get load curve: {str(e)}")
+
+# Attachment Endpoints
+@app.post("/api/attachments")
+async def upload_attachment(request: Request, filename: str = Query(..., min_length=1),
+                            content_type: Optional[str] = Query(default=None)):
+    """Stream a raw request body into GridFS; the content type comes from the query, the header or the filename"""
+    try:
+        content_type = (
+            content_type
+            or request.headers.get("content-type")
+            or mimetypes.guess_type(filename)[0]
+            or "application/octet-stream"
+        )
+        return await attachment_store.upload(filename, content_type, request.stream())
+
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload attachment: {str(e)}")
+
+@app.get("/api/attachments")
+async def get_attachments():
+    """List uploaded attachments, newest first"""
+    try:
+        return await attachment_store.list()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch attachments: {str(e)}")
+
+@app.delete("/api/attachments/{attachment_id}")
+async def delete_attachment(attachment_id: str):
+    """Delete an uploaded attachment"""
+    try:
+        dispatcher_attachment_store.forget(attachment_id)
+        if not await attachment_store.delete(attachment_id):
+            raise HTTPException(status_code=404, detail="Attachment not found")
+        return {"message": "Attachment deleted successfully"}
+
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete attachment: {str(e)}")
+
 # Enhanced Email Templates Endpoints
 @app.post("/api/email-templates")
 async def create_email_template(template: EmailTemplateRequest):
@@ -532,13 +3574,15 @@ async def create_email_template(template: EmailTemplateRequest):
         }
         
         await email_templates_collection.insert_one(template_doc)
+        response_cache.bump("email_templates")
         return EmailTemplate(**template_doc)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create template: {str(e)}")
 
 @app.get("/api/email-templates", response_model=List[EmailTemplate])
-async def get_email_templates(category: Optional[str] = None):
+@response_cache.cached("email_templates")
+async def get_email_templates(request: Request, category: Optional[str] = None):
     """Get all email templates, optionally filtered by category"""
     try:
         query = {}
@@ -566,6 +3610,7 @@ async def toggle_template_favorite(template_id: str):
             {"id": template_id},
             {"$set": {"is_favorite": new_favorite_status}}
         )
+        response_cache.bump("email_templates")
         
         return {"message": f"Template {'added to' if new_favorite_status else 'removed from'} favorites"}
         
@@ -581,6 +3626,7 @@ async def delete_email_template(template_id: str):
         result = await email_templates_collection.delete_one({"id": template_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Template not found")
+        response_cache.bump("email_templates")
         return {"message": "Template deleted successfully"}
         
     except HTTPException:
@@ -609,48 +3655,398 @@ async def schedule_email(request: ScheduleEmailRequest):
                 request.subject = template["subject"]
                 request.message = template["message"]
         
+        await suppression_index.ensure_fresh()
+        if suppression_index.is_suppressed(request.recipient_email):
+            raise HTTPException(status_code=400, detail="Recipient is on the suppression list")
+
+        missing_attachments = await attachment_store.missing(request.attachment_ids)
+        if missing_attachments:
+            raise HTTPException(status_code=400, detail=f"Unknown attachment ids: {', '.join(missing_attachments)}")
+
+        # Store the body once and keep only a reference on the scheduled email
+        body_id = await body_store.put(request.message)
+        html_body_id = await body_store.put(request.html_message) if request.html_message else None
+
         # Create scheduled email document
+        now = datetime.now(timezone.utc)
         scheduled_email = {
             "id": str(uuid.uuid4()),
+            "user_id": request.user_id,
             "scheduled_datetime": request.scheduled_datetime,
             "recipient_email": request.recipient_email,
             "recipient_name": request.recipient_name,
             "subject": request.subject,
-            "message": request.message,
+            "body_id": body_id,
+            "html_body_id": html_body_id,
+            "attachment_ids": request.attachment_ids,
             "priority": request.priority,
             "category": request.category,
             "status": "pending",
-            "created_at": datetime.now(timezone.utc),
+            "created_at": now,
+            "updated_at": now,
             "sent_at": None,
             "is_recurring": request.is_recurring,
             "recurring_pattern": request.recurring_pattern,
             "recurring_end_date": request.recurring_end_date
         }
         
+        await leveling_planner.assign([scheduled_email])
+
         # Insert into database
         await scheduled_emails_collection.insert_one(scheduled_email)
         
         # Create recurring instances if needed
+        recurring_emails = []
         if request.is_recurring:
-            await email_service.create_recurring_emails(scheduled_email)
+            recurring_emails = await email_service.create_recurring_emails(scheduled_email)
+
+        await record_status_changes([scheduled_email, *recurring_emails], "pending")
+        due_scheduler.notify_scheduled([scheduled_email, *recurring_emails])
         
-        return ScheduledEmailResponse(**scheduled_email)
+        return ScheduledEmailResponse(**scheduled_email, message=request.message, html_message=request.html_message)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to schedule email: {str(e)}")
 
+# Streaming recipient import
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+def template_placeholders(text: str) -> set:
+    return set(_PLACEHOLDER.findall(text))
+
+def render_template_text(text: str, variables: Dict[str, Any]) -> str:
+    """Fill {placeholders} from row variables; any other braces (CSS, JSON, unknown names) are left as they are"""
+    return _PLACEHOLDER.sub(
+        lambda match: str(variables[match.group(1)]) if match.group(1) in variables else match.group(0),
+        text
+    )
+
+_LINE_END = re.compile(r"\r\n|\r|\n")
+
+async def _iter_upload_lines(request: Request, progress: dict):
+    """Decode the request body incrementally and yield (line, error) pairs.
+
+    CRLF, LF and bare CR all end a line and every line is yielded ending in LF. A line
+    longer than IMPORT_MAX_RECORD_BYTES is dropped as it arrives and yielded as an error.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    too_long = f"Line longer than {IMPORT_MAX_RECORD_BYTES} characters"
+    buffer = ""
+    overlong = False
+    async for chunk in request.stream():
+        progress["bytes_read"] += len(chunk)
+        # The carried-over partial line holds no line end, except perhaps a trailing CR
+        scan_from = max(len(buffer) - 1, 0)
+        buffer += decoder.decode(chunk)
+        start = 0
+        for match in _LINE_END.finditer(buffer, scan_from):
+            if match.group() == "\r" and match.end() == len(buffer):
+                break  # may be the first half of a CRLF split across chunks
+            line = buffer[start:match.start()]
+            start = match.end()
+            if overlong or len(line) > IMPORT_MAX_RECORD_BYTES:
+                overlong = False
+                yield None, too_long
+            else:
+                yield line + "\n", None
+        buffer = buffer[start:]
+        if len(buffer) > IMPORT_MAX_RECORD_BYTES:
+            overlong = True
+            buffer = ""
+    buffer += decoder.decode(b"", final=True)
+    if overlong or len(buffer) > IMPORT_MAX_RECORD_BYTES:
+        yield None, too_long
+    elif buffer:
+        yield buffer.rstrip("\r"), None
+
+async def _iter_import_rows(request: Request, upload_format: str, progress: dict):
+    """Yield (row_number, row_dict_or_None, error) for each CSV record or NDJSON line"""
+    row_number = 0
+    if upload_format == "ndjson":
+        async for line, line_error in _iter_upload_lines(request, progress):
+            if line_error:
+                row_number += 1
+                yield row_number, None, line_error
+                continue
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("line is not a JSON object")
+                yield row_number, row, None
+            except ValueError as e:
+                yield row_number, None, f"Invalid JSON: {str(e)}"
+        return
+
+    header = None
+    pending = ""
+    quotes = 0
+    async for line, line_error in _iter_upload_lines(request, progress):
+        if line_error:
+            if header is None:
+                raise HTTPException(status_code=400, detail=f"Could not parse the CSV header row: {line_error}")
+            pending, quotes = "", 0
+            row_number += 1
+            yield row_number, None, line_error
+            continue
+        pending += line
+        quotes += line.count('"')
+        # A record is complete once its quotes are balanced; quoted fields may span lines
+        if quotes % 2 and len(pending) < IMPORT_MAX_RECORD_BYTES:
+            continue
+        record, pending, quotes = pending, "", 0
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            values, error = None, f"Invalid CSV: {str(e)}"
+        if header is None:
+            if values is None:
+                raise HTTPException(status_code=400, detail="Could not parse the CSV header row")
+            header = [column.strip().lower() for column in values]
+            continue
+        row_number += 1
+        if values is None:
+            yield row_number, None, error
+        elif len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield row_number, dict(zip(header, values)), None
+
+    if pending.strip():
+        yield row_number + 1, None, "Unterminated quoted field"
+
+def _prepare_import_row(row: Dict[str, Any], defaults: dict) -> dict:
+    """Validate one import row and render its subject; raises ValueError with the rejection reason.
+
+    The message is kept unrendered with the row's values for its placeholders, so every
+    row of a template shares one stored body; it is rendered when the body is loaded.
+    """
+    variables = {str(key).strip().lower(): ("" if value is None else str(value)) for key, value in row.items()}
+    address = variables.get("recipient_email") or variables.get("email")
+    if not address:
+        raise ValueError("Missing email column")
+    try:
+        address = validate_email(address.strip(), check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError(f"Invalid email address: {str(e)}")
+
+    recipient_name = variables.get("recipient_name") or variables.get("name") or ""
+    variables.setdefault("recipient_name", recipient_name)
+    variables["recipient_email"] = address
+
+    subject = variables.get("subject") or defaults["subject"]
+    message = variables.get("message") or defaults["message"]
+    if not subject or not message:
+        raise ValueError("No subject or message for this row")
+
+    email = {
+        "recipient_email": address,
+        "recipient_name": recipient_name,
+        "subject": render_template_text(subject, variables),
+        "message": message,
+        "priority": variables.get("priority") or defaults["priority"],
+        "category": variables.get("category") or defaults["category"]
+    }
+    template_variables = {name: variables[name] for name in template_placeholders(message) if name in variables}
+    if template_variables:
+        email["template_variables"] = template_variables
+    return email
+
+async def _flush_import_batch(import_id: str, batch: List[dict], rejections: List[dict], progress: dict):
+    """Insert a chunk of prepared rows; rows hitting the per-import unique index are duplicates"""
+    if batch:
+        body_ids = await body_store.put_many([email.pop("message") for email in batch])
+        for email, body_id in zip(batch, body_ids):
+            email["body_id"] = body_id
+
+        await leveling_planner.assign(batch)
+        inserted = batch
+        try:
+            await scheduled_emails_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            failed_indexes = set()
+            for error in e.details.get("writeErrors", []):
+                failed_indexes.add(error["index"])
+                email = batch[error["index"]]
+                reason = "Duplicate recipient" if error.get("code") == 11000 else error.get("errmsg", "Insert failed")
+                rejections.append({"row": email["import_row"], "email": email["recipient_email"], "reason": reason})
+            inserted = [email for index, email in enumerate(batch) if index not in failed_indexes]
+
+        progress["imported"] += len(inserted)
+        await record_status_changes(inserted, "pending")
+        due_scheduler.notify_scheduled(inserted)
+
+    if rejections:
+        progress["rejected"] += len(rejections)
+        await import_rejections_collection.insert_many(
+            [{"import_id": import_id, **rejection} for rejection in rejections]
+        )
+
+    await import_jobs_collection.update_one(
+        {"id": import_id},
+        {"$set": {key: progress[key] for key in ("rows_read", "imported", "rejected", "bytes_read")}}
+    )
+
+@app.post("/api/scheduled-emails/import")
+async def import_scheduled_emails(
+    request: Request,
+    scheduled_datetime: datetime = Query(..., description="When to send the imported emails"),
+    format: Optional[str] = Query(None, description="Upload format: csv or ndjson (defaults from Content-Type)"),
+    template_id: Optional[str] = Query(None, description="Template applied to every row"),
+    subject: Optional[str] = Query(None, description="Subject used when there is no template or subject column"),
+    message: Optional[str] = Query(None, description="Message used when there is no template or message column"),
+    priority: str = Query("normal", description="Default priority"),
+    category: str = Query("general", description="Default category"),
+    user_id: str = Query("default", description="Tenant the imported emails belong to"),
+    import_id: Optional[str] = Query(None, description="Client-chosen ID to poll progress while uploading")
+):
+    """Stream a CSV or NDJSON recipient file into scheduled emails.
+
+    Rows need an 'email' (or 'recipient_email') column; every column is available
+    as a {placeholder} in the subject and message, other braces are kept as written. Rows are validated and
+    deduplicated as they arrive and inserted in batches, so memory stays bounded
+    whatever the file size.
+    """
+    content_type = request.headers.get("content-type", "")
+    upload_format = (format or ("ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv")).lower()
+    if upload_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Unsupported import format")
+
+    defaults = {"subject": subject, "message": message, "priority": priority, "category": category}
+    if template_id:
+        template = await email_templates_collection.find_one({"id": template_id})
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        defaults["subject"] = template["subject"]
+        defaults["message"] = template["message"]
+
+    import_id = import_id or str(uuid.uuid4())
+    progress = {"rows_read": 0, "imported": 0, "rejected": 0, "bytes_read": 0}
+    try:
+        await import_jobs_collection.insert_one({
+            "id": import_id,
+            "status": "running",
+            "format": upload_format,
+            "started_at": datetime.now(timezone.utc),
+            "finished_at": None,
+            **progress
+        })
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Import ID already used")
+
+    try:
+        batch: List[dict] = []
+        rejections: List[dict] = []
+        batch_keys: set = set()
+        await suppression_index.ensure_fresh()
+        async for row_number, row, error in _iter_import_rows(request, upload_format, progress):
+            progress["rows_read"] += 1
+            try:
+                if error:
+                    raise ValueError(error)
+                email = _prepare_import_row(row, defaults)
+                import_key = email["recipient_email"].lower()
+                if import_key in batch_keys:
+                    raise ValueError("Duplicate recipient")
+                if suppression_index.is_suppressed(import_key):
+                    raise ValueError("Suppressed recipient")
+            except ValueError as e:
+                email_column = (row or {}).get("email") or (row or {}).get("recipient_email") or ""
+                rejections.append({"row": row_number, "email": str(email_column), "reason": str(e)})
+            else:
+                batch_keys.add(import_key)
+                created_at = datetime.now(timezone.utc)
+                batch.append({
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "scheduled_datetime": scheduled_datetime,
+                    **email,
+                    "status": "pending",
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                    "sent_at": None,
+                    "is_recurring": False,
+                    "recurring_pattern": None,
+                    "recurring_end_date": None,
+                    "import_id": import_id,
+                    "import_key": import_key,
+                    "import_row": row_number
+                })
+
+            if len(batch) + len(rejections) >= IMPORT_BATCH_SIZE:
+                await _flush_import_batch(import_id, batch, rejections, progress)
+                batch, rejections, batch_keys = [], [], set()
+
+        await _flush_import_batch(import_id, batch, rejections, progress)
+        await import_jobs_collection.update_one(
+            {"id": import_id},
+            {"$set": {"status": "completed", "finished_at": datetime.now(timezone.utc)}}
+        )
+        return {"import_id": import_id, "status": "completed", **progress}
+
+    except Exception as e:
+        await import_jobs_collection.update_one(
+            {"id": import_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc), **progress}}
+        )
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Failed to import emails: {str(e)}")
+
+@app.get("/api/scheduled-emails/imports/{import_id}")
+async def get_import_progress(import_id: str):
+    """Progress and counters of an import, also while it is still running"""
+    job = await import_jobs_collection.find_one({"id": import_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+@app.get("/api/scheduled-emails/imports/{import_id}/rejections")
+async def export_import_rejections(import_id: str):
+    """Download the rejected rows of an import as CSV"""
+    if not await import_jobs_collection.find_one({"id": import_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Import not found")
+
+    async def rejection_rows():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["Row", "Email", "Reason"])
+        cursor = reporting_rejections_collection.find({"import_id": import_id}).sort("row", 1)
+        async for rejection in cursor:
+            writer.writerow([rejection["row"], rejection["email"], rejection["reason"]])
+            if output.tell() > 64 * 1024:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+
+    return StreamingResponse(
+        rejection_rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=import_{import_id}_rejections.csv"}
+    )
+
 @app.get("/api/scheduled-emails", response_model=List[ScheduledEmailResponse])
 async def get_scheduled_emails(
     status: Optional[str] = Query(None, description="Filter by status"),
     priority: Optional[str] = Query(None, description="Filter by priority"),
     category: Optional[str] = Query(None, description="Filter by category"),
     search: Optional[str] = Query(None, description="Search in subject or recipient"),
+    user_id: Optional[str] = Query(None, description="Filter by tenant"),
     limit: Optional[int] = Query(100, description="Limit number of results")
 ):
     """Get scheduled emails with advanced filtering"""
     try:
         query = {}
         
+        if user_id:
+            query["user_id"] = user_id
         if status:
             query["status"] = status
         if priority:
@@ -666,36 +4062,70 @@ async def get_scheduled_emails(
         
         cursor = scheduled_emails_collection.find(query).sort("scheduled_datetime", 1).limit(limit)
         scheduled_emails = await cursor.to_list(length=None)
+        await body_store.hydrate(scheduled_emails)
         
         return [ScheduledEmailResponse(**email) for email in scheduled_emails]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch scheduled emails: {str(e)}")
 
+@app.get("/api/scheduled-emails/events")
+async def stream_scheduled_email_events(request: Request):
+    """Server-sent events with incremental create/update/delete changes to scheduled emails"""
+    subscription = event_broker.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\nevent: ready\ndata: {}\n\n"
+            while not await request.is_disconnected():
+                events = await subscription.next_batch(timeout=EVENT_KEEPALIVE_SECONDS)
+                if events:
+                    yield f"event: changes\ndata: {json.dumps(events, default=str)}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Bulk Actions Endpoint
 @app.post("/api/scheduled-emails/bulk-action")
 async def bulk_action_emails(request: BulkActionRequest):
     """Perform bulk actions on selected emails"""
     try:
         if request.action == "delete":
+            # Only delete pending emails
+            deletable = await scheduled_emails_collection.find(
+                {"id": {"$in": request.email_ids}, "status": "pending"},
+                {"_id": 0, "id": 1, "status": 1, "priority": 1, "category": 1}
+            ).to_list(length=None)
             result = await scheduled_emails_collection.delete_many({
-                "id": {"$in": request.email_ids},
-                "status": "pending"  # Only delete pending emails
+                "id": {"$in": [email["id"] for email in deletable]},
+                "status": "pending"
             })
+            await record_status_changes(deletable[:result.deleted_count], "cancelled")
+            due_scheduler.notify_cancelled([email["id"] for email in deletable])
+            event_broker.publish_deleted(deletable[:result.deleted_count])
             return {"message": f"Deleted {result.deleted_count} emails"}
         
         elif request.action == "change_priority":
             result = await scheduled_emails_collection.update_many(
                 {"id": {"$in": request.email_ids}, "status": "pending"},
-                {"$set": {"priority": request.new_value}}
+                {"$set": {"priority": request.new_value, "updated_at": datetime.now(timezone.utc)}}
             )
+            response_cache.bump("scheduled_emails")
             return {"message": f"Updated priority for {result.modified_count} emails"}
         
         elif request.action == "change_category":
             result = await scheduled_emails_collection.update_many(
                 {"id": {"$in": request.email_ids}},
-                {"$set": {"category": request.new_value}}
+                {"$set": {"category": request.new_value, "updated_at": datetime.now(timezone.utc)}}
             )
+            response_cache.bump("scheduled_emails")
             return {"message": f"Updated category for {result.modified_count} emails"}
         
         else:
@@ -718,7 +4148,7 @@ async def export_scheduled_emails(
         if status:
             query["status"] = status
         
-        emails = await scheduled_emails_collection.find(query).to_list(length=None)
+        emails = await reporting_emails_collection.find(query).to_list(length=None)
         
         if format.lower() == "csv":
             output = io.StringIO()
@@ -766,81 +4196,85 @@ async def check_and_send_emails():
     """Check for due emails and send them"""
     try:
         current_time = datetime.now(timezone.utc)
+
+        if due_scheduler.running:
+            # Sending here would bypass the dispatcher's tenant queues and their caps
+            due_count = await dispatcher_emails_collection.count_documents({
+                "status": "pending",
+                "dispatch_at": {"$lte": current_time}
+            })
+            due_scheduler.rescan_now()
+            return EmailCheckResult(checked_count=due_count, sent_count=0, failed_count=0, details=[],
+                                    queued_count=due_count)
         
-        # Find pending emails that are due, sorted by priority
-        cursor = scheduled_emails_collection.find({
+        # Find pending emails that are due, sorted by priority; the pipeline pulls them in batches
+        cursor = dispatcher_emails_collection.find({
             "status": "pending",
-            "scheduled_datetime": {"$lte": current_time}
-        }).sort([("priority", -1), ("scheduled_datetime", 1)])
-        
-        due_emails = await cursor.to_list(length=None)
-        
-        sent_count = 0
-        failed_count = 0
-        details = []
-        
-        for email_doc in due_emails:
-            try:
-                # Attempt to send email
-                success = await email_service.send_email(
-                    recipient=email_doc["recipient_email"],
-                    recipient_name=email_doc.get("recipient_name", ""),
-                    subject=email_doc["subject"],
-                    body=email_doc["message"]
-                )
-                
-                if success:
-                    # Update status to sent
-                    await scheduled_emails_collection.update_one(
-                        {"id": email_doc["id"]},
-                        {
-                            "$set": {
-                                "status": "sent",
-                                "sent_at": datetime.now(timezone.utc)
-                            }
-                        }
-                    )
-                    sent_count += 1
-                    details.append({
-                        "id": email_doc["id"],
-                        "status": "sent",
-                        "recipient": email_doc["recipient_email"],
-                        "scheduled_datetime": email_doc["scheduled_datetime"].isoformat()
-                    })
-                else:
-                    # Update status to failed
-                    await scheduled_emails_collection.update_one(
-                        {"id": email_doc["id"]},
-                        {"$set": {"status": "failed"}}
-                    )
-                    failed_count += 1
-                    details.append({
-                        "id": email_doc["id"],
-                        "status": "failed",
-                        "recipient": email_doc["recipient_email"],
-                        "scheduled_datetime": email_doc["scheduled_datetime"].isoformat()
-                    })
-                    
-            except Exception as e:
-                failed_count += 1
-                details.append({
-                    "id": email_doc["id"],
-                    "status": "failed",
-                    "error": str(e),
-                    "recipient": email_doc["recipient_email"],
-                    "scheduled_datetime": email_doc["scheduled_datetime"].isoformat()
-                })
+            "dispatch_at": {"$lte": current_time}
+        }).sort([("priority", -1), ("scheduled_datetime", 1)]).batch_size(PIPELINE_QUEUE_SIZE)
         
-        return EmailCheckResult(
-            checked_count=len(due_emails),
-            sent_count=sent_count,
-            failed_count=failed_count,
-            details=details
-        )
+        result = await send_pipeline.run(cursor)
+        return EmailCheckResult(**result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to check and send emails: {str(e)}")
 
+@app.get("/api/pipeline/stats")
+async def get_pipeline_stats():
+    """Per-stage queue depth, concurrency and throughput of the send pipeline"""
+    return {**send_pipeline.stats(), "dispatcher": due_scheduler.stats(), "response_cache": response_cache.stats()}
+
+@app.get("/api/mongo/pools")
+async def get_mongo_pool_stats():
+    """Connection pool settings and checkout wait times for each MongoDB access path"""
+    return {
+        path: {**mongo_pool_monitors[path].stats(), "options": mongo_client_options[path]}
+        for path in mongo_pool_monitors
+    }
+
+@app.get("/api/forecast")
+async def forecast_send_queue(
+    workers: Optional[int] = Query(None, ge=1, description="Concurrent sends (default: pipeline transmit concurrency)"),
+    rate_per_minute: Optional[int] = Query(None, ge=1, description="Send rate limit (default: sum of sender account limits)"),
+    campaign_size: int = Query(0, ge=0, description="Emails in a planned campaign to add to the backlog"),
+    campaign_at: Optional[datetime] = Query(None, description="When the planned campaign is due (default: now)"),
+    campaign_priority: str = Query("normal", description="Priority of the planned campaign"),
+    campaign_category: str = Query("general", description="Category of the planned campaign"),
+    seed: Optional[int] = Query(None, description="Random seed for a reproducible forecast")
+):
+    """Simulate the dispatcher over the pending backlog and project completion times and queue depth"""
+    try:
+        return await build_forecast(workers, rate_per_minute, campaign_size, campaign_at,
+                                    campaign_priority, campaign_category, seed)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to forecast send queue: {str(e)}")
+
+@app.get("/api/admission/stats")
+async def get_admission_stats():
+    """In-flight requests, admissions and rejections per request lane"""
+    return admission.stats()
+
+@app.get("/api/delivery-log")
+async def get_delivery_log(
+    limit: int = Query(100, ge=1, le=DELIVERY_LOG_BUFFER_SIZE, description="Maximum number of events"),
+    outcome: Optional[str] = Query(None, description="Filter by outcome: sent or failed"),
+    email_id: Optional[str] = Query(None, description="Filter by scheduled email ID"),
+    domain: Optional[str] = Query(None, description="Filter by recipient domain")
+):
+    """Recent delivery events, newest first"""
+    events = []
+    for event in reversed(delivery_log.recent):
+        if outcome and event["outcome"] != outcome:
+            continue
+        if email_id and event["email_id"] != email_id:
+            continue
+        if domain and event["recipient_domain"] != domain.lower():
+            continue
+        events.append(event)
+        if len(events) >= limit:
+            break
+    return events
+
 @app.post("/api/test-email")
 async def test_email():
     """Test email sending with current settings"""
@@ -879,13 +4313,18 @@ async def test_email():
 async def cancel_scheduled_email(email_id: str):
     """Cancel a scheduled email (only if status is pending)"""
     try:
-        result = await scheduled_emails_collection.delete_one({
-            "id": email_id,
-            "status": "pending"
-        })
+        cancelled = await scheduled_emails_collection.find_one_and_delete(
+            {"id": email_id, "status": "pending"},
+            projection={"_id": 0, "id": 1, "status": 1, "priority": 1, "category": 1}
+        )
         
-        if result.deleted_count == 0:
+        if cancelled is None:
             raise HTTPException(status_code=404, detail="Scheduled email not found or already processed")
+
+        due_scheduler.notify_cancelled([email_id])
+        event_broker.publish_deleted([cancelled])
+
+        await record_status_changes([cancelled], "cancelled")
         
         return {"message": "Scheduled email cancelled successfully"}
         
@@ -1,11 +1,22 @@
 import requests
 import sys
 import json
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+DEFAULT_REMOTE_URL = "https://timely-mailer.preview.emergentagent.com"
+DEFAULT_LOCAL_URL = "http://localhost:8001"
+DEFAULT_REQUEST_MIX = "schedule=3,list=5,analytics=2,export=1,bulk=1"
 
 class ScheduledEmailAPITester:
-    def __init__(self, base_url="https://timely-mailer.preview.emergentagent.com"):
+    def __init__(self, base_url=DEFAULT_REMOTE_URL):
         self.base_url = base_url
         self.tests_run = 0
         self.tests_passed = 0
@@ -130,11 +141,183 @@ class ScheduledEmailAPITester:
             except Exception as e:
                 print(f"   ❌ Error deleting email {email_id[:8]}...: {str(e)}")
 
+class LoadGenerator:
+    """Drives a weighted mix of API calls from concurrent workers and records latencies per endpoint"""
+
+    def __init__(self, base_url: str, concurrency: int, duration: float, mix: Dict[str, int], timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.duration = duration
+        self.timeout = timeout
+        self.operations = [name for name, weight in mix.items() for _ in range(weight)]
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.created_email_ids: List[str] = []
+        self.elapsed = 0.0
+
+    def _record(self, endpoint: str, started: float, ok: bool):
+        self.latencies.setdefault(endpoint, []).append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    async def _call(self, session: requests.Session, endpoint: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            # requests is blocking, so each call runs on a worker thread
+            response = await asyncio.to_thread(
+                session.request, method, f"{self.base_url}/{path}", timeout=self.timeout, **kwargs
+            )
+            self._record(endpoint, started, response.status_code < 400)
+            return response
+        except requests.RequestException:
+            self._record(endpoint, started, False)
+            return None
+
+    async def _schedule(self, session: requests.Session):
+        response = await self._call(session, "schedule", "POST", "api/schedule-email", json={
+            # Far enough ahead that the dispatcher never sends load-test mail
+            "scheduled_datetime": (datetime.now(timezone.utc) + timedelta(days=365)).isoformat(),
+            "recipient_email": f"load-{uuid.uuid4().hex[:12]}@example.com",
+            "recipient_name": "Load Test",
+            "subject": "Load test email",
+            "message": "Generated by backend_test.py --load",
+            "priority": random.choice(["low", "normal", "high"]),
+            "category": "load-test"
+        })
+        if response is not None and response.status_code == 200:
+            self.created_email_ids.append(response.json()["id"])
+
+    async def _list(self, session: requests.Session):
+        params = random.choice([
+            {},
+            {"status": "pending"},
+            {"priority": "high"},
+            {"category": "load-test", "limit": 50},
+            {"search": "load"}
+        ])
+        await self._call(session, "list", "GET", "api/scheduled-emails", params=params)
+
+    async def _analytics(self, session: requests.Session):
+        await self._call(session, "analytics", "GET", "api/analytics")
+
+    async def _export(self, session: requests.Session):
+        await self._call(session, "export", "GET", "api/scheduled-emails/export", params={"status": "pending"})
+
+    async def _bulk(self, session: requests.Session):
+        email_ids = [self.created_email_ids.pop() for _ in range(min(10, len(self.created_email_ids)))]
+        if not email_ids:
+            await self._schedule(session)
+            return
+        await self._call(session, "bulk", "POST", "api/scheduled-emails/bulk-action",
+                         json={"email_ids": email_ids, "action": "delete"})
+
+    async def _worker(self, deadline: float):
+        handlers = {
+            "schedule": self._schedule,
+            "list": self._list,
+            "analytics": self._analytics,
+            "export": self._export,
+            "bulk": self._bulk
+        }
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                await handlers[random.choice(self.operations)](session)
+
+    async def run(self):
+        # Enough threads for every worker to have a request in flight
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.concurrency)
+        )
+        started = time.perf_counter()
+        deadline = started + self.duration
+        await asyncio.gather(*(self._worker(deadline) for _ in range(self.concurrency)))
+        self.elapsed = time.perf_counter() - started
+
+    def cleanup(self):
+        print(f"\n🧹 Deleting {len(self.created_email_ids)} load-test emails...")
+        with requests.Session() as session:
+            for start in range(0, len(self.created_email_ids), 500):
+                session.post(
+                    f"{self.base_url}/api/scheduled-emails/bulk-action",
+                    json={"email_ids": self.created_email_ids[start:start + 500], "action": "delete"},
+                    timeout=self.timeout
+                )
+        self.created_email_ids = []
+
+    @staticmethod
+    def percentile(sorted_values: List[float], pct: float) -> float:
+        if not sorted_values:
+            return 0.0
+        rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+        return sorted_values[rank]
+
+    def report(self) -> int:
+        print("\n" + "=" * 96)
+        print(f"📊 LOAD TEST RESULTS ({self.concurrency} workers, {self.elapsed:.1f}s against {self.base_url})")
+        print("=" * 96)
+        print(f"{'Endpoint':<12}{'Requests':>10}{'Errors':>8}{'Err %':>8}{'Req/s':>9}"
+              f"{'p50 ms':>9}{'p90 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        print("-" * 96)
+
+        total_requests = 0
+        total_errors = 0
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            errors = self.errors.get(endpoint, 0)
+            total_requests += len(values)
+            total_errors += errors
+            print(f"{endpoint:<12}{len(values):>10}{errors:>8}{errors / len(values) * 100:>7.1f}%"
+                  f"{len(values) / self.elapsed:>9.1f}"
+                  f"{self.percentile(values, 50):>9.1f}{self.percentile(values, 90):>9.1f}"
+                  f"{self.percentile(values, 95):>9.1f}{self.percentile(values, 99):>9.1f}{values[-1]:>9.1f}")
+
+        print("-" * 96)
+        if total_requests:
+            print(f"Total: {total_requests} requests, {total_requests / self.elapsed:.1f} req/s, "
+                  f"{total_errors / total_requests * 100:.2f}% errors")
+        return 0 if total_errors == 0 else 1
+
+def parse_request_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("schedule", "list", "analytics", "export", "bulk"):
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}'")
+        mix[name] = int(weight or 1)
+    return mix
+
+def run_load_test(args) -> int:
+    base_url = args.base_url or os.getenv("BACKEND_URL", DEFAULT_LOCAL_URL)
+    print(f"🚀 Load testing {base_url} with {args.concurrency} workers for {args.duration:.0f}s")
+    print(f"   Request mix: {args.mix}")
+
+    generator = LoadGenerator(base_url, args.concurrency, args.duration, args.mix)
+    try:
+        asyncio.run(generator.run())
+    except KeyboardInterrupt:
+        print("\n⚠️  Load test interrupted by user")
+    finally:
+        generator.cleanup()
+    return generator.report()
+
 def main():
+    parser = argparse.ArgumentParser(description="Scheduled Email API tests and load generator")
+    parser.add_argument("--base-url", default=None, help="API base URL (env BACKEND_URL)")
+    parser.add_argument("--load", action="store_true", help="Run the concurrent load generator instead of the functional tests")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent workers for --load")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run --load for")
+    parser.add_argument("--mix", type=parse_request_mix, default=parse_request_mix(DEFAULT_REQUEST_MIX),
+                        help=f"Weighted request mix for --load (default: {DEFAULT_REQUEST_MIX})")
+    args = parser.parse_args()
+
+    if args.load:
+        return run_load_test(args)
+
     print("🚀 Starting Scheduled Email API Tests")
     print("=" * 50)
     
-    tester = ScheduledEmailAPITester()
+    tester = ScheduledEmailAPITester(args.base_url or os.getenv("BACKEND_URL", DEFAULT_REMOTE_URL))
     
     try:
         # Test basic endpoints
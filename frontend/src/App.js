@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Calendar } from './components/ui/calendar';
 import { Button } from './components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './components/ui/card';
@@ -44,6 +44,7 @@ import { EmailFilters } from './components/EmailFilters';
 import { RecurringSchedule } from './components/RecurringSchedule';
 import { useToast } from './components/ui/use-toast';
 import { Toaster } from './components/ui/toaster';
+import { subscribeToEmailEvents } from './lib/emailEvents';
 import './App.css';
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
@@ -71,6 +72,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [checkLoading, setCheckLoading] = useState(false);
   const [activeTab, setActiveTab] = useState('dashboard');
+  const [liveUpdates, setLiveUpdates] = useState(false);
 
   // Filter and selection state
   const [filters, setFilters] = useState({
@@ -88,6 +90,17 @@ function App() {
     fetchScheduledEmails();
   }, []);
 
+  // Keep the list current from server-sent change events instead of refetching
+  const fetchScheduledEmailsRef = useRef(null);
+  fetchScheduledEmailsRef.current = () => fetchScheduledEmails();
+
+  useEffect(() => {
+    return subscribeToEmailEvents({
+      onConnectionChange: setLiveUpdates,
+      onEvents: (events) => applyEmailEvents(events, () => fetchScheduledEmailsRef.current())
+    });
+  }, []);
+
   // Apply filters when emails or filters change
   useEffect(() => {
     applyFilters();
@@ -116,6 +129,27 @@ function App() {
     }
   };
 
+  const applyEmailEvents = (events, refetch) => {
+    if (events.some(event => event.type === 'resync')) {
+      refetch();
+      return;
+    }
+
+    setScheduledEmails(current => {
+      const emailsById = new Map(current.map(email => [email.id, email]));
+      events.forEach(event => {
+        if (event.type === 'deleted') {
+          emailsById.delete(event.id);
+        } else {
+          emailsById.set(event.id, event.email);
+        }
+      });
+      return Array.from(emailsById.values()).sort(
+        (a, b) => new Date(a.scheduled_datetime) - new Date(b.scheduled_datetime)
+      );
+    });
+  };
+
   const applyFilters = () => {
     let filtered = [...scheduledEmails];
 
@@ -198,7 +232,7 @@ function App() {
           title: "Success!",
           description: `Email ${isRecurring ? 'series' : ''} scheduled successfully!`
         });
-        fetchScheduledEmails();
+        if (!liveUpdates) fetchScheduledEmails();
         // Reset form
         setSelectedDate(new Date());
         setSelectedTime('12:00');
@@ -243,9 +277,11 @@ function App() {
         const result = await response.json();
         toast({
           title: "Email Check Complete",
-          description: `Checked ${result.checked_count} emails. Sent: ${result.sent_count}, Failed: ${result.failed_count}`
+          description: result.queued_count
+            ? `${result.queued_count} due emails are being sent by the dispatcher`
+            : `Checked ${result.checked_count} emails. Sent: ${result.sent_count}, Failed: ${result.failed_count}`
         });
-        fetchScheduledEmails();
+        if (!liveUpdates) fetchScheduledEmails();
       } else {
         const errorData = await response.json();
         toast({
@@ -317,7 +353,7 @@ function App() {
           title: "Success",
           description: "Email cancelled successfully"
         });
-        fetchScheduledEmails();
+        if (!liveUpdates) fetchScheduledEmails();
       } else {
         const errorData = await response.json();
         toast({
@@ -367,7 +403,7 @@ function App() {
           title: "Bulk Action Complete",
           description: result.message
         });
-        fetchScheduledEmails();
+        if (!liveUpdates) fetchScheduledEmails();
         setSelectedEmails([]);
       } else {
         const errorData = await response.json();
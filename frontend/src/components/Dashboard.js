@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
 import { Progress } from './ui/progress';
@@ -13,22 +13,122 @@ import {
   PieChart,
   BarChart3
 } from 'lucide-react';
+import { subscribeToEmailEvents } from '../lib/emailEvents';
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+// Events that say what an email looked like before are applied to the counts locally;
+// the rest (resyncs, servers without pre-images) fall back to an occasional refetch
+const ANALYTICS_RESYNC_DELAY_MS = 2000;
+const ANALYTICS_UNKNOWN_CHANGE_DELAY_MS = 30000;
+const RECENT_ACTIVITY_SIZE = 10;
+
+// Statuses are always listed; priorities and categories only while they have emails
+const adjustCount = (counts, key, delta, keepEmpty = false) => {
+  counts[key] = Math.max((counts[key] || 0) + delta, 0);
+  if (!counts[key] && !keepEmpty) delete counts[key];
+};
+
+// Returns the updated analytics and whether every event could be applied
+export function applyEventsToAnalytics(analytics, events) {
+  const next = {
+    ...analytics,
+    emails_by_status: { ...analytics.emails_by_status },
+    emails_by_priority: { ...analytics.emails_by_priority },
+    emails_by_category: { ...analytics.emails_by_category },
+    recent_activity: [...analytics.recent_activity]
+  };
+  let complete = true;
+
+  const count = (email, delta) => {
+    next.total_emails += delta;
+    adjustCount(next.emails_by_status, email.status, delta, true);
+    adjustCount(next.emails_by_priority, email.priority || 'normal', delta);
+    adjustCount(next.emails_by_category, email.category || 'general', delta);
+  };
+
+  events.forEach(event => {
+    if (event.type === 'resync' || (event.type !== 'created' && !event.previous)) {
+      complete = false;
+      return;
+    }
+    if (event.type !== 'created') count(event.previous, -1);
+    if (event.type !== 'deleted') count(event.email, 1);
+
+    next.recent_activity = next.recent_activity.filter(item => item.id !== event.id);
+    if (event.type !== 'deleted') {
+      const { email } = event;
+      const wasRecent = analytics.recent_activity.some(item => item.id === event.id);
+      if (event.type === 'created' || wasRecent) {
+        next.recent_activity.push({
+          id: email.id,
+          subject: email.subject,
+          recipient: email.recipient_email,
+          status: email.status,
+          created_at: email.created_at,
+          priority: email.priority
+        });
+      }
+    }
+  });
+
+  next.recent_activity = next.recent_activity
+    .sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
+    .slice(0, RECENT_ACTIVITY_SIZE);
+  ['pending', 'sent', 'failed'].forEach(status => {
+    next[`${status}_emails`] = next.emails_by_status[status] || 0;
+  });
+  next.success_rate = next.total_emails > 0
+    ? Math.round(next.sent_emails / next.total_emails * 10000) / 100
+    : 0;
+  return { analytics: next, complete };
+}
+
 export function Dashboard() {
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
+  const analyticsRef = useRef(null);
 
   useEffect(() => {
     fetchAnalytics();
   }, []);
 
+  useEffect(() => {
+    let refreshTimer = null;
+    const scheduleRefresh = (delay) => {
+      if (!refreshTimer) {
+        refreshTimer = setTimeout(() => {
+          refreshTimer = null;
+          fetchAnalytics();
+        }, delay);
+      }
+    };
+
+    const unsubscribe = subscribeToEmailEvents({
+      onEvents: (events) => {
+        if (events.some(event => event.type === 'resync')) {
+          scheduleRefresh(ANALYTICS_RESYNC_DELAY_MS);
+          return;
+        }
+        if (!analyticsRef.current) return;
+        const result = applyEventsToAnalytics(analyticsRef.current, events);
+        analyticsRef.current = result.analytics;
+        setAnalytics(result.analytics);
+        if (!result.complete) scheduleRefresh(ANALYTICS_UNKNOWN_CHANGE_DELAY_MS);
+      }
+    });
+    return () => {
+      clearTimeout(refreshTimer);
+      unsubscribe();
+    };
+  }, []);
+
   const fetchAnalytics = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/api/analytics`);
       if (response.ok) {
         const data = await response.json();
+        analyticsRef.current = data;
         setAnalytics(data);
       }
     } catch (error) {
@@ -0,0 +1,55 @@
+const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+
+// One EventSource is shared by every component that listens for email changes
+const listeners = new Set();
+let source = null;
+let connected = false;
+let hasConnected = false;
+
+const notify = (callbackName, payload) => {
+  listeners.forEach(listener => listener[callbackName] && listener[callbackName](payload));
+};
+
+const setConnected = (value) => {
+  if (connected !== value) {
+    connected = value;
+    notify('onConnectionChange', value);
+  }
+};
+
+const connect = () => {
+  source = new EventSource(`${API_BASE_URL}/api/scheduled-emails/events`);
+
+  source.addEventListener('ready', () => {
+    // After a dropped connection we may have missed changes, so ask for a refetch
+    if (hasConnected) notify('onEvents', [{ type: 'resync' }]);
+    hasConnected = true;
+    setConnected(true);
+  });
+
+  source.addEventListener('changes', (event) => {
+    notify('onEvents', JSON.parse(event.data));
+  });
+
+  // EventSource reconnects on its own; until then callers fall back to refetching
+  source.onerror = () => setConnected(false);
+};
+
+export function subscribeToEmailEvents(listener) {
+  listeners.add(listener);
+  if (!source && typeof EventSource !== 'undefined') {
+    connect();
+  } else if (connected && listener.onConnectionChange) {
+    listener.onConnectionChange(true);
+  }
+
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+      connected = false;
+      hasConnected = false;
+    }
+  };
+}
@@ -0,0 +1,65 @@
+import pytest
+from starlette.requests import Request
+
+import server
+from server import AdmissionController
+
+
+def request(method, path):
+    return Request({"type": "http", "method": method, "path": path, "headers": [], "query_string": b""})
+
+
+def lanes(**ingest):
+    limits = {"client_in_flight": 0, "client_rate": 0, "client_burst": 0, "lane_in_flight": 0}
+    return {"ingest": {**limits, **ingest}, "interactive": dict(limits)}
+
+
+@pytest.fixture(autouse=True)
+def idle_api_pool(monkeypatch):
+    monkeypatch.setattr(server.mongo_pool_monitors["api"], "waiting", 0)
+
+
+def test_requests_are_sorted_into_lanes():
+    controller = AdmissionController(lanes())
+
+    assert controller.lane(request("GET", "/api/health")) == "control"
+    assert controller.lane(request("POST", "/api/schedule-email")) == "ingest"
+    assert controller.lane(request("GET", "/api/scheduled-emails")) == "interactive"
+
+
+def test_client_in_flight_limit_frees_up_on_release():
+    controller = AdmissionController(lanes(client_in_flight=2))
+
+    assert controller.admit("ingest", "a") is None
+    assert controller.admit("ingest", "a") is None
+    assert controller.admit("ingest", "a") == 1.0
+    assert controller.admit("ingest", "b") is None
+    controller.release("ingest", "a")
+    assert controller.admit("ingest", "a") is None
+    assert controller.stats()["ingest"]["rejected"] == 1
+
+
+def test_token_bucket_allows_a_burst_then_asks_to_wait():
+    controller = AdmissionController(lanes(client_rate=2, client_burst=3))
+
+    assert [controller.admit("ingest", "a") for _ in range(3)] == [None, None, None]
+    retry_after = controller.admit("ingest", "a")
+    assert 0 < retry_after <= 0.5
+    assert controller.admit("ingest", "b") is None
+
+
+def test_lane_in_flight_limit_applies_across_clients():
+    controller = AdmissionController(lanes(lane_in_flight=2))
+
+    assert controller.admit("ingest", "a") is None
+    assert controller.admit("ingest", "b") is None
+    assert controller.admit("ingest", "c") == 1.0
+    assert controller.admit("interactive", "c") is None
+
+
+def test_ingest_is_shed_while_requests_wait_for_a_database_connection(monkeypatch):
+    controller = AdmissionController(lanes())
+    monkeypatch.setattr(server.mongo_pool_monitors["api"], "waiting", server.ADMISSION_INGEST_MAX_POOL_WAITERS)
+
+    assert controller.admit("ingest", "a") == 1.0
+    assert controller.admit("interactive", "a") is None
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import DueEmailScheduler
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for key, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc[key]
+            if "$lte" in condition and not value <= condition["$lte"]:
+                return False
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+        elif doc[key] != condition:
+            return False
+    return True
+
+
+class FakeEmails:
+    def __init__(self, email_docs):
+        self.email_docs = email_docs
+        self.queries = 0
+
+    def find(self, query, projection=None):
+        self.queries += 1
+        return FakeCursor([dict(doc) for doc in self.email_docs if _matches(doc, query)])
+
+
+def pending(email_id, dispatch_at):
+    return {"id": email_id, "status": "pending", "dispatch_at": dispatch_at, "user_id": "default"}
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    async def no_recovery(exclude=()):
+        return 0
+
+    monkeypatch.setattr(server, "recover_interrupted_sends", no_recovery)
+    return DueEmailScheduler(pipeline=None, prefetch_seconds=300)
+
+
+def run_timer(scheduler, seconds):
+    async def main():
+        scheduler._wakeup = asyncio.Event()
+        scheduler.tenants.start()
+        timer = asyncio.create_task(scheduler._run_timer())
+        await asyncio.sleep(seconds)
+        timer.cancel()
+        await asyncio.gather(timer, return_exceptions=True)
+    asyncio.run(main())
+
+
+def queued_ids(scheduler):
+    return sorted(email_id for tenant in scheduler.tenants._tenants.values() for email_id in tenant["queue"])
+
+
+def test_full_pages_of_emails_due_at_the_same_instant_are_paged_through(monkeypatch, scheduler):
+    due = datetime.now(timezone.utc) - timedelta(minutes=1)
+    emails = FakeEmails([pending(f"e{i}", due) for i in range(5)])
+    monkeypatch.setattr(server, "dispatcher_emails_collection", emails)
+    monkeypatch.setattr(server, "DISPATCHER_PREFETCH_LIMIT", 3)
+
+    run_timer(scheduler, 0.2)
+
+    assert queued_ids(scheduler) == ["e0", "e1", "e2", "e3", "e4"]
+    assert emails.queries == 2
+
+
+def test_prefetch_pauses_while_the_backlog_is_large(monkeypatch, scheduler):
+    due = datetime.now(timezone.utc) - timedelta(minutes=1)
+    emails = FakeEmails([pending(f"e{i}", due + timedelta(seconds=i)) for i in range(10)])
+    monkeypatch.setattr(server, "dispatcher_emails_collection", emails)
+    monkeypatch.setattr(server, "DISPATCHER_PREFETCH_LIMIT", 3)
+    monkeypatch.setattr(server, "DISPATCHER_MAX_LOADED", 5)
+
+    run_timer(scheduler, 0.2)
+
+    assert queued_ids(scheduler) == ["e0", "e1", "e2", "e3", "e4", "e5"]
+    assert emails.queries == 2
+
+
+def test_emails_beyond_the_window_wait_for_a_later_prefetch(monkeypatch, scheduler):
+    now = datetime.now(timezone.utc)
+    emails = FakeEmails([pending("soon", now - timedelta(seconds=1)), pending("later", now + timedelta(hours=1))])
+    monkeypatch.setattr(server, "dispatcher_emails_collection", emails)
+
+    run_timer(scheduler, 0.1)
+
+    assert queued_ids(scheduler) == ["soon"]
+    assert "later" not in scheduler._due_at
+    assert emails.queries == 1
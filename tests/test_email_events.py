@@ -0,0 +1,67 @@
+import asyncio
+
+from server import EmailEventSubscription
+import server
+
+
+def flush(subscription):
+    async def main():
+        return await subscription.next_batch(timeout=1)
+    return asyncio.run(main())
+
+
+def state(status):
+    return {"status": status, "priority": "normal", "category": "general"}
+
+
+def test_created_then_updated_is_sent_as_created_with_the_latest_email():
+    subscription = EmailEventSubscription()
+    subscription.push({"type": "created", "id": "a", "email": {"status": "pending"}})
+    subscription.push({"type": "updated", "id": "a", "email": {"status": "sent"}, "previous": state("pending")})
+
+    assert flush(subscription) == [{"type": "created", "id": "a", "email": {"status": "sent"}}]
+
+
+def test_created_then_deleted_is_dropped():
+    subscription = EmailEventSubscription()
+    subscription.push({"type": "created", "id": "a", "email": {"status": "pending"}})
+    subscription.push({"type": "deleted", "id": "a", "previous": state("pending")})
+    subscription.push({"type": "created", "id": "b", "email": {"status": "pending"}})
+
+    assert [event["id"] for event in flush(subscription)] == ["b"]
+
+
+def test_coalesced_updates_keep_the_state_before_the_first_change():
+    subscription = EmailEventSubscription()
+    subscription.push({"type": "updated", "id": "a", "email": {"status": "sending"}, "previous": state("pending")})
+    subscription.push({"type": "updated", "id": "a", "email": {"status": "sent"}, "previous": state("sending")})
+
+    assert flush(subscription) == [
+        {"type": "updated", "id": "a", "email": {"status": "sent"}, "previous": state("pending")}
+    ]
+
+
+def test_unknown_previous_state_is_not_replaced_by_a_later_one():
+    subscription = EmailEventSubscription()
+    subscription.push({"type": "updated", "id": "a", "email": {"status": "sending"}})
+    subscription.push({"type": "deleted", "id": "a", "previous": state("sending")})
+
+    assert flush(subscription) == [{"type": "deleted", "id": "a"}]
+
+
+def test_falling_too_far_behind_turns_into_a_resync(monkeypatch):
+    monkeypatch.setattr(server, "EVENT_MAX_PENDING", 3)
+    subscription = EmailEventSubscription()
+    for email_id in "abcde":
+        subscription.push({"type": "created", "id": email_id, "email": {}})
+
+    assert flush(subscription) == [{"type": "resync"}]
+
+
+def test_no_events_within_the_timeout_returns_an_empty_batch():
+    subscription = EmailEventSubscription()
+
+    async def main():
+        return await subscription.next_batch(timeout=0.01)
+
+    assert asyncio.run(main()) == []
@@ -0,0 +1,61 @@
+import pytest
+
+from server import simulate_send_queue
+
+
+def test_single_worker_sends_one_after_another():
+    result = simulate_send_queue([(0.0, "normal", "general", 3)], [1.0], workers=1)
+
+    assert result["emails"] == 3
+    assert result["finish_seconds"] == 3.0
+    stats = result["summary"]["priority"]["normal"]
+    assert stats["count"] == 3
+    assert stats["max_wait_seconds"] == 3.0
+    assert stats["last_finish_seconds"] == 3.0
+
+
+def test_workers_send_in_parallel():
+    result = simulate_send_queue([(0.0, "normal", "general", 8)], [2.0], workers=4)
+
+    assert result["finish_seconds"] == 4.0
+
+
+def test_emails_are_not_sent_before_they_are_due():
+    result = simulate_send_queue([(0.0, "high", "alerts", 1), (100.0, "normal", "newsletter", 1)], [1.0], workers=1)
+
+    assert result["summary"]["category"]["newsletter"]["last_finish_seconds"] == 101.0
+    assert result["summary"]["category"]["newsletter"]["max_wait_seconds"] == 1.0
+    assert result["summary"]["category"]["alerts"]["last_finish_seconds"] == 1.0
+
+
+def test_rate_limit_caps_starts_per_minute():
+    result = simulate_send_queue([(0.0, "normal", "general", 25)], [0.1], workers=10, rate_per_minute=10)
+
+    # Starts at 0s (10), 60s (10) and 120s (5)
+    assert result["finish_seconds"] == pytest.approx(120.1)
+
+
+def test_queue_depth_drains_to_zero():
+    result = simulate_send_queue([(0.0, "normal", "general", 100)], [1.0], workers=5)
+
+    depth = [waiting for _, waiting in result["depth"]]
+    assert depth[0] == 95
+    assert depth[-1] == 0
+    assert depth == sorted(depth, reverse=True)
+
+
+def test_seeded_runs_are_reproducible():
+    groups = [(0.0, "normal", "general", 500)]
+    latencies = [0.2, 0.5, 1.5, 4.0]
+
+    first = simulate_send_queue(groups, latencies, workers=3, seed=42)
+    second = simulate_send_queue(groups, latencies, workers=3, seed=42)
+
+    assert first["finish_seconds"] == second["finish_seconds"]
+    assert first["summary"] == second["summary"]
+
+
+def test_empty_backlog():
+    result = simulate_send_queue([], [1.0], workers=4)
+
+    assert result == {"emails": 0, "finish_seconds": 0.0, "depth": [], "summary": {"priority": {}, "category": {}}}
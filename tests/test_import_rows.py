@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+import server
+from server import _iter_import_rows, _prepare_import_row, render_template_text
+
+
+class StreamedRequest:
+    def __init__(self, *chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def rows(upload_format, *chunks):
+    progress = {"bytes_read": 0}
+
+    async def main():
+        return [row async for row in _iter_import_rows(StreamedRequest(*chunks), upload_format, progress)]
+
+    return asyncio.run(main()), progress
+
+
+def test_csv_rows_are_keyed_by_lowercased_header_across_chunk_boundaries():
+    parsed, progress = rows("csv", b"Email,Name\na@example.com,A", b"nn\nb@example.com,Bob\n")
+
+    assert parsed == [
+        (1, {"email": "a@example.com", "name": "Ann"}, None),
+        (2, {"email": "b@example.com", "name": "Bob"}, None)
+    ]
+    assert progress["bytes_read"] == 47
+
+
+def test_csv_quoted_fields_may_span_lines():
+    parsed, _ = rows("csv", b'email,note\na@example.com,"line one\nline two"\n')
+
+    assert parsed == [(1, {"email": "a@example.com", "note": "line one\nline two"}, None)]
+
+
+def test_csv_utf8_bom_and_multibyte_characters_split_across_chunks():
+    data = "﻿email,name\nz@example.com,Zoë\n".encode("utf-8")
+    split = data.index(b"\xc3") + 1
+    parsed, _ = rows("csv", data[:split], data[split:])
+
+    assert parsed == [(1, {"email": "z@example.com", "name": "Zoë"}, None)]
+
+
+def test_csv_rows_with_the_wrong_column_count_are_reported():
+    parsed, _ = rows("csv", b"email,name\na@example.com\n\nb@example.com,Bob\n")
+
+    assert parsed == [
+        (1, None, "Expected 2 columns, got 1"),
+        (2, {"email": "b@example.com", "name": "Bob"}, None)
+    ]
+
+
+def test_csv_unterminated_quote_is_reported():
+    parsed, _ = rows("csv", b'email,name\na@example.com,"Ann\n')
+
+    assert parsed == [(1, None, "Unterminated quoted field")]
+
+
+def test_csv_header_only_yields_no_rows():
+    parsed, _ = rows("csv", b"email,name\n")
+
+    assert parsed == []
+
+
+def test_ndjson_skips_blank_lines_and_reports_invalid_ones():
+    parsed, _ = rows("ndjson", b'{"email": "a@example.com"}\n\n[1, 2]\n{broken\n')
+
+    assert parsed[0] == (1, {"email": "a@example.com"}, None)
+    assert parsed[1][0] == 2 and parsed[1][2].startswith("Invalid JSON")
+    assert parsed[2][0] == 3 and parsed[2][2].startswith("Invalid JSON")
+
+
+def test_placeholders_other_than_row_values_are_left_as_written():
+    text = "Hi {name}! <style>p {color: red}</style> {\"id\": 1} {{name}} {unknown}"
+
+    assert render_template_text(text, {"name": "Ann"}) == (
+        "Hi Ann! <style>p {color: red}</style> {\"id\": 1} {Ann} {unknown}"
+    )
+
+
+def test_prepared_row_keeps_the_template_body_and_only_the_values_it_uses():
+    defaults = {"subject": "Hello {name}", "message": "Dear {name}, see {link}", "priority": "normal", "category": "general"}
+    email = _prepare_import_row({"Email": " Ann@Example.com ", "Name": "Ann", "Plan": "pro"}, defaults)
+
+    assert email["subject"] == "Hello Ann"
+    assert email["message"] == "Dear {name}, see {link}"
+    assert email["template_variables"] == {"name": "Ann"}
+    assert email["recipient_email"] == "Ann@example.com"
+
+
+def test_prepared_row_without_an_address_is_rejected():
+    with pytest.raises(ValueError, match="Missing email column"):
+        _prepare_import_row({"name": "Ann"}, {"subject": "s", "message": "m", "priority": "normal", "category": "general"})
+
+
+def test_bare_cr_and_crlf_split_across_chunks_end_lines():
+    parsed, _ = rows("csv", b"email,name\ra@example.com,Ann\r", b"\nb@example.com,Bob\rc@example.com,Cy")
+
+    assert [row for _, row, _ in parsed] == [
+        {"email": "a@example.com", "name": "Ann"},
+        {"email": "b@example.com", "name": "Bob"},
+        {"email": "c@example.com", "name": "Cy"}
+    ]
+
+
+def test_overlong_lines_are_rejected_without_being_buffered(monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_MAX_RECORD_BYTES", 40)
+    parsed, _ = rows("ndjson", b'{"email": "', b"x" * 30, b"x" * 30, b'"}\n{"email": "b@example.com"}\n')
+
+    assert parsed == [
+        (1, None, "Line longer than 40 characters"),
+        (2, {"email": "b@example.com"}, None)
+    ]
+
+
+def test_overlong_csv_line_fails_only_its_row(monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_MAX_RECORD_BYTES", 20)
+    parsed, _ = rows("csv", b"email,name\n" + b"x" * 50 + b"\nb@example.com,Bob\n")
+
+    assert parsed == [
+        (1, None, "Line longer than 20 characters"),
+        (2, {"email": "b@example.com", "name": "Bob"}, None)
+    ]
@@ -0,0 +1,61 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import LevelingPlanner, _minute_key
+
+DUE = datetime(2024, 6, 3, 9, 0, 20, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def already_pending(monkeypatch):
+    counts = {}
+
+    async def pending_per_minute(collection, match, field, start, end):
+        return {key: count for key, count in counts.items() if start <= datetime.fromisoformat(key + "+00:00") < end}
+
+    monkeypatch.setattr(server, "pending_per_minute", pending_per_minute)
+    random.seed(7)
+    return counts
+
+
+def spread(policy, count):
+    emails = [{"id": str(index)} for index in range(count)]
+    asyncio.run(LevelingPlanner(None)._spread(policy, DUE, emails))
+    return [email["dispatch_at"] for email in emails]
+
+
+def per_minute(dispatch_times):
+    counts = {}
+    for dispatch_at in dispatch_times:
+        counts[_minute_key(dispatch_at)] = counts.get(_minute_key(dispatch_at), 0) + 1
+    return counts
+
+
+def test_without_a_limit_emails_are_jittered_over_the_window(already_pending):
+    times = spread({"scope": "category", "value": "newsletter", "window_seconds": 600}, 200)
+
+    assert all(DUE <= at <= DUE + timedelta(seconds=600) for at in times)
+    assert len(per_minute(times)) > 5
+
+
+def test_limit_spreads_evenly_and_never_before_the_due_time(already_pending):
+    policy = {"scope": "category", "value": "newsletter", "window_seconds": 300, "max_per_minute": 20}
+    times = spread(policy, 100)
+
+    assert per_minute(times) == {_minute_key(DUE + timedelta(minutes=offset)): 20 for offset in range(5)}
+    assert min(times) >= DUE
+
+
+def test_full_minutes_are_skipped_and_overflow_spills_after_the_window(already_pending):
+    already_pending["2024-06-03T09:01"] = 20
+    policy = {"scope": "category", "value": "newsletter", "window_seconds": 180, "max_per_minute": 20}
+    counts = per_minute(spread(policy, 50))
+
+    assert "2024-06-03T09:01" not in counts
+    assert counts["2024-06-03T09:00"] == 20
+    assert counts["2024-06-03T09:02"] == 20
+    assert counts["2024-06-03T09:03"] == 10
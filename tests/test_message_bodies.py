@@ -0,0 +1,142 @@
+import asyncio
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from server import MessageBodyStore
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, alternative) for alternative in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$in" in condition and doc.get(key) not in condition["$in"]:
+                return False
+            if "$lt" in condition and not (key in doc and doc[key] < condition["$lt"]):
+                return False
+            if "$exists" in condition and (key in doc) != condition["$exists"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class FakeBodies:
+    def __init__(self):
+        self.docs = {}
+        self.writes = 0
+
+    async def update_one(self, query, update, upsert=False):
+        self.writes += 1
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            doc = self.docs[query["_id"]] = {"_id": query["_id"], **update["$setOnInsert"]}
+        doc.update(update["$set"])
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            await self.update_one(operation._filter, operation._doc, upsert=True)
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    async def delete_many(self, query):
+        removed = [body_id for body_id, doc in self.docs.items() if _matches(doc, query)]
+        for body_id in removed:
+            del self.docs[body_id]
+        return DeleteResult(len(removed))
+
+
+class FakeEmails:
+    def __init__(self, email_docs):
+        self.email_docs = email_docs
+
+    async def distinct(self, field, query):
+        return list({doc[field] for doc in self.email_docs if _matches(doc, query)})
+
+
+def test_put_stores_a_body_once_and_compresses_large_ones():
+    collection = FakeBodies()
+    store = MessageBodyStore(collection, compression_threshold=100)
+
+    async def main():
+        small = await store.put("hello")
+        again = await store.put("hello")
+        large = await store.put("x" * 500)
+        return small, again, large
+
+    small, again, large = asyncio.run(main())
+
+    assert small == again == MessageBodyStore.body_id_for("hello")
+    assert collection.writes == 2
+    assert collection.docs[small]["encoding"] == "utf-8"
+    assert collection.docs[large]["encoding"] == "zlib"
+    assert zlib.decompress(collection.docs[large]["data"]) == b"x" * 500
+
+
+def test_put_many_writes_only_uncached_bodies_and_another_process_reads_them():
+    collection = FakeBodies()
+    store = MessageBodyStore(collection, compression_threshold=100)
+
+    async def main():
+        await store.put("first")
+        body_ids = await store.put_many(["first", "second", "y" * 500])
+        return body_ids, await MessageBodyStore(collection).get_many(body_ids)
+
+    body_ids, bodies = asyncio.run(main())
+
+    assert collection.writes == 3
+    assert [bodies[body_id] for body_id in body_ids] == ["first", "second", "y" * 500]
+
+
+def test_hydrate_renders_variables_and_leaves_missing_bodies_unset():
+    store = MessageBodyStore(FakeBodies())
+
+    async def main():
+        body_id = await store.put("Hi {name}")
+        return await store.hydrate([
+            {"id": "a", "body_id": body_id, "template_variables": {"name": "Ada"}},
+            {"id": "b", "body_id": "missing", "html_body_id": body_id}
+        ])
+
+    imported, orphaned = asyncio.run(main())
+
+    assert imported["message"] == "Hi Ada"
+    assert "message" not in orphaned
+    assert orphaned["html_message"] == "Hi {name}"
+
+
+def test_sweep_removes_only_old_unreferenced_bodies():
+    collection = FakeBodies()
+    store = MessageBodyStore(collection)
+    long_ago = datetime.now(timezone.utc) - timedelta(days=1)
+
+    async def main():
+        body_ids = await store.put_many(["referenced", "orphaned", "fresh"])
+        for body_id in body_ids[:2]:
+            collection.docs[body_id]["last_used_at"] = long_ago
+        emails = FakeEmails([{"body_id": body_ids[0], "html_body_id": None}])
+        return body_ids, await store.sweep(emails, grace_seconds=3600, batch_size=1)
+
+    body_ids, removed = asyncio.run(main())
+
+    assert removed == 1
+    assert set(collection.docs) == {body_ids[0], body_ids[2]}
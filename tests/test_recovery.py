@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import recover_interrupted_sends
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class UpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeEmails:
+    def __init__(self, email_docs):
+        self.docs = {email["id"]: email for email in email_docs}
+
+    def find(self, query, projection=None):
+        cutoff = query["sending_started_at"]["$lte"]
+        return FakeCursor([
+            dict(email) for email in self.docs.values()
+            if email["status"] == query["status"] and email["sending_started_at"] <= cutoff
+        ])
+
+    async def update_many(self, query, update):
+        modified = 0
+        for email_id in query["id"]["$in"]:
+            email = self.docs[email_id]
+            if email["status"] == query["status"]:
+                email.update(update["$set"])
+                modified += 1
+        return UpdateResult(modified)
+
+
+def sending(email_id, started_minutes_ago):
+    return {
+        "id": email_id, "status": "sending", "message_id": f"<{email_id}@example.com>",
+        "sending_started_at": datetime.now(timezone.utc) - timedelta(minutes=started_minutes_ago)
+    }
+
+
+@pytest.fixture
+def env(monkeypatch):
+    env = {"recorded": []}
+
+    async def record_status_changes(email_docs, status, at=None, rollups_collection=None):
+        env["recorded"].extend((email["id"], status) for email in email_docs)
+
+    env["emails"] = FakeEmails([sending("orphan", 60), sending("recent", 0), sending("ours", 60)])
+    monkeypatch.setattr(server, "SENDING_RECOVERY_GRACE_SECONDS", 300)
+    monkeypatch.setattr(server, "dispatcher_emails_collection", env["emails"])
+    monkeypatch.setattr(server, "record_status_changes", record_status_changes)
+    return env
+
+
+def statuses(env):
+    return {email_id: email["status"] for email_id, email in env["emails"].docs.items()}
+
+
+def test_failed_policy_settles_only_old_claims_not_held_by_this_process(env):
+    recovered = asyncio.run(recover_interrupted_sends("failed", exclude={"ours"}))
+
+    assert recovered == 1
+    assert statuses(env) == {"orphan": "failed", "recent": "sending", "ours": "sending"}
+    assert env["emails"].docs["orphan"]["recovery_policy"] == "failed"
+    assert env["recorded"] == [("orphan", "failed")]
+
+
+def test_retry_policy_makes_the_email_pending_under_the_same_message_id(env):
+    asyncio.run(recover_interrupted_sends("retry", exclude={"ours"}))
+
+    orphan = env["emails"].docs["orphan"]
+    assert orphan["status"] == "pending"
+    assert orphan["message_id"] == "<orphan@example.com>"
+    assert env["recorded"] == []
+
+
+def test_sent_policy_assumes_delivery(env):
+    asyncio.run(recover_interrupted_sends("sent"))
+
+    assert statuses(env) == {"orphan": "sent", "recent": "sending", "ours": "sent"}
+    assert "sent_at" in env["emails"].docs["orphan"]
+    assert sorted(env["recorded"]) == [("orphan", "sent"), ("ours", "sent")]
+
+
+def test_unknown_policy_is_rejected(env):
+    with pytest.raises(ValueError):
+        asyncio.run(recover_interrupted_sends("resend"))
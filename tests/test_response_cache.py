@@ -0,0 +1,76 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from server import ResponseCache
+
+
+@pytest.fixture
+def cached_app():
+    cache = ResponseCache(max_entries=2, max_age=300)
+    app = FastAPI()
+    calls = []
+
+    @app.get("/items")
+    @cache.cached("items")
+    async def list_items(request: Request, page: int = 1):
+        calls.append(page)
+        return {"page": page, "computed": len(calls)}
+
+    return cache, TestClient(app), calls
+
+
+def test_repeated_request_is_served_from_the_cache(cached_app):
+    cache, client, calls = cached_app
+
+    first = client.get("/items")
+    second = client.get("/items")
+
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("miss", "hit")
+    assert first.json() == second.json() == {"page": 1, "computed": 1}
+    assert calls == [1]
+
+
+def test_bumping_the_collection_invalidates_the_entry(cached_app):
+    cache, client, calls = cached_app
+
+    client.get("/items")
+    cache.bump("items")
+    fresh = client.get("/items")
+
+    assert fresh.headers["X-Cache"] == "miss"
+    assert fresh.json()["computed"] == 2
+    cache.bump("other")
+    assert client.get("/items").headers["X-Cache"] == "hit"
+
+
+def test_matching_etag_gets_not_modified(cached_app):
+    _, client, _ = cached_app
+
+    etag = client.get("/items").headers["ETag"]
+
+    assert client.get("/items", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_query_strings_are_cached_separately_and_least_recent_is_evicted(cached_app):
+    _, client, calls = cached_app
+
+    client.get("/items?page=1")
+    client.get("/items?page=2")
+    client.get("/items?page=1")
+    client.get("/items?page=3")
+
+    assert client.get("/items?page=1").headers["X-Cache"] == "hit"
+    assert client.get("/items?page=2").headers["X-Cache"] == "miss"
+    assert calls == [1, 2, 3, 2]
+
+
+def test_entries_expire_after_max_age(cached_app):
+    cache, client, _ = cached_app
+    cache.max_age = 0
+
+    client.get("/items")
+
+    assert client.get("/items").headers["X-Cache"] == "miss"
@@ -0,0 +1,268 @@
+import asyncio
+import smtplib
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+from server import SendPipeline
+
+ACCOUNT = {"id": "account-1", "sender_email": "sender@example.com", "app_password": "secret"}
+
+
+class FakeEmails:
+    """Scheduled emails keyed by id, supporting the pipeline's claim and status updates"""
+
+    def __init__(self, email_docs):
+        self.status = {email["id"]: email["status"] for email in email_docs}
+        self.updates = []
+
+    def _matches(self, query):
+        status = self.status.get(query["id"])
+        wanted = query["status"]
+        return status in wanted["$in"] if isinstance(wanted, dict) else status == wanted
+
+    async def find_one_and_update(self, query, update, projection=None):
+        if not self._matches(query):
+            return None
+        self.status[query["id"]] = update["$set"]["status"]
+        return {"_id": query["id"]}
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+        if self._matches(query):
+            self.status[query["id"]] = update["$set"]["status"]
+
+
+class FakeSuppressions:
+    def __init__(self, addresses):
+        self.addresses = addresses
+
+    async def ensure_fresh(self):
+        pass
+
+    def is_suppressed(self, address):
+        return address in self.addresses
+
+
+class FakeBodies:
+    async def hydrate(self, email_docs):
+        for email in email_docs:
+            email.setdefault("message", f"Body of {email['id']}")
+        return email_docs
+
+
+class FakeAttachments:
+    async def get_parts(self, attachment_ids):
+        return []
+
+
+class FakeSenderPool:
+    def __init__(self):
+        self.acquired = 0
+        self.released = []
+
+    async def acquire(self):
+        self.acquired += 1
+        return ACCOUNT
+
+    def release(self, account, success, error=None, sender_failure=True):
+        if account is not None:
+            self.released.append((success, sender_failure))
+
+
+def email(email_id, recipient=None):
+    return {
+        "id": email_id,
+        "user_id": "default",
+        "recipient_email": recipient or f"{email_id}@example.com",
+        "recipient_name": "",
+        "subject": "Subject",
+        "status": "pending",
+        "priority": "normal",
+        "category": "general",
+        "scheduled_datetime": datetime(2024, 6, 3, 9, tzinfo=timezone.utc)
+    }
+
+
+@pytest.fixture
+def pipeline_env(monkeypatch):
+    env = {"delivered": [], "senders": [], "recorded": [], "errors": {}, "suppressed": set(), "tenant_settings": {}}
+
+    async def deliver(settings, recipient, message, email_id=None, attempt=1):
+        env["delivered"].append((recipient, message["Message-ID"]))
+        env["senders"].append(settings["sender_email"])
+        return env["errors"].get(recipient)
+
+    async def get_tenant_settings(user_id):
+        return env["tenant_settings"].get(user_id)
+
+    async def record_status_changes(email_docs, status, at=None, rollups_collection=None):
+        env["recorded"].extend((email["id"], status) for email in email_docs)
+
+    env["pool"] = FakeSenderPool()
+    monkeypatch.setattr(server, "suppression_index", FakeSuppressions(env["suppressed"]))
+    monkeypatch.setattr(server, "dispatcher_body_store", FakeBodies())
+    monkeypatch.setattr(server, "dispatcher_attachment_store", FakeAttachments())
+    monkeypatch.setattr(server, "sender_pool", env["pool"])
+    monkeypatch.setattr(server, "record_status_changes", record_status_changes)
+    monkeypatch.setattr(server.email_service, "deliver", deliver)
+    monkeypatch.setattr(server.email_service, "get_tenant_settings", get_tenant_settings)
+    return env
+
+
+def run_pipeline(monkeypatch, email_docs, source_docs=None, **run_options):
+    emails = FakeEmails(email_docs)
+    monkeypatch.setattr(server, "dispatcher_emails_collection", emails)
+    done = []
+
+    async def source():
+        for email_doc in source_docs or email_docs:
+            yield email_doc
+
+    async def main():
+        pipeline = SendPipeline(queue_size=2, concurrency={"render": 2, "build": 2, "transmit": 2, "record": 1})
+        return await pipeline.run(source(), on_done=lambda email_doc: done.append(email_doc["id"]), **run_options), pipeline
+
+    result, pipeline = asyncio.run(main())
+    return result, emails, done, pipeline
+
+
+def test_every_stage_runs_and_the_email_is_recorded_as_sent(monkeypatch, pipeline_env):
+    result, emails, done, pipeline = run_pipeline(monkeypatch, [email("a"), email("b")])
+
+    assert (result["checked_count"], result["sent_count"], result["failed_count"]) == (2, 2, 0)
+    assert emails.status == {"a": "sent", "b": "sent"}
+    assert sorted(pipeline_env["delivered"]) == [
+        ("a@example.com", "<a@example.com>"),
+        ("b@example.com", "<b@example.com>")
+    ]
+    assert sorted(pipeline_env["recorded"]) == [("a", "sent"), ("b", "sent")]
+    assert sorted(done) == ["a", "b"]
+    assert pipeline_env["pool"].released == [(True, True), (True, True)]
+    assert all(stage["processed"] == 2 for stage in pipeline.stats()["stages"].values())
+
+
+def test_suppressed_recipient_skips_to_record(monkeypatch, pipeline_env):
+    pipeline_env["suppressed"].add("blocked@example.com")
+
+    result, emails, done, _ = run_pipeline(monkeypatch, [email("a", "blocked@example.com")])
+
+    assert pipeline_env["delivered"] == []
+    assert emails.status == {"a": "suppressed"}
+    assert pipeline_env["recorded"] == [("a", "suppressed")]
+    assert result["details"][0]["status"] == "suppressed"
+    assert done == ["a"]
+
+
+def test_email_claimed_elsewhere_is_skipped_without_sending(monkeypatch, pipeline_env):
+    cancelled = email("a")
+    cancelled["status"] = "sending"
+
+    result, emails, done, _ = run_pipeline(monkeypatch, [cancelled])
+
+    assert pipeline_env["delivered"] == []
+    assert emails.updates == []
+    assert result["details"][0]["status"] == "skipped"
+    assert pipeline_env["pool"].released == [(None, True)]
+    assert done == ["a"]
+
+
+def test_refused_recipient_fails_without_counting_against_the_account(monkeypatch, pipeline_env):
+    pipeline_env["errors"]["bad@example.com"] = smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"No such user")})
+
+    result, emails, _, _ = run_pipeline(monkeypatch, [email("a", "bad@example.com")])
+
+    assert result["failed_count"] == 1
+    assert emails.status == {"a": "failed"}
+    assert "550" in result["details"][0]["error"]
+    assert pipeline_env["pool"].released == [(False, False)]
+
+
+def test_duplicate_email_in_the_source_is_sent_once(monkeypatch, pipeline_env):
+    doc = email("a")
+
+    result, _, done, _ = run_pipeline(monkeypatch, [doc], source_docs=[doc, dict(doc)])
+
+    assert result["checked_count"] == 1
+    assert len(pipeline_env["delivered"]) == 1
+    assert done == ["a", "a"]
+
+
+def test_stage_error_fails_the_email_and_later_stages_pass_it_through(monkeypatch, pipeline_env):
+    class BrokenBodies:
+        async def hydrate(self, email_docs):
+            raise RuntimeError("body store unavailable")
+
+    monkeypatch.setattr(server, "dispatcher_body_store", BrokenBodies())
+
+    result, emails, _, pipeline = run_pipeline(monkeypatch, [email("a")])
+
+    assert pipeline_env["delivered"] == []
+    assert emails.status == {"a": "failed"}
+    assert result["details"][0]["error"] == "body store unavailable"
+    assert pipeline.stats()["stages"]["render"]["errors"] == 1
+
+
+def test_run_without_details_keeps_only_counts(monkeypatch, pipeline_env):
+    result, _, done, _ = run_pipeline(monkeypatch, [email("a"), email("b")], keep_details=False)
+
+    assert (result["checked_count"], result["sent_count"]) == (2, 2)
+    assert result["details"] == []
+    assert sorted(done) == ["a", "b"]
+
+
+def test_tenant_settings_are_cached_until_saved_again(monkeypatch):
+    class FakeSettings:
+        def __init__(self):
+            self.documents = {}
+            self.reads = 0
+
+        async def find_one(self, query):
+            self.reads += 1
+            return self.documents.get(query["user_id"])
+
+    collection = FakeSettings()
+    monkeypatch.setattr(server, "email_settings_collection", collection)
+    service = server.EmailService()
+
+    async def main():
+        first = await service.get_tenant_settings("tenant-a")
+        collection.documents["tenant-a"] = {"sender_email": "a@example.com", "app_password": "secret"}
+        cached = await service.get_tenant_settings("tenant-a")
+        service.invalidate_tenant_settings("tenant-a")
+        return first, cached, await service.get_tenant_settings("tenant-a")
+
+    first, cached, saved = asyncio.run(main())
+
+    assert first is None and cached is None
+    assert saved["sender_email"] == "a@example.com"
+    assert collection.reads == 2
+
+
+def test_missing_body_fails_the_email_instead_of_sending_it_empty(monkeypatch, pipeline_env):
+    class MissingBodies:
+        async def hydrate(self, email_docs):
+            return email_docs
+
+    monkeypatch.setattr(server, "dispatcher_body_store", MissingBodies())
+
+    result, emails, _, _ = run_pipeline(monkeypatch, [email("a")])
+
+    assert pipeline_env["delivered"] == []
+    assert emails.status == {"a": "failed"}
+    assert result["details"][0]["error"] == "Email has no message body"
+
+
+def test_tenant_settings_take_precedence_over_shared_sender_accounts(monkeypatch, pipeline_env):
+    own = email("a")
+    own["user_id"] = "tenant-a"
+    pipeline_env["tenant_settings"]["tenant-a"] = {
+        **server.email_service.default_settings, "sender_email": "team@tenant-a.example", "sender_name": "Team A"
+    }
+
+    run_pipeline(monkeypatch, [own, email("b")])
+
+    assert sorted(pipeline_env["senders"]) == ["sender@example.com", "team@tenant-a.example"]
+    assert pipeline_env["pool"].acquired == 1
+    assert pipeline_env["pool"].released == [(True, True)]
@@ -0,0 +1,116 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import NoSenderAvailable, SenderPool
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeAccounts:
+    def __init__(self, accounts):
+        self.accounts = accounts
+
+    def find(self, query):
+        return FakeCursor([account for account in self.accounts if account.get("enabled")])
+
+
+def account(account_id, weight=1, **fields):
+    return {"id": account_id, "sender_email": f"{account_id}@example.com", "app_password": "secret",
+            "enabled": True, "weight": weight, **fields}
+
+
+def acquire_many(pool, count, release=True):
+    async def main():
+        chosen = []
+        for _ in range(count):
+            picked = await pool.acquire()
+            chosen.append(picked["id"])
+            if release:
+                pool.release(picked, True)
+        return chosen
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def failure_policy(monkeypatch):
+    monkeypatch.setattr(server, "SENDER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(server, "SENDER_COOLDOWN_SECONDS", 300)
+
+
+def test_weighted_round_robin_interleaves_accounts_by_weight():
+    pool = SenderPool(FakeAccounts([account("a", weight=3), account("b", weight=1)]), strategy="weighted")
+
+    chosen = acquire_many(pool, 8)
+
+    assert Counter(chosen) == {"a": 6, "b": 2}
+    # Smooth: the heavier account never takes every slot in a row of four
+    assert chosen[:4].count("b") == 1 and chosen[4:].count("b") == 1
+
+
+def test_disabled_accounts_are_not_used():
+    pool = SenderPool(FakeAccounts([account("a"), account("b", enabled=False)]))
+
+    assert set(acquire_many(pool, 4)) == {"a"}
+
+
+def test_consecutive_sender_failures_put_an_account_on_cooldown():
+    pool = SenderPool(FakeAccounts([account("a"), account("b")]))
+
+    async def main():
+        first = await pool.acquire()
+        pool.release(first, False, "SMTPAuthenticationError: bad login")
+        second = await pool.acquire()
+        pool.release(second, True)
+        third = await pool.acquire()
+        pool.release(third, False, "SMTPAuthenticationError: bad login")
+        return first["id"], third["id"]
+
+    failing, again = asyncio.run(main())
+
+    assert failing == again
+    assert pool.stats()[failing]["healthy"] is False
+    assert pool.stats()[failing]["last_error"] == "SMTPAuthenticationError: bad login"
+    assert set(acquire_many(pool, 3)) == {"b" if failing == "a" else "a"}
+
+
+def test_recipient_failures_do_not_count_towards_the_cooldown():
+    pool = SenderPool(FakeAccounts([account("a")]))
+
+    async def main():
+        for _ in range(3):
+            picked = await pool.acquire()
+            pool.release(picked, False, "SMTPRecipientsRefused", sender_failure=False)
+
+    asyncio.run(main())
+
+    assert pool.stats()["a"]["healthy"] is True
+    assert pool.stats()["a"]["failed"] == 3
+
+
+def test_no_account_available_once_all_are_cooling_down_or_rate_limited():
+    pool = SenderPool(FakeAccounts([account("a", max_per_minute=2)]))
+    acquire_many(pool, 2)
+
+    with pytest.raises(NoSenderAvailable):
+        acquire_many(pool, 1)
+
+    pool._state["a"]["recent_sends"].clear()
+    pool._state["a"]["cooldown_until"] = datetime.now(timezone.utc) + timedelta(minutes=1)
+    with pytest.raises(NoSenderAvailable):
+        acquire_many(pool, 1)
+
+
+def test_no_accounts_configured_means_no_pool():
+    pool = SenderPool(FakeAccounts([]))
+
+    assert asyncio.run(pool.acquire()) is None
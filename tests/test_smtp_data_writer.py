@@ -0,0 +1,122 @@
+import base64
+import io
+from email.generator import Generator
+
+import server
+from server import SMTPDataWriter, write_message
+
+
+class RecordingServer:
+    def __init__(self):
+        self.chunks = []
+
+    def send(self, data):
+        self.chunks.append(data)
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        return 250, b"OK"
+
+    def rcpt(self, recipient):
+        return 250, b"OK"
+
+    def docmd(self, command):
+        return 354, b"Go ahead"
+
+    def getreply(self):
+        return 250, b"Queued"
+
+    @property
+    def data(self):
+        return b"".join(self.chunks)
+
+
+def write_all(text, chunk_size=64 * 1024, pieces=None):
+    server = RecordingServer()
+    writer = SMTPDataWriter(server, chunk_size=chunk_size)
+    for piece in pieces or [text]:
+        writer.write(piece)
+    writer.close()
+    return server
+
+
+def test_normalises_line_endings_to_crlf():
+    server = write_all("a\nb\r\nc\rd\n")
+    assert server.data == b"a\r\nb\r\nc\r\nd\r\n.\r\n"
+
+
+def test_dot_stuffs_lines_starting_with_a_dot():
+    server = write_all(".hidden\nnot.this\n..two\n")
+    assert server.data == b"..hidden\r\nnot.this\r\n...two\r\n.\r\n"
+
+
+def test_dot_stuffs_lines_split_across_writes():
+    server = write_all(None, chunk_size=4, pieces=["first\n", ".", "second\n"])
+    assert server.data == b"first\r\n..second\r\n.\r\n"
+
+
+def test_sends_complete_lines_once_chunk_size_is_reached():
+    server = write_all(None, chunk_size=10, pieces=["line one\nline", " two\n"])
+    assert server.chunks[0] == b"line one\r\n"
+    assert server.data == b"line one\r\nline two\r\n.\r\n"
+
+
+def test_terminates_message_without_trailing_newline():
+    server = write_all("no newline")
+    assert server.data == b"no newline\r\n.\r\n"
+
+
+def test_accepts_bytes():
+    server = write_all(None, pieces=[b"caf\xc3\xa9\n"])
+    assert server.data == b"caf\xc3\xa9\r\n.\r\n"
+
+
+class LargestWrite(io.StringIO):
+    largest = 0
+
+    def write(self, data):
+        self.largest = max(self.largest, len(data))
+        return super().write(data)
+
+
+def message_with_attachment(size):
+    attachment = {
+        "content_type": "application/pdf",
+        "filename": "report.pdf",
+        "encoded": base64.encodebytes(bytes(range(256)) * (size // 256)).decode("ascii")
+    }
+    service = server.EmailService()
+    return service.build_message(
+        service.default_settings, "to@example.com", "To", "Report", "See attached\n.signature",
+        html_body="<p>See attached</p>", attachments=[attachment], message_id="<id@example.com>"
+    )
+
+
+def test_write_message_matches_the_generator_without_large_writes():
+    message = message_with_attachment(3 * 1024 * 1024)
+    out = LargestWrite()
+    write_message(out, message, chunk_size=64 * 1024)
+    expected = io.StringIO()
+    Generator(expected, mangle_from_=False, maxheaderlen=0).flatten(message)
+
+    assert out.getvalue() == expected.getvalue()
+    assert out.largest <= 64 * 1024
+
+
+def test_send_data_never_sends_more_than_a_chunk_at_once():
+    message = message_with_attachment(3 * 1024 * 1024)
+    smtp = RecordingServer()
+
+    server.EmailService.send_data(smtp, "from@example.com", "to@example.com", message)
+
+    assert max(len(chunk) for chunk in smtp.chunks) <= server.SMTP_DATA_CHUNK_BYTES
+    assert b"\r\n..signature\r\n" in smtp.data
+    assert smtp.data.endswith(b"\r\n.\r\n")
+
+
+def test_a_single_large_write_is_sent_in_chunks():
+    smtp = write_all("x" * 40 + "\n", chunk_size=8)
+    assert max(len(chunk) for chunk in smtp.chunks) <= 8
+    assert smtp.data == b"x" * 40 + b"\r\n.\r\n"
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import server
+from server import TenantDispatchQueues
+
+
+def docs_for(email_ids, user_id):
+    return [{"id": email_id, "user_id": user_id} for email_id in email_ids]
+
+
+async def take(source, count):
+    taken = []
+    while len(taken) < count:
+        taken.append(await asyncio.wait_for(source.__anext__(), 1))
+    return taken
+
+
+def run_drain(queues, load, count):
+    async def main():
+        source = queues.drain(load)
+        try:
+            return await take(source, count)
+        finally:
+            await source.aclose()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def queues(monkeypatch):
+    monkeypatch.setattr(server, "TENANT_LIMITS", {})
+    monkeypatch.setattr(server, "TENANT_MAX_IN_FLIGHT", 0)
+    monkeypatch.setattr(server, "TENANT_RATE_PER_MINUTE", 0)
+    queues = TenantDispatchQueues(quantum=2)
+    queues.start()
+    return queues
+
+
+async def load_all(email_ids):
+    return [{"id": email_id, "user_id": email_id.split("-")[0]} for email_id in email_ids]
+
+
+def test_small_tenant_is_not_stuck_behind_a_large_backlog(queues):
+    queues.push("big", [f"big-{i}" for i in range(100)])
+    queues.push("small", ["small-0", "small-1"])
+
+    served = run_drain(queues, load_all, 4)
+
+    assert [doc["id"] for doc in served] == ["big-0", "big-1", "small-0", "small-1"]
+
+
+def test_in_flight_cap_holds_back_a_tenant_until_done(queues, monkeypatch):
+    monkeypatch.setattr(server, "TENANT_LIMITS", {"capped": {"max_in_flight": 1}})
+    queues.push("capped", ["capped-0", "capped-1"])
+    queues.push("other", ["other-0", "other-1", "other-2"])
+
+    served = run_drain(queues, load_all, 4)
+
+    assert [doc["id"] for doc in served].count("capped-0") == 1
+    assert "capped-1" not in [doc["id"] for doc in served]
+    assert queues.stats()["capped"]["in_flight"] == 1
+
+    queues.done({"id": "capped-0", "user_id": "capped"})
+    served = run_drain(queues, load_all, 1)
+    assert served[0]["id"] == "capped-1"
+
+
+def test_emails_no_longer_pending_are_skipped_and_forgotten(queues):
+    queues.push("tenant", ["tenant-0", "tenant-1", "tenant-2"])
+
+    async def load_without_sent(email_ids):
+        return [doc for doc in await load_all(email_ids) if doc["id"] != "tenant-0"]
+
+    served = run_drain(queues, load_without_sent, 2)
+
+    assert [doc["id"] for doc in served] == ["tenant-1", "tenant-2"]
+    assert "tenant-0" not in queues
+    assert "tenant-1" in queues
+
+
+def test_done_and_reset_release_fired_ids(queues):
+    queues.push("tenant", ["tenant-0", "tenant-1"])
+    run_drain(queues, load_all, 2)
+
+    queues.done({"id": "tenant-0", "user_id": "tenant"})
+    assert "tenant-0" not in queues
+    assert "tenant-1" in queues
+
+    queues.reset_in_flight()
+    assert "tenant-1" not in queues
+    assert queues.stats()["tenant"]["in_flight"] == 0
+
+
+def test_rate_limit_stops_a_tenant_within_the_minute(queues, monkeypatch):
+    monkeypatch.setattr(server, "TENANT_LIMITS", {"slow": {"rate_per_minute": 1}})
+    queues.push("slow", ["slow-0", "slow-1"])
+    queues.push("fast", ["fast-0", "fast-1", "fast-2"])
+
+    served = [doc["id"] for doc in run_drain(queues, load_all, 4)]
+
+    assert served.count("slow-0") == 1
+    assert "slow-1" not in served
+    assert queues.queued() == 1